@@ -1,7 +1,23 @@
 import streamlit as st
 import uuid
 import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from utils import *
+from batch import screen_batch
+from streaming import stream_cv_analysis
+from search import search_candidates, similar_candidates
+from multijob import save_job_scores, score_cv_jobs
+from rescore import pending_rescore, rescore
+from dedup import check_before_analysis
+from ingest import UPLOAD_TMP_DIR, UploadRejected, spool_to_file
+from metrics import metrics
+from prefilter import extract_requirements, prefilter_cv, screening_stats
+from work_queue import (QUEUE_IN_PROCESS, QUEUE_WORKERS, enqueue, queue_counts, recent_tasks,
+                        spool_upload, start_workers)
+from config import *
 from dotenv import load_dotenv
 
 # Carrega variáveis de ambiente
@@ -25,109 +41,51 @@ st.set_page_config(
     layout="wide"
 )
 
-# Configurações do modelo e arquivos
-id_model = "deepseek-r1-distill-llama-70b"
-temperature = 0.7
-json_file = 'curriculos.json'
-path_job_csv = "vagas.csv"
-
-# Carrega o modelo LLM
-llm = load_llm(id_model, temperature)
-
-# Definição da vaga (hardcoded)
-job = {}
-job['title'] = "Desenvolvedor(a) Full Stack"
-job['description'] = "Estamos em busca de um(a) Desenvolvedor(a) Full Stack para integrar o time de tecnologia da nossa empresa, atuando em projetos estratégicos com foco em soluções escaláveis e orientadas a dados. O(a) profissional será responsável por desenvolver, manter e evoluir aplicações web robustas, além de colaborar com times multidisciplinares para entregar valor contínuo ao negócio."
-job['details'] = """
-Atividades:
-- Desenvolver e manter aplicações web em ambientes modernos, utilizando tecnologias back-end e front-end.
-- Trabalhar com equipes de produto, UX e dados para entender demandas e propor soluções.
-- Criar APIs, integrações e dashboards interativos.
-- Garantir boas práticas de versionamento, testes e documentação.
-- Participar de revisões de código, deploys e melhorias contínuas na arquitetura das aplicações.
-
-Pré-requisitos:
-- Sólidos conhecimentos em Python, JavaScript e SQL.
-- Experiência prática com frameworks como React, Node.js e Django.
-- Familiaridade com versionamento de código usando Git.
-- Experiência com serviços de nuvem, como AWS e Google Cloud Platform.
-- Capacidade de trabalhar em equipe, com boa comunicação e perfil colaborativo.
-
-Diferenciais:
-- Conhecimento em Power BI ou outras ferramentas de visualização de dados.
-- Experiência anterior em ambientes ágeis (Scrum, Kanban).
-- Projetos próprios, contribuições open source ou portfólio técnico disponível.
-- Certificações em nuvem ou áreas relacionadas à engenharia de software.
-"""
-
-# Schema para extração de dados estruturados
-schema = """
-{
-  "name": "Nome completo do candidato",
-  "area": "Área ou setor principal que o candidato atua. Classifique em apenas uma: Desenvolvimento, Marketing, Vendas, Financeiro, Administrativo, Outros",
-  "summary": "Resumo objetivo sobre o perfil profissional do candidato",
-  "skills": ["competência 1", "competência 2", "..."],
-  "education": "Resumo da formação acadêmica mais relevante",
-  "interview_questions": ["Pelo menos 3 perguntas úteis para entrevista com base no currículo, para esclarecer algum ponto ou explorar melhor"],
-  "strengths": ["Pontos fortes e aspectos que indicam alinhamento com o perfil ou vaga desejada"],
-  "areas_for_development": ["Pontos que indicam possíveis lacunas, fragilidades ou necessidades de desenvolvimento"],
-  "important_considerations": ["Observações específicas que merecem verificação ou cuidado adicional"],
-  "final_recommendations": "Resumo avaliativo final com sugestões de próximos passos (ex: seguir com entrevista, indicar para outra vaga)",
-  "score": 0.0
-}
-"""
-
-# Campos obrigatórios para validação
-fields = [
-    "name",
-    "area",
-    "summary",
-    "skills",
-    "education",
-    "interview_questions",
-    "strengths",
-    "areas_for_development",
-    "important_considerations",
-    "final_recommendations",
-    "score"
-]
-
-# Critérios de pontuação
-prompt_score = """
-Com base na vaga específica, calcule a pontuação final (de 0.0 a 10.0).
-O retorno para esse campo deve conter apenas a pontuação final (x.x) sem mais nenhum texto ou anotação.
-Seja justo e rigoroso ao atribuir as notas. A nota 10.0 só deve ser atribuída para candidaturas que superem todas as expectativas da vaga.
-
-Critérios de avaliação:
-1. Experiência (Peso: 35% do total): Análise de posições anteriores, tempo de atuação e similaridade com as responsabilidades da vaga.
-2. Habilidades Técnicas (Peso: 25% do total): Verifique o alinhamento das habilidades técnicas com os requisitos mencionados na vaga.
-3. Educação (Peso: 15% do total): Avalie a relevância da graduação/certificações para o cargo, incluindo instituições e anos de estudo.
-4. Pontos Fortes (Peso: 15% do total): Avalie a relevância dos pontos fortes (ou alinhamentos) para a vaga.
-5. Pontos Fracos (Desconto de até 10%): Avalie a gravidade dos pontos fracos (ou desalinhamentos) para a vaga.
-"""
-
-# Template do prompt para análise
-prompt_template = ChatPromptTemplate.from_template("""
-Você é um especialista em Recursos Humanos com vasta experiência em análise de currículos.
-Sua tarefa é analisar o conteúdo a seguir e extrair os dados conforme o formato abaixo, para cada um dos campos.
-Responda apenas com o JSON estruturado e utilize somente essas chaves. Cuide para que os nomes das chaves sejam exatamente esses.
-Não adicione explicações ou anotações fora do JSON.
-
-Schema desejado:
-{schema}
-
----
-Para o cálculo do campo score:
-{prompt_score}
-
----
-Currículo a ser analisado:
-'{cv}'
-
----
-Vaga que o candidato está se candidatando:
-'{job}'
-""")
+# Cliente LLM e template do prompt: criados uma vez por processo e reaproveitados
+# em todos os reruns e sessões. Como id_model e temperature fazem parte da chave
+# do cache e max_entries=1, mudar qualquer um deles descarta o cliente anterior.
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_resources(id_model, temperature, prompt_text):
+    return load_llm(id_model, temperature), build_prompt_template(prompt_text)
+
+llm, prompt_template = load_resources(id_model, temperature, prompt_text)
+
+# Aquece o pool de conversores docling uma única vez por processo, em segundo
+# plano, para que o primeiro upload não pague o carregamento dos modelos sem
+# atrasar a primeira renderização da página
+@st.cache_resource(show_spinner=False)
+def warmup_docling():
+    thread = threading.Thread(target=warmup_converters, name="docling-warmup", daemon=True)
+    thread.start()
+    return thread
+
+warmup_docling()
+
+# Leitura dos PDFs dos lotes enviados pela interface: threads de longa duração sobre o pool
+# de conversores já aquecido, em vez de um pool de processos (fork do Streamlit) a cada lote
+@st.cache_resource(show_spinner=False)
+def parse_thread_pool():
+    return ThreadPoolExecutor(max_workers=CONVERTER_POOL_SIZE, thread_name_prefix="parse")
+
+# Workers da fila em segundo plano, iniciados uma vez por processo
+@st.cache_resource(show_spinner=False)
+def start_queue_workers():
+    if not QUEUE_IN_PROCESS:
+        return None
+    # O modelo de cada tarefa vai nas opções do enfileiramento (ver work_queue.task_llm): trocar o
+    # modelo não exige reiniciar os workers, que só usam este llm para tarefas do mesmo modelo
+    ctx = {"llm": llm, "model": (id_model, temperature), "prompt_template": prompt_template, "schema": schema,
+           "prompt_score": prompt_score, "fields": fields, "prefilter_config": prefilter_config}
+    return start_workers(db_file, QUEUE_WORKERS, ctx=ctx)
+
+start_queue_workers()
+
+# Migra o curriculos.json e o vagas.csv legados (se existirem) para o banco SQLite, uma vez por processo
+@st.cache_resource
+def migrate_storage():
+    return migrate_json_cv(json_file, db_file), migrate_jobs_csv(path_job_csv, db_file)
+
+migrate_storage()
 
 # Inicialização do estado da sessão
 if "uploader_key" not in st.session_state:
@@ -139,60 +97,243 @@ if "selected_cv" not in st.session_state:
 if "show_confirm" not in st.session_state:
     st.session_state.show_confirm = False
 
-# Salva descrição da vaga em CSV
-save_job_to_csv(job, path_job_csv)
-job_details = load_job(path_job_csv)
+# Cadastra a vaga (idempotente: reruns não gravam nada se ela não mudou)
+default_job_id = save_job(job, db_file)
+open_jobs = list_jobs(db_file)
 
 # Interface principal - Layout em duas colunas
 col1, col2 = st.columns(2)
 
 with col1:
     st.header("Triagem e Análise de Currículos")
-    st.markdown("#### Vaga: {}".format(job["title"]))
+    if len(open_jobs) > 1:
+        job_ids = [j["job_id"] for j in open_jobs]
+        titles = {j["job_id"]: j["title"] for j in open_jobs}
+        job_id = st.selectbox("Vaga", job_ids, index=job_ids.index(default_job_id),
+                              format_func=titles.get)
+    else:
+        job_id = default_job_id
+        st.markdown("#### Vaga: {}".format(job["title"]))
+    job_details = load_job(db_file, job_id)
+    current_score_hash = job_score_hash(db_file, job_id, prompt_score)
+
+# Pré-requisitos da vaga e área esperada, usados pelo pré-filtro
+job_requirements = extract_requirements(job_details)
+target_area = job.get("area") if job_id == default_job_id else None
+prefilter_args = None
+if prefilter_config["enabled"]:
+    prefilter_args = {k: v for k, v in prefilter_config.items() if k != "enabled"}
+    prefilter_args.update(requirements=job_requirements, target_area=target_area)
 
 with col2:
-    uploaded_file = st.file_uploader(
-        "Envie um currículo em PDF", 
+    uploaded_files = st.file_uploader(
+        "Envie um ou mais currículos em PDF", 
         type=["pdf"], 
         key=st.session_state.uploader_key,
-        help="Faça upload de um arquivo PDF contendo o currículo para análise"
+        accept_multiple_files=True,
+        help="Faça upload de um ou mais arquivos PDF contendo os currículos para análise"
     )
 
+    background_mode = st.toggle(
+        "Processar em segundo plano",
+        value=True,
+        help="Coloca os currículos em uma fila e libera a tela imediatamente; o andamento aparece abaixo"
+    )
+    # A fila não mostra a análise em tempo real nem avalia várias vagas: essas opções só valem fora dela
+    stream_mode = st.toggle(
+        "Mostrar análise em tempo real",
+        value=True,
+        disabled=background_mode,
+        help="Exibe cada campo da análise assim que o modelo termina de gerá-lo (desative o processamento "
+             "em segundo plano para usar)"
+    ) and not background_mode
+    multi_job_mode = len(open_jobs) > 1 and st.toggle(
+        "Avaliar contra todas as vagas",
+        value=False,
+        disabled=background_mode,
+        help="Extrai o perfil do candidato uma vez e calcula o score para cada vaga cadastrada "
+             "(só para um arquivo por vez; desative o processamento em segundo plano para usar)"
+    ) and not background_mode
+    skip_prefilter = st.checkbox(
+        "Ignorar pré-filtro",
+        value=False,
+        help="Envia o currículo ao LLM mesmo que ele não atinja a pontuação mínima do pré-filtro"
+    )
+
+    with st.expander("Estatísticas da triagem"):
+        stats = screening_stats.summary()
+        st.caption(
+            f"Pré-filtro: {stats['evaluated']} avaliados, {stats['llm_calls_avoided']} chamadas ao LLM "
+            f"evitadas, média {stats['prefilter_avg_ms']:.1f} ms · "
+            f"LLM: {stats['llm_calls']} chamadas, média {stats['llm_avg_s']:.1f} s"
+        )
+
+# Fila de processamento em segundo plano: o upload só enfileira e retorna
+if uploaded_files and background_mode:
+    queued = 0
+    for f in uploaded_files:
+        try:
+            spooled = spool_upload(f)
+        except UploadRejected as e:
+            st.warning(f"{f.name}: {e}")
+            continue
+        enqueue(db_file, spooled, job_id, original_name=f.name,
+                options={"skip_prefilter": skip_prefilter, "target_area": target_area,
+                         "model": id_model, "temperature": temperature})
+        queued += 1
+    st.session_state.uploader_key = str(uuid.uuid4())
+    if queued:
+        st.toast(f"{queued} currículo(s) enviado(s) para a fila de análise")
+        st.rerun()
+    # Todos recusados: os avisos ficam na tela, os arquivos não seguem para o processamento em primeiro
+    # plano e o restante da página (busca, painéis, lista de candidatos) continua sendo exibido
+    uploaded_files = None
+
+uploaded_file = uploaded_files[0] if len(uploaded_files or []) == 1 else None
+
+# Processamento em lote (vários arquivos)
+if uploaded_files and len(uploaded_files) > 1:
+    progress = st.progress(0.0, text=f"Analisando {len(uploaded_files)} currículos...")
+    log = st.container()
+
+    def report_progress(result, done, total):
+        progress.progress(done / total, text=f"{done}/{total} currículos processados")
+        name = os.path.basename(result["path"])
+        if result["status"] == "ok":
+            save_json_cv(result["data"], path_db=db_file, key_name="name", markdown=result["markdown"],
+                         job_id=job_id, score_hash=current_score_hash)
+            log.write(f"✅ {name} — {result['data'].get('name', '-')}")
+        elif result["status"] in ("filtered", "duplicate"):
+            log.write(f"⏭️ {name} — {result['error']}")
+        else:
+            log.write(f"❌ {name} — {result['error']}")
+
+    with tempfile.TemporaryDirectory(dir=UPLOAD_TMP_DIR) as tmp_dir:
+        paths = []
+        for i, f in enumerate(uploaded_files):
+            try:
+                paths.append(spool_to_file(f, path=os.path.join(tmp_dir, f"{i:04d}_{os.path.basename(f.name)}")))
+            except UploadRejected as e:
+                log.write(f"❌ {f.name} — {e}")
+
+        results = screen_batch(paths, llm, schema, job_details, prompt_template, prompt_score, fields,
+                               prefilter_args=None if skip_prefilter else prefilter_args,
+                               dedup_db=db_file, on_progress=report_progress, parse_pool=parse_thread_pool())
+
+    ok = sum(r["status"] == "ok" for r in results)
+    filtered = sum(r["status"] == "filtered" for r in results)
+    st.success(f"✅ {ok} de {len(results)} currículos analisados com sucesso!"
+               + (f" {filtered} barrados pelo pré-filtro." if filtered else ""))
+    st.session_state.uploader_key = str(uuid.uuid4())
+
 # Processamento do upload
 if uploaded_file is not None:
     with st.spinner("Analisando o currículo..."):
+        path = None
         try:
-            # Salva arquivo temporariamente
-            path = uploaded_file.name
-            with open(path, "wb") as f:
-                f.write(uploaded_file.read())
+            # Salva o upload em blocos num arquivo temporário de nome único
+            path = spool_to_file(uploaded_file)
             
-            # Processa o currículo
-            output, res = process_cv(schema, job_details, prompt_template, prompt_score, llm, path)
-            structured_data = parse_res_llm(res, fields)
+            # Processa o currículo (markdown e análise reaproveitados do cache quando possível)
+            content = parse_doc_cached(path)
+
+            # Currículo já registrado (mesmo e-mail ou conteúdo quase igual): sem nova chamada ao LLM
+            duplicate = check_before_analysis(db_file, content)
+
+            # Primeira etapa: pré-filtro local, antes da chamada cara ao LLM
+            decision = None
+            if prefilter_args and not skip_prefilter and not duplicate:
+                decision = prefilter_cv(content, **prefilter_args)
+                screening_stats.record_prefilter(decision)
+
+            llm_started = time.perf_counter()
+            stream_metrics = None
+            if duplicate or (decision and not decision["passed"]):
+                structured_data, from_cache = None, False
+            elif multi_job_mode:
+                # Perfil extraído uma vez; só a aderência é calculada para cada vaga, em paralelo
+                all_jobs = {j["job_id"]: load_job(db_file, j["job_id"]) for j in open_jobs}
+                multi_result = score_cv_jobs(content, all_jobs, llm, prompt_score=prompt_score)
+                structured_data, from_cache = None, False
+                if multi_result["profile"] and job_id in multi_result["scores"]:
+                    structured_data = {**multi_result["profile"], **multi_result["scores"][job_id]}
+                    # Grava o currículo e, com a cv_key dele, a linha da matriz candidato x vaga
+                    save_job_scores(db_file, multi_result, primary_job_id=job_id, markdown=content,
+                                    prompt_score=prompt_score, warn=True)
+                    titles = {j["job_id"]: j["title"] for j in open_jobs}
+                    st.dataframe(pd.DataFrame(
+                        [{"Vaga": titles[j], "Score": fit.get("score")} for j, fit in multi_result["scores"].items()]
+                    ).sort_values("Score", ascending=False), hide_index=True)
+                for failed_job, error in multi_result["errors"].items():
+                    st.warning(f"Vaga {failed_job}: {error}")
+            elif stream_mode:
+                # Mostra cada campo assim que o modelo termina de gerá-lo
+                partial = {}
+                live_result = st.empty()
+                for event, *payload in stream_cv_analysis(
+                    schema, job_details, prompt_template, prompt_score, llm, content, fields
+                ):
+                    if event == "field":
+                        name, value = payload
+                        partial[name] = value
+                        live_result.markdown(show_cv_result(partial))
+                    else:
+                        structured_data, stream_metrics = payload
+                live_result.empty()
+                from_cache = stream_metrics["cached"]
+            else:
+                structured_data, from_cache = analyze_cv_cached(
+                    schema, job_details, prompt_template, prompt_score, llm, content, fields
+                )
+            if not from_cache and not duplicate and not (decision and not decision["passed"]):
+                screening_stats.record_llm(time.perf_counter() - llm_started)
             
             # Verifica se os dados foram extraídos corretamente
-            if structured_data:
-                save_json_cv(structured_data, path_json=json_file, key_name="name")
-                st.success("✅ Currículo analisado com sucesso!")
+            if duplicate:
+                shared = f"{duplicate['similarity']:.0%} de conteúdo em comum"
+                reasons = {"email": "mesmo e-mail", "nome": f"mesmo nome e {shared}", "conteudo": shared}
+                st.info(
+                    f"♻️ Currículo já registrado como **{duplicate['cv_key']}** ({reasons[duplicate['reason']]}). "
+                    + ("O arquivo novo substituiu o anterior e o score ficou marcado para reavaliação."
+                       if duplicate["action"] == "merge" else "Análise não repetida.")
+                )
+                st.session_state.uploader_key = str(uuid.uuid4())
+
+            elif decision and not decision["passed"]:
+                st.warning(
+                    f"⏭️ Currículo não enviado para análise completa: pontuação do pré-filtro "
+                    f"{decision['score']:.2f} (mínimo {prefilter_config['threshold']:.2f}), "
+                    f"área provável **{decision['area']}**, "
+                    f"{len(decision['matched'])} de {len(job_requirements)} pré-requisitos encontrados. "
+                    f"Marque \"Ignorar pré-filtro\" para analisar mesmo assim."
+                )
+
+            elif structured_data:
+                if not multi_job_mode:
+                    save_json_cv(structured_data, path_db=db_file, key_name="name", markdown=content,
+                                 job_id=job_id, score_hash=current_score_hash)
+                st.success("✅ Currículo analisado com sucesso!" + (" (resultado em cache)" if from_cache else ""))
+                if stream_metrics and stream_metrics["time_to_first_field"] is not None:
+                    st.caption(
+                        f"Primeiro campo em {stream_metrics['time_to_first_field']:.1f}s · "
+                        f"total {stream_metrics['total_time']:.1f}s"
+                    )
                 st.session_state.uploader_key = str(uuid.uuid4())
-                
-                # Remove arquivo temporário
-                try:
-                    os.remove(path)
-                except:
-                    pass
                 
             else:
                 st.error("❌ Erro ao processar o currículo. Tente novamente.")
                 
+        except UploadRejected as e:
+            st.error(f"❌ Currículo recusado: {e}")
         except Exception as e:
             st.error(f"❌ Erro durante o processamento: {str(e)}")
-            # Remove arquivo temporário em caso de erro
-            try:
-                os.remove(path)
-            except:
-                pass
+        finally:
+            # Remove o arquivo temporário em qualquer caso
+            if path:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
 
     # Exibe resultados se os dados foram processados
     if 'structured_data' in locals() and structured_data:
@@ -201,8 +342,108 @@ if uploaded_file is not None:
         with st.expander("Ver dados estruturados (JSON)"):
             st.json(structured_data)
 
+# Painel da fila: atualizado a cada 2s sem rerodar a página inteira
+QUEUE_STATUS_LABELS = {
+    "pending": "⏳ Na fila", "running": "⚙️ Analisando", "done": "✅ Concluído",
+    "duplicate": "♻️ Já registrado", "filtered": "⏭️ Barrado no pré-filtro", "failed": "❌ Falhou",
+}
+
+@st.fragment(run_every=2)
+def queue_panel():
+    tasks = recent_tasks(db_file, limit=10)
+    if not tasks:
+        return
+    counts = queue_counts(db_file)
+    active = counts.get("pending", 0) + counts.get("running", 0)
+    with st.expander(f"Fila de análise ({active} em andamento)", expanded=active > 0):
+        for task in tasks:
+            label = QUEUE_STATUS_LABELS.get(task["status"], task["status"])
+            detail = ""
+            if task["result"] and task["result"].get("name"):
+                detail = f" — {task['result']['name']}"
+            elif task["error"] and task["status"] in ("pending", "failed"):
+                detail = f" — tentativa {task['attempts']}/{task['max_attempts']}: {task['error']}"
+            st.write(f"{label} · {task['original_name']}{detail}")
+
+    # Novos currículos salvos pela fila: atualiza a lista da página
+    finished = counts.get("done", 0)
+    if st.session_state.get("queue_done_seen") is None:
+        st.session_state.queue_done_seen = finished
+    elif finished != st.session_state.queue_done_seen:
+        st.session_state.queue_done_seen = finished
+        st.rerun()
+
+queue_panel()
+
+# Painel de administração: percentis por etapa em janela deslizante, tokens, novas tentativas e falhas
+METRICS_WINDOWS = {"5 min": 300, "1 hora": 3600, "24 horas": 86400}
+
+@st.fragment(run_every=5)
+def metrics_panel():
+    with st.expander("Métricas do pipeline (admin)"):
+        window = st.radio("Janela", list(METRICS_WINDOWS), horizontal=True, key="metrics_window")
+        snap = metrics.snapshot(window=METRICS_WINDOWS[window])
+        if hasattr(llm, "stats"):
+            # Estado atual de cada backend do LLM: circuito, concorrência ajustada e latência recente
+            st.dataframe(pd.DataFrame([
+                {"Backend": s["backend"], "Modelo": s["model"], "Circuito": s["circuit"],
+                 "Concorrência": s["concurrency"], "Em andamento": s["in_flight"],
+                 "Latência (ms)": s["latency_ms"], "Erros (%)": round(100 * s["error_rate"], 1)}
+                for s in llm.stats()]), hide_index=True, use_container_width=True)
+        spans = [{"Etapa": name, "Chamadas": p["count"], "p50 (ms)": p.get("p50_ms"), "p90 (ms)": p.get("p90_ms"),
+                  "p99 (ms)": p.get("p99_ms"), "Erros (%)": 100 * p.get("error_rate", 0)}
+                 for name, p in snap["spans"].items() if p["count"]]
+        if not spans:
+            st.caption("Nenhuma operação registrada nesta janela.")
+            return
+        st.dataframe(pd.DataFrame(spans), hide_index=True, use_container_width=True)
+        if snap["counters"]:
+            st.dataframe(pd.DataFrame(snap["counters"]), hide_index=True, use_container_width=True)
+        for failure in snap["failures"][:10]:
+            st.caption(f"❌ {time.strftime('%H:%M:%S', time.localtime(failure['ts']))} · {failure['stage']} · "
+                       f"{failure['reason']}: {failure['detail']}")
+
+metrics_panel()
+
+# Leituras da lista/tabela de currículos, em cache até a próxima escrita no banco
+PAGE_SIZE = 20
+TABLE_PAGE_SIZE = 200
+SORT_OPTIONS = {
+    "Maior score": ("score", True),
+    "Menor score": ("score", False),
+    "Nome (A-Z)": ("name", False),
+    "Mais recentes": ("recent", True),
+}
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def load_cv_page(path_db, version, page, page_size, **filters):
+    return query_cv_page(path_db, page=page, page_size=page_size, **filters)
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def load_cv_areas(path_db, version):
+    return list_cv_areas(path_db)
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_cv_table(path_db, version, page):
+    return display_json_table(path_db, page=page, page_size=TABLE_PAGE_SIZE)
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def load_job_score_table(path_db, version):
+    return job_score_table(path_db)
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_pending_rescore(path_db, job_id, prompt_score, score_hash, version, scores_version):
+    # score_hash muda com a vaga ou o critério; as versões, com escritas em curriculos e pontuacoes
+    return pending_rescore(path_db, job_id, prompt_score)
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def load_analytics(path_db, version, requirements):
+    return analytics_summary(path_db, requirements)
+
+data_version = cv_version(db_file)
+
 # Seção de currículos analisados
-if os.path.exists(json_file):
+if count_cv(db_file) > 0:
     st.subheader("Lista de currículos analisados", divider="gray")
     
     # Botão "Limpar Tudo" centralizado
@@ -224,7 +465,7 @@ if os.path.exists(json_file):
         
         with col_confirm1:
             if st.button("✅ Confirmar", type="primary", use_container_width=True):
-                if clear_all_cv(json_file):
+                if clear_all_cv(db_file):
                     st.success("✅ Todos os currículos foram removidos com sucesso!")
                     st.session_state.show_confirm = False
                     st.session_state.selected_cv = None  # Limpa currículo selecionado
@@ -240,17 +481,37 @@ if os.path.exists(json_file):
     # Separador visual
     st.markdown("---")
     
-    # Lista de currículos
+    # Lista de currículos: filtro, ordenação e paginação feitos no banco (por índices).
+    # O cache é invalidado pela versão dos dados, que muda a cada escrita.
     try:
-        df = display_json_table(json_file)
-        
-        if not df.empty:
-            for i, row in df.iterrows():
+        col_filter1, col_filter2, col_filter3, col_filter4 = st.columns([2, 2, 2, 1])
+        with col_filter1:
+            area_filter = st.selectbox("Área", ["Todas"] + load_cv_areas(db_file, data_version))
+        with col_filter2:
+            min_score = st.slider("Score mínimo", min_value=0.0, max_value=10.0, value=0.0, step=0.5)
+        with col_filter3:
+            sort_label = st.selectbox("Ordenar por", list(SORT_OPTIONS))
+        with col_filter4:
+            page = st.number_input("Página", min_value=1, value=1, step=1)
+
+        sort_by, descending = SORT_OPTIONS[sort_label]
+        filters = dict(sort_by=sort_by, descending=descending,
+                       min_score=min_score or None,
+                       area=None if area_filter == "Todas" else area_filter)
+        rows, total = load_cv_page(db_file, data_version, page, PAGE_SIZE, **filters)
+        pages = max(1, -(-total // PAGE_SIZE))
+        if page > pages:
+            page = pages
+            rows, total = load_cv_page(db_file, data_version, page, PAGE_SIZE, **filters)
+
+        if rows:
+            st.caption(f"Página {page} de {pages} · {total} currículos")
+            for row_id, row in rows:
                 cols = st.columns([1, 3, 1, 5])
                 
                 with cols[0]:
-                    if st.button("Ver detalhes", key=f"btn_{i}"):
-                        st.session_state.selected_cv = row.to_dict()
+                    if st.button("Ver detalhes", key=f"btn_{row_id}"):
+                        st.session_state.selected_cv = row
                         st.rerun()
                 
                 with cols[1]:
@@ -258,7 +519,10 @@ if os.path.exists(json_file):
                 
                 with cols[2]:
                     score = row.get('score', 0)
-                    if isinstance(score, (int, float)):
+                    if isinstance(score, (int, float)) and row.get('score_ci'):
+                        low, high = row['score_ci']
+                        st.write(f"**Score:** {score:.1f} ± {(high - low) / 2:.1f}")
+                    elif isinstance(score, (int, float)):
                         st.write(f"**Score:** {score:.1f}")
                     else:
                         st.write(f"**Score:** {score}")
@@ -269,11 +533,69 @@ if os.path.exists(json_file):
                         summary = str(summary)[:100] + "..."
                     st.write(f"**Resumo:** {summary}")
         else:
-            st.info("Nenhum currículo encontrado na base de dados.")
+            st.info("Nenhum currículo encontrado com esses filtros.")
             
     except Exception as e:
         st.error(f"Erro ao carregar currículos: {str(e)}")
 
+    # Matriz candidato x vaga (currículos avaliados contra todas as vagas)
+    # A matriz tem versão própria: reavaliações e novas linhas nem sempre escrevem em curriculos
+    matrix_version = scores_version(db_file)
+    score_table = load_job_score_table(db_file, matrix_version)
+    if not score_table.empty:
+        with st.expander("Pontuação por vaga"):
+            st.dataframe(score_table, use_container_width=True, hide_index=True)
+
+    # Reavaliação dos scores quando a vaga ou o critério de pontuação mudou (reaproveita o markdown gravado)
+    pending = load_pending_rescore(db_file, job_id, prompt_score, current_score_hash, data_version, matrix_version)
+    if pending["stale"]:
+        with st.expander(f"🔄 {pending['stale']} score(s) desatualizado(s) para esta vaga"):
+            st.caption("A vaga ou o critério de pontuação mudou depois da análise destes currículos. "
+                       "Só a parte da análise que depende da vaga é refeita."
+                       + (f" {pending['without_markdown']} currículo(s) antigos sem markdown gravado "
+                          "precisam ser enviados de novo." if pending["without_markdown"] else ""))
+            if st.button("Reavaliar scores", type="primary"):
+                rescore_progress = st.progress(0.0, text="Reavaliando...")
+                summary = rescore(
+                    db_file, job_id, llm, prompt_score=prompt_score,
+                    on_progress=lambda cv_key, error, done, total: rescore_progress.progress(
+                        done / total, text=f"{done}/{total} currículos reavaliados"),
+                )
+                st.toast(f"✅ {summary['ok']} de {summary['total']} scores reavaliados")
+                for cv_key, error in summary["errors"].items():
+                    st.warning(f"{cv_key}: {error}")
+                if not summary["errors"]:
+                    st.rerun()
+
+    # Busca por similaridade (índice local, sem chamar o LLM)
+    st.subheader("Buscar candidatos", divider="gray")
+    col_search1, col_search2 = st.columns([4, 1])
+    with col_search1:
+        search_query = st.text_input(
+            "Buscar candidatos",
+            placeholder="Ex.: React, Node.js e AWS com experiência em dashboards",
+            label_visibility="collapsed"
+        )
+    with col_search2:
+        search_job = st.button("🎯 Mais aderentes à vaga", use_container_width=True)
+
+    if search_query or search_job:
+        hits = search_candidates(db_file, search_query or job_details, k=10)
+        if not hits:
+            st.info("Nenhum candidato encontrado.")
+        for i, (record, similarity) in enumerate(hits):
+            cols = st.columns([1, 3, 1, 5])
+            with cols[0]:
+                if st.button("Ver detalhes", key=f"search_btn_{i}"):
+                    st.session_state.selected_cv = record
+                    st.rerun()
+            with cols[1]:
+                st.write(f"**Nome:** {record.get('name', '-')}")
+            with cols[2]:
+                st.write(f"**Similaridade:** {similarity:.1f}")
+            with cols[3]:
+                st.write(f"**Área:** {record.get('area', '-')}")
+
 # Exibição de currículo selecionado
 if st.session_state.selected_cv:
     st.markdown("---")
@@ -282,6 +604,15 @@ if st.session_state.selected_cv:
     
     with st.expander("Ver dados estruturados (JSON)"):
         st.json(st.session_state.selected_cv)
+
+    history = score_history_table(db_file, st.session_state.selected_cv.get("cv_key"))
+    if len(history) > 1:
+        with st.expander("Histórico de pontuação"):
+            st.dataframe(history, hide_index=True, use_container_width=True)
+
+    with st.expander("Candidatos semelhantes"):
+        for record, similarity in similar_candidates(db_file, st.session_state.selected_cv, k=5):
+            st.write(f"- **{record.get('name', '-')}** ({record.get('area', '-')}) — similaridade {similarity:.1f}")
     
     # Botão para limpar seleção
     if st.button("🔙 Voltar à lista", type="secondary"):
@@ -289,29 +620,76 @@ if st.session_state.selected_cv:
         st.rerun()
 
 # Seção de download e visualização de dados
-if os.path.exists(json_file):
+if count_cv(db_file) > 0:
     st.markdown("---")
     st.subheader("Exportar Dados", divider="blue")
     
-    # Botão de download
-    with open(json_file, "r", encoding="utf-8") as f:
-        json_data = f.read()
-    
+    # O arquivo só é gerado quando pedido (e não a cada escrita no banco); fica na sessão até os dados mudarem
+    export_formats = {"JSON": ("json", "application/json", export_json_cv)}
+    if parquet_available():
+        export_formats["Parquet (análise)"] = ("zip", "application/zip", export_parquet_cv)
+    export = st.session_state.get("export")
+
     col_download1, col_download2, col_download3 = st.columns([1, 2, 1])
     with col_download2:
-        st.download_button(
-            label="📥 Baixar arquivo JSON",
-            data=json_data,
-            file_name=f"curriculos_analisados_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.json",
-            mime="application/json",
-            use_container_width=True,
-            help="Baixa todos os currículos analisados em formato JSON"
+        export_format = st.radio(
+            "Formato", list(export_formats), horizontal=True,
+            help="JSON no mesmo formato do antigo curriculos.json; Parquet com currículos, competências e "
+                 "pontos fortes em tabelas ligadas por cv_id"
         )
+        extension, mime, build_export = export_formats[export_format]
+        if not export or export["version"] != data_version or export["format"] != export_format:
+            export = None
+            if st.button("📦 Gerar arquivo", use_container_width=True):
+                with st.spinner("Gerando arquivo..."):
+                    export = {"version": data_version, "format": export_format, "data": build_export(db_file),
+                              "stamp": pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}
+            st.session_state.export = export
+        if export:
+            st.download_button(
+                label="📥 Baixar arquivo",
+                data=export["data"],
+                file_name=f"curriculos_analisados_{export['stamp']}.{extension}",
+                mime=mime,
+                use_container_width=True,
+                help="Baixa todos os currículos analisados"
+            )
+        if not parquet_available():
+            st.caption("Instale o pyarrow para habilitar o export em Parquet.")
+
+    # Painel analítico: lido dos agregados que o banco atualiza a cada inserção
+    st.subheader("Painel Analítico")
+    analytics = load_analytics(db_file, data_version, tuple(job_requirements))
+    col_chart1, col_chart2 = st.columns(2)
+    with col_chart1:
+        st.caption("Distribuição de score")
+        scores = analytics["scores"].copy()
+        scores["Score"] = scores["Score"].map(lambda b: "sem score" if b < 0 else str(b))
+        st.bar_chart(scores, x="Score", y="Currículos")
+    with col_chart2:
+        st.caption("Currículos por área")
+        st.bar_chart(analytics["areas"].replace({"Área": {"": "sem área"}}), x="Área", y="Currículos")
+    col_chart3, col_chart4 = st.columns(2)
+    with col_chart3:
+        st.caption("Competências mais citadas")
+        st.dataframe(analytics["skills"], hide_index=True, use_container_width=True)
+    with col_chart4:
+        st.caption("Pré-requisitos da vaga × candidatos")
+        if analytics["coverage"].empty:
+            st.info("A vaga não tem pré-requisitos identificados.")
+        else:
+            st.dataframe(analytics["coverage"], hide_index=True, use_container_width=True)
     
-    # Tabela completa de dados
+    # Tabela completa de dados, paginada: cada página é lida do banco com LIMIT/OFFSET
     st.subheader("Tabela Completa de Dados")
     try:
-        df = display_json_table(json_file)
+        table_page = st.number_input("Página da tabela", min_value=1, value=1, step=1)
+        df, table_total = load_cv_table(db_file, data_version, table_page)
+        table_pages = max(1, -(-table_total // TABLE_PAGE_SIZE))
+        if table_page > table_pages:
+            table_page = table_pages
+            df, table_total = load_cv_table(db_file, data_version, table_page)
+        st.caption(f"Página {table_page} de {table_pages} · {table_total} currículos")
         if not df.empty:
             # Configura a exibição da tabela
             st.dataframe(
@@ -0,0 +1,268 @@
+"""
+Triagem de currículos em lote.
+
+A leitura dos PDFs (docling) roda em um pool de processos e as chamadas ao LLM
+são sobrepostas em um pool de threads com limite de concorrência, de forma que
+o gargalo passa a ser a cota do LLM e não a leitura sequencial dos arquivos.
+
+Uso pela linha de comando:
+    python batch.py pasta_ou_arquivo.zip [--concurrency 4] [--parse-workers 2]
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+
+from dedup import check_before_analysis
+from ingest import MAX_UPLOAD_BYTES
+from metrics import metrics
+from prefilter import extract_requirements, prefilter_cv, screening_stats
+from ratelimit import MAX_RATE_LIMIT_RETRIES, RateLimitGate, with_backoff
+from search import prerank
+from utils import analyze_cv_cached, parse_doc_cached, warmup_converters
+
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "2"))
+
+
+def list_pdfs(source, extract_dir=None):
+    """
+    Lista os PDFs de uma pasta (recursivamente) ou de um arquivo .zip.
+
+    Args:
+        source (str): Caminho da pasta ou do .zip
+        extract_dir (str): Pasta onde o .zip é extraído (obrigatória para .zip)
+
+    Returns:
+        list: Caminhos dos PDFs encontrados, em ordem alfabética
+    """
+    if zipfile.is_zipfile(source):
+        if extract_dir is None:
+            raise ValueError("extract_dir é obrigatório para arquivos .zip")
+        with zipfile.ZipFile(source) as zf:
+            for member in zf.infolist():
+                name = os.path.basename(member.filename)
+                if member.is_dir() or not name.lower().endswith(".pdf"):
+                    continue
+                if member.file_size > MAX_UPLOAD_BYTES:
+                    metrics.failure("batch.extract", "arquivo_grande", member.filename)
+                    continue
+                # Prefixo com o índice evita colisão entre arquivos de mesmo nome em pastas diferentes
+                target = os.path.join(extract_dir, f"{len(os.listdir(extract_dir)):05d}_{name}")
+                with zf.open(member) as src, open(target, "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+        source = extract_dir
+
+    pdfs = []
+    for root, _, files in os.walk(source):
+        pdfs.extend(os.path.join(root, f) for f in files if f.lower().endswith(".pdf"))
+    return sorted(pdfs)
+
+
+def _analyze_with_backoff(gate, content, llm, prompt_args, fields, max_retries):
+    retries = []
+    value = with_backoff(gate, lambda: analyze_cv_cached(llm=llm, content=content, fields=fields, gate=gate,
+                                                         **prompt_args),
+                         max_retries, on_retry=retries.append)
+    return value, len(retries)
+
+
+def screen_batch(paths, llm, schema, job_details, prompt_template, prompt_score, fields,
+                 parse_workers=PARSE_WORKERS, llm_concurrency=LLM_CONCURRENCY,
+                 max_retries=MAX_RATE_LIMIT_RETRIES, prefilter_args=None, prerank_top_k=None,
+                 dedup_db=None, on_progress=None, parse_pool=None):
+    """
+    Analisa vários currículos, sobrepondo a leitura dos PDFs e as chamadas ao LLM.
+
+    Args:
+        paths (list): Caminhos dos PDFs
+        parse_workers (int): Processos usados pelo docling
+        llm_concurrency (int): Máximo de chamadas simultâneas ao LLM
+        max_retries (int): Tentativas extras quando o LLM responde com limite de taxa
+        prefilter_args (dict): Argumentos de prefilter.prefilter_cv (requirements, target_area,
+            threshold...). Se informado, currículos reprovados no pré-filtro não vão ao LLM
+            e ficam com status "filtered"
+        prerank_top_k (int): Se informado, espera a leitura de todos os PDFs, ordena
+            os currículos pela similaridade com a vaga (BM25) e envia ao LLM só os
+            k primeiros; os demais ficam com status "skipped"
+        dedup_db (str): Banco dos currículos. Se informado, quase duplicados de
+            currículos já gravados não vão ao LLM e ficam com status "duplicate"
+            (ver dedup.check_before_analysis)
+        on_progress (callable): Chamado como on_progress(result, done, total) sempre que
+            um arquivo termina. Roda na thread que chamou screen_batch (seguro para Streamlit)
+        parse_pool (Executor): Pool de longa duração para a leitura dos PDFs (ex.: threads
+            sobre o pool de conversores do processo, no app). Sem ele, um pool de
+            parse_workers processos é criado e encerrado nesta chamada (linha de comando)
+
+    Returns:
+        list: Um dict por arquivo com path, status ("ok", "error", "filtered",
+            "duplicate" ou "skipped"), data, markdown, prefilter (decisão do pré-filtro), error, parse_time, llm_time, retries e cached (análise veio do
+            cache), na ordem de `paths`
+    """
+    prompt_args = {"schema": schema, "job_details": job_details,
+                   "prompt_template": prompt_template, "prompt_score": prompt_score}
+    results = {path: {"path": path, "status": None, "data": None, "markdown": None, "prefilter": None,
+                      "error": None,
+                      "parse_time": None, "llm_time": None, "retries": 0, "cached": False} for path in paths}
+    gate = RateLimitGate()
+    done = 0
+
+    def finish(result, status, error=None):
+        nonlocal done
+        result["status"] = status
+        result["error"] = error
+        done += 1
+        if on_progress:
+            on_progress(result, done, len(paths))
+
+    # Um pool próprio é encerrado ao final; o recebido continua vivo para os próximos lotes
+    own_pool = None if parse_pool else ProcessPoolExecutor(max_workers=max(1, parse_workers),
+                                                           initializer=warmup_converters, initargs=(1,))
+    with own_pool or nullcontext(), ThreadPoolExecutor(max_workers=max(1, llm_concurrency)) as llm_pool:
+        parse_pool = parse_pool or own_pool
+        pending = {}
+        parsed = []  # (path, markdown) aguardando o pré-ranqueamento
+
+        def submit_llm(path, content):
+            llm_future = llm_pool.submit(_analyze_with_backoff, gate, content, llm,
+                                         prompt_args, fields, max_retries)
+            pending[llm_future] = ("llm", path, time.perf_counter())
+
+        for path in paths:
+            pending[parse_pool.submit(parse_doc_cached, path)] = ("parse", path, time.perf_counter())
+
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, path, started = pending.pop(future)
+                result = results[path]
+                elapsed = time.perf_counter() - started
+                try:
+                    value = future.result()
+                except Exception as e:
+                    result[f"{stage}_time"] = elapsed
+                    metrics.failure(f"batch.{stage}", type(e).__name__, str(e))
+                    finish(result, "error", f"{stage}: {e}")
+                    continue
+                # A leitura pode rodar em outro processo: a duração é registrada aqui
+                metrics.observe(f"batch.{stage}", elapsed)
+
+                if stage == "parse":
+                    result["parse_time"] = elapsed
+                    result["markdown"] = value
+                    duplicate = check_before_analysis(dedup_db, value) if dedup_db else None
+                    if duplicate:
+                        finish(result, "duplicate", f"já registrado como {duplicate['cv_key']}")
+                        continue
+                    if prefilter_args is not None:
+                        decision = prefilter_cv(value, **prefilter_args)
+                        screening_stats.record_prefilter(decision)
+                        result["prefilter"] = decision
+                        if not decision["passed"]:
+                            finish(result, "filtered", f"pré-filtro: pontuação {decision['score']:.2f}, "
+                                                       f"área provável {decision['area']}")
+                            continue
+                    if prerank_top_k is None:
+                        submit_llm(path, value)
+                    else:
+                        parsed.append((path, value))
+                else:
+                    (result["data"], result["cached"]), result["retries"] = value
+                    result["llm_time"] = elapsed
+                    if not result["cached"]:
+                        screening_stats.record_llm(elapsed)
+                    if result["data"]:
+                        finish(result, "ok")
+                    else:
+                        finish(result, "error", "llm: resposta sem JSON válido")
+
+            # Todos os PDFs lidos: só os mais aderentes à vaga seguem para o LLM
+            if prerank_top_k is not None and parsed and not any(s == "parse" for s, _, _ in pending.values()):
+                ranked = prerank(job_details, [content for _, content in parsed])
+                for position, i in enumerate(ranked):
+                    path, content = parsed[i]
+                    if position < prerank_top_k:
+                        submit_llm(path, content)
+                    else:
+                        finish(results[path], "skipped", "fora do top-k do pré-ranqueamento")
+                parsed = []
+
+    return [results[path] for path in paths]
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+    from config import db_file, fields, id_model, job, prefilter_config, prompt_score, prompt_text, \
+        schema, temperature
+    from utils import build_prompt_template, job_score_hash, load_job, load_llm, save_job, save_json_cv
+
+    parser = argparse.ArgumentParser(description="Triagem de currículos em lote (pasta ou .zip de PDFs)")
+    parser.add_argument("source", help="Pasta com PDFs ou arquivo .zip")
+    parser.add_argument("--concurrency", type=int, default=LLM_CONCURRENCY,
+                        help="Máximo de chamadas simultâneas ao LLM")
+    parser.add_argument("--parse-workers", type=int, default=PARSE_WORKERS,
+                        help="Processos usados na leitura dos PDFs")
+    parser.add_argument("--db", default=db_file, help="Banco SQLite de currículos e vagas")
+    parser.add_argument("--no-prefilter", action="store_true",
+                        help="Envia todos os currículos ao LLM, sem o pré-filtro local")
+    parser.add_argument("--prefilter-threshold", type=float, default=prefilter_config["threshold"],
+                        help="Pontuação mínima (0 a 1) do pré-filtro para seguir ao LLM")
+    parser.add_argument("--top-k", type=int,
+                        help="Analisa com o LLM só os k currículos mais similares à vaga")
+    parser.add_argument("--job-id", help="Id da vaga cadastrada (padrão: vaga definida em config.py)")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    llm = load_llm(id_model, temperature)
+    prompt_template = build_prompt_template(prompt_text)
+    default_job_id = save_job(job, args.db)
+    job_id = args.job_id or default_job_id
+    job_details = load_job(args.db, job_id)
+
+    prefilter_args = None
+    if prefilter_config["enabled"] and not args.no_prefilter:
+        prefilter_args = {k: v for k, v in prefilter_config.items() if k != "enabled"}
+        prefilter_args.update(requirements=extract_requirements(job_details), threshold=args.prefilter_threshold,
+                              target_area=job.get("area") if job_id == default_job_id else None)
+
+    score_hash = job_score_hash(args.db, job_id, prompt_score)
+
+    def report(result, done, total):
+        # Grava cada análise assim que termina: uma interrupção no meio do lote não perde as já feitas
+        if result["status"] == "ok" and not save_json_cv(result["data"], path_db=args.db, key_name="name",
+                                                         markdown=result["markdown"], job_id=job_id,
+                                                         score_hash=score_hash, warn=False):
+            result["status"], result["error"] = "duplicate", "já registrado"
+        status = {"ok": "OK  ", "filtered": "FILT", "skipped": "PULO", "duplicate": "DUPL"}.get(result["status"], "ERRO")
+        detail = result["error"] or f"parse {result['parse_time']:.1f}s, llm {result['llm_time']:.1f}s"
+        print(f"[{done}/{total}] {status} {os.path.basename(result['path'])} ({detail})", flush=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = list_pdfs(args.source, extract_dir=tmp)
+        if not paths:
+            print("Nenhum PDF encontrado.")
+            return 1
+
+        started = time.perf_counter()
+        results = screen_batch(paths, llm, schema, job_details, prompt_template, prompt_score, fields,
+                               parse_workers=args.parse_workers, llm_concurrency=args.concurrency,
+                               prefilter_args=prefilter_args, prerank_top_k=args.top_k,
+                               dedup_db=args.db, on_progress=report)
+        elapsed = time.perf_counter() - started
+
+    ok = [r for r in results if r["status"] == "ok"]
+    print(f"{len(ok)}/{len(results)} currículos analisados em {elapsed:.1f}s "
+          f"({len(results) / elapsed * 60:.1f} por minuto)")
+    stats = screening_stats.summary()
+    print(f"pré-filtro: {stats['evaluated']} avaliados, {stats['llm_calls_avoided']} chamadas ao LLM evitadas "
+          f"(média {stats['prefilter_avg_ms']:.1f} ms) · LLM: {stats['llm_calls']} chamadas "
+          f"(média {stats['llm_avg_s']:.1f} s)")
+    return 0 if all(r["status"] != "error" for r in results) else 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,107 @@
+"""
+Benchmark do orçamento de tokens: para cada currículo, compara o prompt completo
+com o prompt compactado/cortado (budget.py) em tokens, custo estimado, latência
+e diferença de score devolvido pelo LLM.
+
+Chama o LLM de verdade (GROQ_API_KEY no .env), duas vezes por currículo e sem cache.
+
+Uso:
+    python benchmarks/bench_budget.py curriculos/ [--budget 3000] [--limit 10] [--json resultado.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def _analyze(config, llm, prompt_template, content, token_budget):
+    import budget
+    from utils import format_res, get_chain, parse_res_llm
+
+    inputs, report = budget.build_prompt_inputs(config.schema, config.job["details"], config.prompt_score,
+                                                content, token_budget)
+    started = time.perf_counter()
+    output = get_chain(prompt_template, llm).invoke(inputs)
+    elapsed = time.perf_counter() - started
+    usage = budget.log_usage(config.id_model, report, output)
+    data = parse_res_llm(format_res(output.content), config.fields) or {}
+    return {
+        "score": data.get("score"),
+        "input_tokens": usage["input_tokens"] or usage["prompt_tokens_estimated"],
+        "output_tokens": usage["output_tokens"],
+        "cost_usd": usage["cost_usd"],
+        "latency_s": elapsed,
+        "dropped_sections": report["dropped_sections"],
+    }
+
+
+def run(source, token_budget, limit=None):
+    from dotenv import load_dotenv
+
+    import config
+    from batch import list_pdfs
+    from utils import build_prompt_template, load_llm, parse_doc_cached
+
+    load_dotenv()
+    llm = load_llm(config.id_model, config.temperature)
+    prompt_template = build_prompt_template(config.prompt_text)
+
+    rows = []
+    for path in list_pdfs(source)[:limit]:
+        content = parse_doc_cached(path)
+        full = _analyze(config, llm, prompt_template, content, None)
+        fitted = _analyze(config, llm, prompt_template, content, token_budget)
+        drift = (None if full["score"] is None or fitted["score"] is None
+                 else float(fitted["score"]) - float(full["score"]))
+        rows.append({"file": os.path.basename(path), "full": full, "budget": fitted, "score_drift": drift})
+        print(f"{os.path.basename(path)[:40]:<40} tokens {full['input_tokens']:>6} -> {fitted['input_tokens']:>6}  "
+              f"score {full['score']} -> {fitted['score']}", flush=True)
+
+    def total(kind, field):
+        return sum(r[kind][field] or 0 for r in rows)
+
+    drifts = [abs(r["score_drift"]) for r in rows if r["score_drift"] is not None]
+    return {
+        "budget": token_budget,
+        "cvs": len(rows),
+        "input_tokens": {"full": total("full", "input_tokens"), "budget": total("budget", "input_tokens")},
+        "cost_usd": {"full": total("full", "cost_usd"), "budget": total("budget", "cost_usd")},
+        "latency_mean_s": {kind: statistics.fmean(r[kind]["latency_s"] for r in rows) if rows else 0.0
+                           for kind in ("full", "budget")},
+        "abs_score_drift": {"mean": statistics.fmean(drifts) if drifts else None,
+                            "max": max(drifts) if drifts else None},
+        "rows": rows,
+    }
+
+
+def main(argv=None):
+    import budget
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("source", help="Pasta com PDFs ou arquivo .zip")
+    parser.add_argument("--budget", type=int, default=budget.CV_TOKEN_BUDGET, help="Orçamento de tokens do currículo")
+    parser.add_argument("--limit", type=int, help="Quantidade máxima de currículos")
+    parser.add_argument("--json", help="Grava o resultado em JSON neste arquivo")
+    args = parser.parse_args(argv)
+
+    result = run(args.source, args.budget, args.limit)
+    tokens, cost = result["input_tokens"], result["cost_usd"]
+    saved = 1 - tokens["budget"] / tokens["full"] if tokens["full"] else 0.0
+    print(f"tokens de entrada: {tokens['full']} -> {tokens['budget']} ({saved:.0%} a menos)")
+    print(f"custo estimado: US$ {cost['full']:.4f} -> US$ {cost['budget']:.4f}")
+    print(f"latência média: {result['latency_mean_s']['full']:.1f} s -> {result['latency_mean_s']['budget']:.1f} s")
+    drift = result["abs_score_drift"]
+    if drift["mean"] is not None:
+        print(f"diferença de score: média {drift['mean']:.2f}, máxima {drift['max']:.2f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""
+Benchmark offline do pipeline de análise: parse_doc, process_cv/analyze_cv,
+parse_res_llm, save_json_cv e display_json_table.
+
+Usa currículos sintéticos (benchmarks/corpus.py) e o modelo local
+benchmarks/fake_llm.py no lugar do ChatGroq, então roda sem rede e sem chave
+de API. Mede percentis de latência por etapa, vazão, pico de memória (RSS) e o
+comportamento do banco conforme ele cresce. Com --baseline, compara o p50 de
+cada etapa com um resultado anterior e termina com código 1 se houver regressão.
+
+Uso:
+    python benchmarks/bench_pipeline.py [--count 20] [--size medium] [--latency 0.05]
+        [--store-sizes 100 1000 10000] [--json resultado.json] [--baseline anterior.json]
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def _summary(values):
+    if not values:
+        return {"n": 0}
+    total = sum(values)
+    return {
+        "n": len(values),
+        "p50_ms": _percentile(values, 0.50) * 1000,
+        "p90_ms": _percentile(values, 0.90) * 1000,
+        "p99_ms": _percentile(values, 0.99) * 1000,
+        "max_ms": max(values) * 1000,
+        "throughput_per_s": len(values) / total if total else None,
+    }
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB, macOS em bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def _fill_store(path_db, target, start):
+    import storage
+    from corpus import make_cv_markdown
+
+    # Preenche direto em uma transação: só o custo das operações medidas interessa
+    with storage.connect(path_db) as conn:
+        for i in range(start, target):
+            markdown = make_cv_markdown(1_000_000 + i, "small")
+            data = {"name": f"Sintético {i}", "area": "Desenvolvimento", "score": (i * 37 % 100) / 10,
+                    "summary": markdown[:200], "skills": ["Python", "SQL"], "education": "Bacharelado"}
+            storage._insert(conn, data, "name", markdown)
+
+
+def run(count=20, size="medium", latency=0.05, jitter=0.0, concurrency=4, store_sizes=(100, 1000),
+        skip_parse=False, responses=None):
+    import config
+    from corpus import generate
+    from fake_llm import FakeChatModel, load_responses
+    from utils import (analyze_cv, build_prompt_template, display_json_table, parse_doc, parse_res_llm,
+                       process_cv, query_cv_page, save_json_cv)
+
+    llm = FakeChatModel(latency=latency, jitter=jitter,
+                        responses=load_responses(responses) if responses else [])
+    prompt_template = build_prompt_template(config.prompt_text)
+    prompt_args = (config.schema, config.job["details"], prompt_template, config.prompt_score, llm)
+    result = {"config": {"count": count, "size": size, "latency": latency, "jitter": jitter,
+                         "concurrency": concurrency, "store_sizes": list(store_sizes)},
+              "stages": {}, "peak_rss_mb": {}, "store_scaling": []}
+    stages = result["stages"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = generate(os.path.join(tmp, "cvs"), count, size)
+        pdfs = [p for p in paths if p.endswith(".pdf")]
+        contents = []
+        for p in paths:
+            if p.endswith(".md"):
+                with open(p, encoding="utf-8") as f:
+                    contents.append(f.read())
+
+        # Leitura dos PDFs (docling); sem docling, as etapas seguintes usam o markdown gerado
+        if skip_parse:
+            stages["parse_doc"] = {"skipped": "--skip-parse"}
+        else:
+            try:
+                parsed, times = [], []
+                for p in pdfs:
+                    content, elapsed = _timed(parse_doc, p)
+                    parsed.append(content)
+                    times.append(elapsed)
+                contents = parsed
+                stages["parse_doc"] = _summary(times)
+                stages["process_cv"] = _summary([_timed(process_cv, *prompt_args, p)[1] for p in pdfs])
+            except ImportError as e:
+                stages["parse_doc"] = {"skipped": f"docling indisponível: {e}"}
+        result["peak_rss_mb"]["parse_doc"] = _peak_rss_mb()
+
+        outputs, times = [], []
+        for content in contents:
+            (output, res), elapsed = _timed(analyze_cv, *prompt_args, content)
+            outputs.append(res)
+            times.append(elapsed)
+        stages["analyze_cv"] = _summary(times)
+
+        # Vazão com chamadas simultâneas, como na triagem em lote
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(lambda c: analyze_cv(*prompt_args, c), contents))
+        wall = time.perf_counter() - started
+        stages["analyze_cv_concurrent"] = {"n": len(contents), "wall_s": wall,
+                                           "throughput_per_s": len(contents) / wall if wall else None}
+        result["peak_rss_mb"]["analyze_cv"] = _peak_rss_mb()
+
+        records, times = [], []
+        for res in outputs:
+            data, elapsed = _timed(parse_res_llm, res, config.fields)
+            records.append(data)
+            times.append(elapsed)
+        stages["parse_res_llm"] = _summary(times)
+        stages["parse_res_llm"]["invalid"] = sum(r is None for r in records)
+
+        path_db = os.path.join(tmp, "bench.db")
+        stages["save_json_cv"] = _summary([
+            _timed(save_json_cv, data, path_db=path_db, key_name="name", markdown=content, warn=False)[1]
+            for data, content in zip(records, contents) if data
+        ])
+        stages["display_json_table"] = _summary([_timed(display_json_table, path_db)[1] for _ in range(5)])
+        result["peak_rss_mb"]["storage"] = _peak_rss_mb()
+
+        # Escala do banco: custo das operações conforme o número de currículos armazenados
+        from storage import count_cv
+        for target in sorted(store_sizes):
+            _fill_store(path_db, target, count_cv(path_db))
+            extra = [dict(data, name=f"{data.get('name')} extra {target} {i}")
+                     for i, data in enumerate(r for r in records if r)][:10]
+            result["store_scaling"].append({
+                "records": count_cv(path_db),
+                "db_bytes": sum(os.path.getsize(path_db + suffix) for suffix in ("", "-wal")
+                                if os.path.exists(path_db + suffix)),
+                "save_json_cv": _summary([_timed(save_json_cv, data, path_db=path_db, warn=False)[1]
+                                          for data in extra]),
+                "query_cv_page": _summary([_timed(query_cv_page, path_db)[1] for _ in range(10)]),
+                "display_json_table": _summary([_timed(display_json_table, path_db)[1] for _ in range(3)]),
+                "peak_rss_mb": _peak_rss_mb(),
+            })
+    return result
+
+
+def compare(result, baseline, tolerance):
+    """Etapas cujo p50 piorou mais que `tolerance` (fração) em relação ao baseline."""
+    regressions = []
+    for stage, summary in result["stages"].items():
+        before = baseline.get("stages", {}).get(stage, {}).get("p50_ms")
+        after = summary.get("p50_ms")
+        if before and after and after > before * (1 + tolerance):
+            regressions.append({"stage": stage, "baseline_p50_ms": before, "p50_ms": after})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=20, help="Currículos sintéticos")
+    parser.add_argument("--size", default="medium", help="small, medium, large ou número de experiências")
+    parser.add_argument("--latency", type=float, default=0.05, help="Latência do modelo local (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variação da latência (s)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Chamadas simultâneas na medida de vazão")
+    parser.add_argument("--store-sizes", type=int, nargs="*", default=[100, 1000], help="Tamanhos do banco")
+    parser.add_argument("--responses", help="Respostas gravadas (JSONL com {\"content\": ...})")
+    parser.add_argument("--skip-parse", action="store_true", help="Não mede o docling")
+    parser.add_argument("--json", help="Grava o resultado em JSON neste arquivo")
+    parser.add_argument("--baseline", help="Resultado anterior (JSON) para detectar regressões")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Piora tolerada do p50 (fração)")
+    args = parser.parse_args(argv)
+
+    result = run(args.count, args.size, args.latency, args.jitter, args.concurrency, args.store_sizes,
+                 args.skip_parse, args.responses)
+    for stage, r in result["stages"].items():
+        if "p50_ms" in r:
+            print(f"{stage:>22}: n={r['n']:<4} p50={r['p50_ms']:9.2f} ms  p90={r['p90_ms']:9.2f} ms  "
+                  f"p99={r['p99_ms']:9.2f} ms  vazão={r['throughput_per_s'] or 0:8.1f}/s")
+        elif "wall_s" in r:
+            print(f"{stage:>22}: n={r['n']:<4} total={r['wall_s']:.2f} s  vazão={r['throughput_per_s'] or 0:.1f}/s")
+        else:
+            print(f"{stage:>22}: ignorada ({r['skipped']})")
+    for row in result["store_scaling"]:
+        print(f"banco com {row['records']:>7} registros ({row['db_bytes'] / 1e6:7.1f} MB): "
+              f"save p50={row['save_json_cv'].get('p50_ms', 0):.2f} ms  "
+              f"página p50={row['query_cv_page']['p50_ms']:.2f} ms  "
+              f"tabela p50={row['display_json_table']['p50_ms']:.1f} ms  RSS={row['peak_rss_mb']:.0f} MB")
+    peaks = list(result["peak_rss_mb"].values()) + [row["peak_rss_mb"] for row in result["store_scaling"]]
+    print(f"pico de RSS: {max(peaks):.0f} MB")
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        result["regressions"] = regressions
+        for r in regressions:
+            print(f"REGRESSÃO {r['stage']}: p50 {r['baseline_p50_ms']:.2f} ms -> {r['p50_ms']:.2f} ms")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
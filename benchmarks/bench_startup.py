@@ -0,0 +1,89 @@
+"""
+Benchmark de inicialização do app: latência do primeiro run (processo novo,
+imports e recursos ainda não carregados) contra reruns no mesmo processo.
+
+Usa o streamlit.testing (AppTest), sem abrir navegador nem chamar o LLM.
+
+Uso:
+    python benchmarks/bench_startup.py [--cold 3] [--warm 10] [--json resultado.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Executado em um processo novo: mede o run frio e, em seguida, os reruns quentes
+_RUNNER = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("app03.py", default_timeout=120)
+t1 = time.perf_counter()
+at.run()
+t2 = time.perf_counter()
+warm = []
+for _ in range(int(sys.argv[1])):
+    t = time.perf_counter()
+    at.run()
+    warm.append(time.perf_counter() - t)
+errors = [str(e.value) for e in at.exception]
+print(json.dumps({"import_streamlit": t1 - t0, "cold": t2 - t1, "warm": warm, "errors": errors}))
+"""
+
+
+def _summary(values):
+    values = sorted(values)
+    return {
+        "n": len(values),
+        "mean_ms": statistics.fmean(values) * 1000,
+        "p50_ms": values[len(values) // 2] * 1000,
+        "max_ms": values[-1] * 1000,
+    }
+
+
+def run(cold_runs=3, warm_runs=10):
+    env = dict(os.environ)
+    env.setdefault("GROQ_API_KEY", "bench")
+    cold, warm, errors = [], [], []
+    # Banco isolado, para não tocar nos dados reais
+    with tempfile.TemporaryDirectory() as tmp:
+        for f in os.listdir(ROOT):
+            if f.endswith(".py"):
+                os.symlink(os.path.join(ROOT, f), os.path.join(tmp, f))
+        for _ in range(cold_runs):
+            out = subprocess.run([sys.executable, "-c", _RUNNER, str(warm_runs)], cwd=tmp, env=env,
+                                 capture_output=True, text=True, check=True)
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            cold.append(result["cold"])
+            warm.extend(result["warm"])
+            errors.extend(result["errors"])
+    return {"cold": _summary(cold), "warm": _summary(warm), "errors": sorted(set(errors))}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cold", type=int, default=3, help="Processos novos (runs frios)")
+    parser.add_argument("--warm", type=int, default=10, help="Reruns por processo (runs quentes)")
+    parser.add_argument("--json", help="Grava o resultado em JSON neste arquivo")
+    args = parser.parse_args(argv)
+
+    result = run(args.cold, args.warm)
+    for kind in ("cold", "warm"):
+        r = result[kind]
+        print(f"{kind:>5}: n={r['n']:<3} média={r['mean_ms']:8.1f} ms  p50={r['p50_ms']:8.1f} ms  "
+              f"máx={r['max_ms']:8.1f} ms")
+    print(f"speedup (p50 frio / p50 quente): {result['cold']['p50_ms'] / result['warm']['p50_ms']:.1f}x")
+    for error in result["errors"]:
+        print(f"aviso: exceção no app: {error}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Verificação de regressão da gravação de currículos (utils.save_json_cv): dois
+candidatos com o mesmo nome e e-mails/conteúdo diferentes são pessoas
+diferentes e os dois precisam ficar gravados (o segundo sob outra chave), em
+vez de o segundo bater no índice único de cv_key e ser descartado. Markdown
+vazio não conta como conteúdo igual. A matriz candidato x vaga
+(multijob.save_job_scores) usa a mesma chave da lista.
+
+Uso:
+    python benchmarks/check_dedup.py
+"""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.dirname(os.path.abspath(__file__))]
+
+import storage  # noqa: E402
+from multijob import save_job_scores  # noqa: E402
+from corpus import make_cv_markdown  # noqa: E402
+from utils import save_json_cv  # noqa: E402
+
+
+def check_homonyms_persist():
+    with tempfile.TemporaryDirectory() as tmp:
+        path_db = os.path.join(tmp, "curriculos.db")
+        keys = [save_json_cv({"name": "Ana Souza", "area": "Dados", "score": 7}, path_db,
+                             markdown=make_cv_markdown(seed), warn=False) for seed in (1, 2)]
+        assert all(keys), keys
+        assert storage.count_cv(path_db) == 2, storage.count_cv(path_db)
+        # O mesmo currículo de novo continua sendo duplicado
+        assert not save_json_cv({"name": "Ana Souza"}, path_db, markdown=make_cv_markdown(1), warn=False)
+        assert storage.count_cv(path_db) == 2, storage.count_cv(path_db)
+
+
+def check_empty_markdown_is_not_a_match():
+    with tempfile.TemporaryDirectory() as tmp:
+        path_db = os.path.join(tmp, "curriculos.db")
+        keys = [save_json_cv({"name": name}, path_db, markdown=markdown, warn=False)
+                for name, markdown in (("Ana Souza", ""), ("Bruno Lima", None), ("Ana Souza", ""))]
+        assert all(keys), keys
+        assert storage.count_cv(path_db) == 3, storage.count_cv(path_db)
+
+
+def check_job_scores_follow_cv_key():
+    with tempfile.TemporaryDirectory() as tmp:
+        path_db = os.path.join(tmp, "curriculos.db")
+        keys = [save_job_scores(path_db, {"profile": {"name": "Ana Souza"}, "scores": {"vaga": {"score": seed}},
+                                          "errors": {}}, primary_job_id="vaga", markdown=make_cv_markdown(seed))
+                for seed in (1, 2)]
+        matrix = storage.score_matrix(path_db)
+        assert len(set(keys)) == 2 and set(matrix) == set(keys), (keys, matrix)
+        assert [matrix[key]["vaga"] for key in keys] == [1.0, 2.0], matrix
+
+
+def main():
+    for check in (check_homonyms_persist, check_empty_markdown_is_not_a_match, check_job_scores_follow_cv_key):
+        check()
+        print(f"ok  {check.__name__}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Verificação de regressão do roteador de LLMs (llm_router.py) com o
+FakeChatModel: um stream fechado pelo consumidor antes do fim precisa
+devolver a vaga do backend e não pode deixar a chamada de teste do circuito
+presa (senão o backend fica indisponível até o processo reiniciar). Com vários
+backends, tokens e custo são registrados pelo modelo do backend que respondeu.
+
+Uso:
+    python benchmarks/check_router.py
+"""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.dirname(os.path.abspath(__file__))]
+
+import budget  # noqa: E402
+from fake_llm import FakeChatModel  # noqa: E402
+from llm_router import Backend, LLMRouter  # noqa: E402
+
+PROMPT = 'Responda em JSON:\n{\n  "score": 0\n}'
+
+
+def _router(**options):
+    backend = Backend("fake", FakeChatModel(chunk_size=4), initial_concurrency=1, max_concurrency=1, **options)
+    return LLMRouter.from_backends([backend], max_wait=0.5), backend
+
+
+def check_stream_closed_early():
+    router, backend = _router()
+    stream = router.stream(PROMPT)
+    next(stream)
+    stream.close()
+    assert backend.limiter.in_flight == 0, backend.stats()
+    assert backend.error_rate == 0.0 and backend.latency is None, backend.stats()
+    # Com concorrência 1, a vaga presa faria esta chamada esperar max_wait e falhar
+    assert router.invoke(PROMPT).content
+
+
+def check_probe_cancelled():
+    router, backend = _router(cooldown=0.05)
+    backend.breaker.state, backend.breaker.opened_at = "open", time.monotonic() - 1
+    stream = router.stream(PROMPT)
+    next(stream)
+    assert backend.breaker.state == "half_open" and backend.breaker.probing
+    stream.close()
+    assert not backend.breaker.probing and backend.breaker.probe_ready(), backend.stats()
+    router.invoke(PROMPT)
+    assert backend.breaker.state == "closed", backend.stats()
+
+
+def check_usage_by_served_model():
+    backends = [Backend(name, FakeChatModel(chunk_size=4), model="llama-3.1-8b-instant" if name == "b" else name,
+                        initial_concurrency=1, max_concurrency=1) for name in ("a", "b")]
+    router = LLMRouter.from_backends(backends, max_wait=0.5)
+    backends[0].breaker.state, backends[0].breaker.opened_at = "open", time.monotonic()
+    report = {"original_tokens": 10, "final_tokens": 10, "prompt_tokens": 10, "dropped_sections": []}
+    streamed = None
+    for chunk in router.stream(PROMPT):
+        streamed = chunk if streamed is None else streamed + chunk
+    for output in (router.invoke(PROMPT), streamed):
+        record = budget.log_usage(router.model_name, report, output)
+        assert record["backend"] == "b" and record["model"] == "llama-3.1-8b-instant", record
+        assert record["cost_usd"] is not None, record
+
+
+def main():
+    for check in (check_stream_closed_early, check_probe_cancelled, check_usage_by_served_model):
+        check()
+        print(f"ok  {check.__name__}")
+
+
+if __name__ == "__main__":
+    main()
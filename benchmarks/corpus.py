@@ -0,0 +1,167 @@
+"""
+Gerador de currículos sintéticos (markdown e PDF) para os benchmarks.
+
+Os currículos são determinísticos (mesma semente, mesmo texto) e o PDF é
+escrito diretamente, sem nenhuma dependência, com texto selecionável para que
+o docling faça a extração normal (sem OCR).
+
+Uso:
+    python benchmarks/corpus.py pasta_saida [--count 50] [--size medium] [--format pdf md]
+"""
+import argparse
+import os
+import random
+import textwrap
+import unicodedata
+
+# Número de experiências profissionais por tamanho de currículo
+SIZES = {"small": 2, "medium": 6, "large": 20}
+
+_FIRST_NAMES = ["Ana", "Bruno", "Carla", "Diego", "Eduarda", "Felipe", "Gabriela", "Henrique", "Isabela", "João",
+                "Larissa", "Marcos", "Natália", "Otávio", "Paula", "Rafael", "Sofia", "Tiago", "Vanessa", "William"]
+_LAST_NAMES = ["Silva", "Souza", "Oliveira", "Santos", "Pereira", "Lima", "Carvalho", "Ferreira", "Rodrigues",
+               "Almeida", "Costa", "Gomes", "Martins", "Araújo", "Ribeiro", "Barbosa", "Rocha", "Dias"]
+_AREAS = {
+    "Desenvolvimento": ("Desenvolvedor(a)", ["Python", "JavaScript", "SQL", "React", "Node.js", "Django", "Git",
+                                            "Docker", "AWS", "Google Cloud Platform", "TypeScript", "Kubernetes"]),
+    "Marketing": ("Analista de Marketing", ["SEO", "Google Ads", "Branding", "Copywriting", "Redes sociais",
+                                            "Inbound", "Tráfego pago", "Analytics"]),
+    "Vendas": ("Consultor(a) Comercial", ["Prospecção", "Negociação", "CRM", "Funil de vendas", "B2B", "B2C",
+                                          "Gestão de carteira"]),
+    "Financeiro": ("Analista Financeiro", ["Contabilidade", "Conciliação", "Orçamento", "Tesouraria", "Excel",
+                                           "Auditoria", "Impostos"]),
+    "Administrativo": ("Assistente Administrativo", ["Atendimento", "Rotinas administrativas", "Excel", "Compras",
+                                                     "Arquivo", "Agenda", "Protocolo"]),
+}
+_COMPANIES = ["Acme Tecnologia", "Grupo Horizonte", "Nova Era Serviços", "Banco Central Sul", "Loja Azul",
+              "Construtora Delta", "Agência Pixel", "Hospital Santa Luz", "Transportes Rápido", "Startup Faísca"]
+_COURSES = ["Ciência da Computação", "Sistemas de Informação", "Administração", "Ciências Contábeis",
+            "Publicidade e Propaganda", "Engenharia de Produção", "Economia"]
+_UNIVERSITIES = ["USP", "Unicamp", "UFMG", "UFRJ", "PUC-RS", "UFSC", "Mackenzie"]
+_SENTENCES = [
+    "Responsável por {skill} em projetos de grande porte, com foco em qualidade e prazos.",
+    "Liderou a adoção de {skill}, reduzindo o retrabalho da equipe em {n}%.",
+    "Atuou com {skill} junto às áreas de produto e operações.",
+    "Implantou indicadores de desempenho e rotinas de {skill}.",
+    "Conduziu treinamentos internos sobre {skill} para {n} colaboradores.",
+    "Participou da migração de processos legados, aplicando {skill}.",
+]
+
+
+def make_cv_markdown(seed, size="medium"):
+    """Currículo sintético em markdown (mesmo formato geral da saída do docling)."""
+    rng = random.Random(seed)
+    name = f"{rng.choice(_FIRST_NAMES)} {rng.choice(_LAST_NAMES)} {rng.choice(_LAST_NAMES)} {seed}"
+    area = rng.choice(list(_AREAS))
+    role, skills = _AREAS[area]
+    experiences = SIZES[size] if size in SIZES else int(size)
+
+    login = unicodedata.normalize("NFKD", name.split()[0].lower()).encode("ascii", "ignore").decode()
+    lines = [f"# {name}", "", f"{login}.{seed}@exemplo.com · (11) 9{rng.randint(1000, 9999)}-"
+             f"{rng.randint(1000, 9999)} · São Paulo - SP", "", "## Resumo", "",
+             f"{role} com {rng.randint(1, 15)} anos de experiência em {', '.join(rng.sample(skills, 3))}.", "",
+             "## Experiência Profissional", ""]
+    year = 2025
+    for _ in range(experiences):
+        start = year - rng.randint(1, 4)
+        lines += [f"### {role} - {rng.choice(_COMPANIES)} ({start} - {year})", ""]
+        for _ in range(rng.randint(2, 5)):
+            lines.append("- " + rng.choice(_SENTENCES).format(skill=rng.choice(skills), n=rng.randint(5, 60)))
+        lines.append("")
+        year = start
+
+    lines += ["## Competências", "", ", ".join(rng.sample(skills, min(len(skills), rng.randint(4, 8)))), "",
+              "## Formação Acadêmica", "",
+              f"Bacharelado em {rng.choice(_COURSES)} - {rng.choice(_UNIVERSITIES)} ({year - 4} - {year})", "",
+              "## Idiomas", "", "Inglês avançado, espanhol intermediário", ""]
+    if experiences > SIZES["medium"]:
+        lines += ["## Publicações", ""]
+        lines += [f"- Estudo de caso {i}: {rng.choice(skills)} aplicado a {rng.choice(_COMPANIES)}"
+                  for i in range(experiences)]
+    return "\n".join(lines).strip() + "\n"
+
+
+def _pdf_escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(markdown, path, lines_per_page=48):
+    """Grava o markdown como PDF de texto simples (títulos em negrito)."""
+    rendered = []
+    for line in markdown.splitlines():
+        heading = line.startswith("#")
+        text = line.lstrip("#").strip()
+        for part in textwrap.wrap(text, 95) or [""]:
+            rendered.append((heading, part))
+    pages = [rendered[i:i + lines_per_page] for i in range(0, len(rendered), lines_per_page)] or [[]]
+
+    # Objetos: 1 catálogo, 2 páginas, 3 e 4 fontes, depois (página, conteúdo) para cada página
+    objects = [None, None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>"]
+    kids = []
+    for page in pages:
+        ops = ["BT", "50 800 Td"]
+        for heading, text in page:
+            ops.append(f"/{'F2' if heading else 'F1'} {13 if heading else 10} Tf")
+            ops.append(f"({_pdf_escape(text)}) Tj 0 -15 Td")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("cp1252", "replace")
+        page_num = len(objects) + 1
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents {page_num + 1} 0 R "
+                       f"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>".encode())
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        kids.append(f"{page_num} 0 R")
+    objects[0] = b"<< /Type /Catalog /Pages 2 0 R >>"
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + obj + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def generate(out_dir, count=50, size="medium", formats=("pdf", "md"), seed=0):
+    """
+    Gera `count` currículos em out_dir.
+
+    Returns:
+        list: Caminhos gerados (um por currículo e formato)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for i in range(count):
+        markdown = make_cv_markdown(seed + i, size)
+        base = os.path.join(out_dir, f"cv_{size}_{seed + i:05d}")
+        if "md" in formats:
+            with open(base + ".md", "w", encoding="utf-8") as f:
+                f.write(markdown)
+            paths.append(base + ".md")
+        if "pdf" in formats:
+            write_pdf(markdown, base + ".pdf")
+            paths.append(base + ".pdf")
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("out_dir", help="Pasta de saída")
+    parser.add_argument("--count", type=int, default=50, help="Quantidade de currículos")
+    parser.add_argument("--size", default="medium", help=f"{', '.join(SIZES)} ou número de experiências")
+    parser.add_argument("--format", nargs="+", default=["pdf", "md"], choices=["pdf", "md"])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    paths = generate(args.out_dir, args.count, args.size, args.format, args.seed)
+    print(f"{len(paths)} arquivos gerados em {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
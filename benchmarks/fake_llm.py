@@ -0,0 +1,113 @@
+"""
+Modelo de chat local que substitui o ChatGroq nos benchmarks (sem rede e sem custo).
+
+Responde com respostas gravadas (arquivo JSONL com {"content": ...} por linha)
+ou, por padrão, gera uma resposta a partir do schema presente no próprio
+prompt, no mesmo formato do modelo de raciocínio (<think>...</think> + JSON).
+A latência, o tamanho do raciocínio e a taxa de falhas são configuráveis.
+"""
+import hashlib
+import json
+import random
+import re
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict
+
+_SCHEMA_KEY_RE = re.compile(r'^\s*"(\w+)":\s*(\S)', re.M)
+_NAME_RE = re.compile(r"^'?#\s+([^\n#]+)", re.M)
+
+
+def load_responses(path):
+    """Respostas gravadas: JSONL com {"content": ...} por linha, ou lista JSON de textos."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        return [str(item) for item in json.loads(text)]
+    return [json.loads(line)["content"] for line in text.splitlines() if line.strip()]
+
+
+def render_response(prompt, think_chars=400):
+    """Resposta determinística (pelo hash do prompt) com os campos do schema presente no prompt."""
+    rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+    name = _NAME_RE.search(prompt)
+    data = {}
+    for key, first in _SCHEMA_KEY_RE.findall(prompt):
+        if key in data:
+            continue
+        if key == "score":
+            data[key] = round(rng.uniform(2.0, 9.5), 1)
+        elif key == "name":
+            data[key] = name.group(1).strip() if name else "Candidato"
+        elif first == "[":
+            data[key] = [f"{key} {i + 1}" for i in range(rng.randint(2, 4))]
+        else:
+            data[key] = f"{key} gerado localmente"
+    thinking = f"<think>{'.' * think_chars}</think>\n" if think_chars else ""
+    return thinking + json.dumps(data, ensure_ascii=False, indent=2)
+
+
+def usage(prompt, text):
+    input_tokens, output_tokens = (len(prompt) + 3) // 4, (len(text) + 3) // 4
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens}
+
+
+class FakeChatModel(BaseChatModel):
+    model_config = ConfigDict(protected_namespaces=())
+
+    model_name: str = "fake-chat"
+    temperature: float = 0.0
+    latency: float = 0.0          # segundos por chamada
+    jitter: float = 0.0           # variação uniforme (+/-) da latência, em segundos
+    think_chars: int = 400        # tamanho do bloco <think> antes do JSON
+    error_rate: float = 0.0       # fração das chamadas que falham
+    chunk_size: int = 32          # caracteres por chunk no streaming
+    responses: list = []          # respostas gravadas; vazio = resposta gerada pelo schema do prompt
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    @staticmethod
+    def _prompt(messages):
+        return "\n".join(str(m.content) for m in messages)
+
+    def _respond(self, prompt):
+        if self.error_rate and random.random() < self.error_rate:
+            raise RuntimeError("falha simulada do modelo")
+        if self.responses:
+            digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+            return self.responses[int.from_bytes(digest[:4], "big") % len(self.responses)]
+        return render_response(prompt, self.think_chars)
+
+    def _sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def _delay(self):
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = self._prompt(messages)
+        text = self._respond(prompt)
+        self._sleep(self._delay())
+        message = AIMessage(content=text, usage_metadata=usage(prompt, text),
+                            response_metadata={"model_name": self.model_name})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = self._prompt(messages)
+        text = self._respond(prompt)
+        pieces = [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)] or [""]
+        delay = self._delay() / len(pieces)
+        for piece in pieces:
+            self._sleep(delay)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=usage(prompt, text)))
@@ -0,0 +1,182 @@
+"""
+Servidor local compatível com a API de chat da OpenAI, para testar o
+roteamento entre backends (llm_router.py) sem rede e sem chave de API.
+
+Responde em POST /v1/chat/completions (com ou sem "stream") usando a mesma
+resposta gerada pelo schema do prompt que o FakeChatModel, e em GET /v1/models.
+Latência, taxa de erros, limite de requisições por minuto (429 com
+Retry-After) e indisponibilidade total (503) são configuráveis.
+
+Uso:
+    python benchmarks/mock_llm_server.py [--port 8011] [--latency 0.2] [--error-rate 0.1] [--rpm 30] [--down]
+
+    LLM_BACKENDS='[{"name": "local", "provider": "openai", "model": "mock",
+                    "base_url": "http://127.0.0.1:8011/v1"}]' streamlit run app03.py
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_llm import render_response, usage  # noqa: E402
+
+
+class MockState:
+    def __init__(self, latency=0.2, jitter=0.0, error_rate=0.0, rpm=None, down=False, think_chars=400,
+                 chunk_size=32):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rpm = rpm
+        self.down = down
+        self.think_chars = think_chars
+        self.chunk_size = chunk_size
+        self.calls = deque()
+        self.lock = threading.Lock()
+
+    def admit(self):
+        """None se a chamada pode ser atendida; senão (status, mensagem, retry_after)."""
+        if self.down:
+            return 503, "servidor indisponível (--down)", None
+        if self.rpm:
+            now = time.monotonic()
+            with self.lock:
+                while self.calls and now - self.calls[0] > 60:
+                    self.calls.popleft()
+                if len(self.calls) >= self.rpm:
+                    return 429, "rate limit exceeded", max(1, int(60 - (now - self.calls[0])) + 1)
+                self.calls.append(now)
+        if self.error_rate and random.random() < self.error_rate:
+            return 500, "falha simulada do modelo", None
+        return None
+
+    def delay(self):
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _json(self, status, body, headers=None):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _error(self, status, message, retry_after=None):
+            headers = {"Retry-After": str(retry_after)} if retry_after else None
+            self._json(status, {"error": {"message": message, "type": "mock_error", "code": status}}, headers)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                self._json(200, {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "local"}]})
+            else:
+                self._error(404, "rota desconhecida")
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                request = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._error(400, "JSON inválido")
+                return
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._error(404, "rota desconhecida")
+                return
+            rejected = state.admit()
+            if rejected:
+                self._error(*rejected)
+                return
+
+            prompt = "\n".join(str(m.get("content", "")) for m in request.get("messages", []))
+            text = render_response(prompt, state.think_chars)
+            counts = usage(prompt, text)
+            usage_body = {"prompt_tokens": counts["input_tokens"], "completion_tokens": counts["output_tokens"],
+                          "total_tokens": counts["total_tokens"]}
+            model = request.get("model", "mock")
+            base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "created": int(time.time()), "model": model}
+            if not request.get("stream"):
+                time.sleep(state.delay())
+                self._json(200, {**base, "object": "chat.completion", "usage": usage_body,
+                                 "choices": [{"index": 0, "finish_reason": "stop",
+                                              "message": {"role": "assistant", "content": text}}]})
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            pieces = [text[i:i + state.chunk_size] for i in range(0, len(text), state.chunk_size)] or [""]
+            delay = state.delay() / len(pieces)
+            events = [{**base, "object": "chat.completion.chunk",
+                       "choices": [{"index": 0, "delta": {"role": "assistant", "content": piece} if i == 0
+                                    else {"content": piece}, "finish_reason": None}]}
+                      for i, piece in enumerate(pieces)]
+            events.append({**base, "object": "chat.completion.chunk",
+                           "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            if (request.get("stream_options") or {}).get("include_usage"):
+                events.append({**base, "object": "chat.completion.chunk", "choices": [], "usage": usage_body})
+            try:
+                for event in events:
+                    time.sleep(delay)
+                    self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            self.close_connection = True
+
+    return Handler
+
+
+def serve(port=8011, host="127.0.0.1", **options):
+    """Inicia o servidor em uma thread e o devolve (server.shutdown() para parar)."""
+    server = ThreadingHTTPServer((host, port), make_handler(MockState(**options)))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--latency", type=float, default=0.2, help="Latência por chamada (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variação da latência (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fração das chamadas que respondem 500")
+    parser.add_argument("--rpm", type=int, help="Requisições por minuto antes de responder 429")
+    parser.add_argument("--down", action="store_true", help="Responde 503 a todas as chamadas")
+    parser.add_argument("--think-chars", type=int, default=400, help="Tamanho do bloco <think>")
+    args = parser.parse_args(argv)
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(MockState(
+        args.latency, args.jitter, args.error_rate, args.rpm, args.down, args.think_chars)))
+    print(f"Servidor em http://{args.host}:{args.port}/v1 (Ctrl+C para parar)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Controle do orçamento de tokens do prompt de análise.
+
+O markdown do docling é compactado (linhas repetidas de cabeçalho/rodapé,
+marcadores de imagem, separadores de tabela e espaços em excesso) e dividido
+por seção; se ainda passar do orçamento, as seções de maior valor para a
+triagem (experiência, competências, formação) são mantidas e as demais
+(publicações, referências, hobbies...) são cortadas primeiro.
+
+Cada chamada registra a contagem de tokens e o custo estimado no logger
+"recursos_humanos.tokens".
+"""
+import logging
+import os
+import re
+from collections import Counter
+
+from metrics import metrics
+from search import tokenize
+
+CV_TOKEN_BUDGET = int(os.getenv("CV_TOKEN_BUDGET", "3000"))
+
+# Preço de referência em USD por 1 milhão de tokens: (entrada, saída)
+MODEL_PRICES = {
+    "deepseek-r1-distill-llama-70b": (0.75, 0.99),
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+    "llama-3.1-8b-instant": (0.05, 0.08),
+}
+
+# Prioridade das seções (menor = mais importante), reconhecidas por palavras-chave do título
+SECTION_PRIORITY = [
+    (0, "experiencia profissional trabalho atuacao historico carreira experience employment work"),
+    (1, "competencias habilidades skills tecnologias conhecimentos ferramentas tecnicas stack"),
+    (2, "formacao educacao academica graduacao escolaridade education"),
+    (3, "resumo perfil objetivo sobre summary profile objective"),
+    (4, "certificacoes certificados cursos idiomas linguas certifications courses languages"),
+    (5, "projetos portfolio projects"),
+    (8, "publicacoes artigos pesquisas referencias interesses hobbies voluntariado premios publications "
+        "references interests awards"),
+]
+_SECTION_KEYWORDS = [(priority, set(words.split())) for priority, words in SECTION_PRIORITY]
+_DEFAULT_PRIORITY = 6
+
+logger = logging.getLogger("recursos_humanos.tokens")
+
+_encoding = None
+
+
+def count_tokens(text):
+    """Conta tokens com o tiktoken, se instalado; senão usa a aproximação de ~4 caracteres por token."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def compact_markdown(markdown):
+    """Remove ruído do markdown do docling sem perder conteúdo."""
+    lines = [line.rstrip() for line in markdown.splitlines()]
+    # Linhas curtas repetidas várias vezes são cabeçalho/rodapé de página
+    repeated = {line for line, n in Counter(text.strip() for text in lines if text.strip()).items()
+                if n >= 3 and len(line) < 80 and not line.startswith(("-", "*", "|"))}
+    compacted = []
+    for line in lines:
+        stripped = line.strip()
+        if stripped in repeated or stripped == "<!-- image -->" or re.fullmatch(r"\|?[\s:|-]+\|?", stripped or "x"):
+            continue
+        line = re.sub(r"[ \t]{2,}", " ", line)
+        if not stripped and compacted and not compacted[-1].strip():
+            continue
+        compacted.append(line)
+    return "\n".join(compacted).strip()
+
+
+def compact_prompt_text(text):
+    """Tira indentação e espaços redundantes de textos fixos do prompt (schema, critérios)."""
+    return "\n".join(re.sub(r"\s{2,}", " ", line.strip()) for line in text.strip().splitlines())
+
+
+def split_sections(markdown):
+    """Divide o markdown em seções pelos títulos (#). Retorna lista de (título, texto)."""
+    sections = []
+    title, body = "", []
+    for line in markdown.splitlines():
+        if re.match(r"#{1,6}\s", line):
+            if title or any(text.strip() for text in body):
+                sections.append((title, "\n".join(body)))
+            title, body = line, [line]
+        else:
+            body.append(line)
+    sections.append((title, "\n".join(body)))
+    return sections
+
+
+def section_priority(title):
+    words = set(tokenize(title))
+    for priority, keywords in _SECTION_KEYWORDS:
+        if words & keywords:
+            return priority
+    # Texto antes do primeiro título (nome, contato, resumo) é sempre relevante
+    return 0 if not title else _DEFAULT_PRIORITY
+
+
+def fit_to_budget(markdown, max_tokens=CV_TOKEN_BUDGET):
+    """
+    Compacta o currículo e, se necessário, corta seções de menor prioridade até
+    caber em max_tokens. A ordem original das seções mantidas é preservada.
+
+    Returns:
+        tuple: (texto, relatório com original_tokens, final_tokens e dropped_sections)
+    """
+    original_tokens = count_tokens(markdown)
+    text = compact_markdown(markdown)
+    report = {"original_tokens": original_tokens, "dropped_sections": [], "truncated": False}
+    if not max_tokens or count_tokens(text) <= max_tokens:
+        report["final_tokens"] = count_tokens(text)
+        return text, report
+
+    sections = split_sections(text)
+    order = sorted(range(len(sections)), key=lambda i: (section_priority(sections[i][0]), i))
+    tokens = [count_tokens(body) for _, body in sections]
+    kept, used = {}, 0
+    for n, i in enumerate(order):
+        title, body = sections[i]
+        if used + tokens[i] <= max_tokens:
+            kept[i] = body
+            used += tokens[i]
+            continue
+        # Seção que não cabe inteira: entra só o começo, linha a linha, se for prioritária,
+        # deixando espaço para o início das demais seções prioritárias
+        reserve = sum(min(tokens[j], 150) for j in order[n + 1:] if section_priority(sections[j][0]) <= 2)
+        limit = max(max_tokens - reserve, used + 50)
+        if section_priority(title) <= 2 and max_tokens - used > 50:
+            partial = []
+            for line in body.splitlines():
+                line_tokens = count_tokens(line) + 1
+                if used + line_tokens > limit:
+                    break
+                partial.append(line)
+                used += line_tokens
+            kept[i] = "\n".join(partial + ["[...]"])
+            report["truncated"] = True
+        else:
+            report["dropped_sections"].append(title.lstrip("# ").strip() or "(início)")
+
+    text = "\n\n".join(kept[i].strip() for i in sorted(kept))
+    report["final_tokens"] = count_tokens(text)
+    return text, report
+
+
+def build_prompt_inputs(schema, job_details, prompt_score, content, token_budget=CV_TOKEN_BUDGET):
+    """
+    Variáveis do prompt de análise já dentro do orçamento. Com token_budget=None
+    o prompt vai sem nenhuma alteração (referência para o benchmark de orçamento).
+
+    Returns:
+        tuple: (dict para prompt_template, relatório do fit_to_budget + prompt_tokens estimado)
+    """
+    if token_budget is None:
+        tokens = count_tokens(content)
+        inputs = {"schema": schema, "cv": content, "job": job_details, "prompt_score": prompt_score}
+        report = {"original_tokens": tokens, "final_tokens": tokens, "dropped_sections": [], "truncated": False}
+    else:
+        cv, report = fit_to_budget(content, token_budget)
+        inputs = {
+            "schema": compact_prompt_text(schema),
+            "cv": cv,
+            "job": job_details,
+            "prompt_score": compact_prompt_text(prompt_score),
+        }
+    report["prompt_tokens"] = sum(count_tokens(str(v)) for v in inputs.values())
+    return inputs, report
+
+
+def usage_from_output(output):
+    """Tokens de entrada/saída informados pelo provedor na resposta (quando disponíveis)."""
+    usage = getattr(output, "usage_metadata", None) or {}
+    if usage:
+        return usage.get("input_tokens"), usage.get("output_tokens")
+    token_usage = (getattr(output, "response_metadata", None) or {}).get("token_usage") or {}
+    return token_usage.get("prompt_tokens"), token_usage.get("completion_tokens")
+
+
+def estimate_cost(model, input_tokens, output_tokens):
+    prices = MODEL_PRICES.get(model)
+    if prices is None or input_tokens is None:
+        return None
+    return (input_tokens * prices[0] + (output_tokens or 0) * prices[1]) / 1_000_000
+
+
+def served_model(output):
+    """(backend, modelo) que respondeu, quando a chamada passou pelo llm_router.LLMRouter."""
+    metadata = getattr(output, "response_metadata", None) or {}
+    return metadata.get("router_backend"), metadata.get("router_model")
+
+
+def log_usage(model, report, output=None):
+    """
+    Registra tokens (estimados e reais) e custo estimado de uma chamada. Retorna o registro.
+    O modelo do backend que respondeu (ver served_model) tem precedência sobre `model`.
+    """
+    input_tokens, output_tokens = usage_from_output(output) if output is not None else (None, None)
+    backend, served = served_model(output)
+    model = served or model
+    record = {
+        "model": model,
+        "backend": backend,
+        "cv_tokens_original": report["original_tokens"],
+        "cv_tokens_sent": report["final_tokens"],
+        "prompt_tokens_estimated": report.get("prompt_tokens"),
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "dropped_sections": report["dropped_sections"],
+        "cost_usd": estimate_cost(model, input_tokens or report.get("prompt_tokens"), output_tokens),
+    }
+    logger.info("tokens %s", record)
+    metrics.incr("llm_calls_total", model=model)
+    metrics.incr("llm_input_tokens_total", input_tokens or report.get("prompt_tokens") or 0, model=model,
+                 source="provider" if input_tokens is not None else "estimate")
+    metrics.incr("llm_output_tokens_total", output_tokens or 0, model=model)
+    if report["dropped_sections"] or report.get("truncated"):
+        metrics.incr("cv_truncated_total")
+    return record
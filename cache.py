@@ -0,0 +1,157 @@
+"""
+Cache persistente em disco, endereçado por conteúdo (hash), para os resultados
+caros do pipeline: o markdown gerado pelo docling e a análise do LLM.
+
+O armazenamento é um SQLite (seguro para várias sessões, threads e processos),
+com expiração por idade, limite de tamanho (remove os menos usados) e
+contadores de acerto/erro por namespace.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = os.getenv("CV_CACHE_PATH", os.path.join(".cache", "cv_cache.db"))
+CACHE_MAX_BYTES = int(os.getenv("CV_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+CACHE_MAX_AGE = float(os.getenv("CV_CACHE_MAX_AGE_DAYS", "30")) * 24 * 3600
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def text_hash(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class DiskCache:
+    def __init__(self, path=CACHE_PATH, max_bytes=CACHE_MAX_BYTES, max_age=CACHE_MAX_AGE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._local = threading.local()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._conn() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    namespace TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed_at)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS counters (
+                    namespace TEXT PRIMARY KEY,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    misses INTEGER NOT NULL DEFAULT 0
+                )""")
+
+    def _conn(self):
+        # Uma conexão por thread; WAL permite leituras concorrentes com uma escrita
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, conn, namespace, column):
+        conn.execute(f"""
+            INSERT INTO counters (namespace, {column}) VALUES (?, 1)
+            ON CONFLICT(namespace) DO UPDATE SET {column} = {column} + 1""", (namespace,))
+
+    def get(self, namespace, key):
+        """Retorna o valor armazenado (já desserializado) ou None."""
+        full_key = f"{namespace}:{key}"
+        now = time.time()
+        with self._conn() as conn:
+            row = conn.execute("SELECT value, created_at FROM entries WHERE key = ?", (full_key,)).fetchone()
+            if row is not None and now - row[1] > self.max_age:
+                conn.execute("DELETE FROM entries WHERE key = ?", (full_key,))
+                row = None
+            if row is None:
+                self._count(conn, namespace, "misses")
+                return None
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, full_key))
+            self._count(conn, namespace, "hits")
+        return json.loads(row[0])
+
+    def set(self, namespace, key, value):
+        payload = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute("""
+                INSERT OR REPLACE INTO entries (key, namespace, value, size, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?)""",
+                (f"{namespace}:{key}", namespace, payload, len(payload.encode("utf-8")), now, now))
+        self.evict()
+
+    def evict(self):
+        """Remove entradas expiradas e, se preciso, as menos acessadas até caber no limite."""
+        with self._conn() as conn:
+            conn.execute("DELETE FROM entries WHERE created_at < ?", (time.time() - self.max_age,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            freed = 0
+            victims = []
+            for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+                victims.append((key,))
+                freed += size
+                if total - freed <= self.max_bytes:
+                    break
+            conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+
+    def stats(self):
+        """Contadores de acerto/erro, número de entradas e bytes por namespace."""
+        conn = self._conn()
+        stats = {ns: {"hits": hits, "misses": misses, "entries": 0, "bytes": 0}
+                 for ns, hits, misses in conn.execute("SELECT namespace, hits, misses FROM counters")}
+        for ns, n, size in conn.execute("SELECT namespace, COUNT(*), SUM(size) FROM entries GROUP BY namespace"):
+            stats.setdefault(ns, {"hits": 0, "misses": 0})
+            stats[ns].update(entries=n, bytes=size)
+        return stats
+
+    def clear(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM entries")
+            conn.execute("DELETE FROM counters")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def _reset_cache():
+    # Conexões SQLite não podem ser compartilhadas com processos filhos (fork)
+    global _cache, _cache_lock
+    _cache = None
+    _cache_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_cache)
+
+
+def get_cache():
+    """Instância do cache compartilhada pelo processo."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DiskCache()
+        return _cache
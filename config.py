@@ -0,0 +1,229 @@
+"""
+Configuração compartilhada entre o app Streamlit (app03.py) e a triagem em lote (batch.py).
+"""
+# Configurações do modelo e arquivos
+id_model = "deepseek-r1-distill-llama-70b"
+temperature = 0.7
+db_file = 'curriculos.db'
+json_file = 'curriculos.json'  # formato legado, migrado para db_file na inicialização
+path_job_csv = "vagas.csv"  # formato legado, migrado para db_file na inicialização
+
+# Definição da vaga (hardcoded)
+job = {}
+job['title'] = "Desenvolvedor(a) Full Stack"
+job['description'] = "Estamos em busca de um(a) Desenvolvedor(a) Full Stack para integrar o time de tecnologia da nossa empresa, atuando em projetos estratégicos com foco em soluções escaláveis e orientadas a dados. O(a) profissional será responsável por desenvolver, manter e evoluir aplicações web robustas, além de colaborar com times multidisciplinares para entregar valor contínuo ao negócio."
+job['details'] = """
+Atividades:
+- Desenvolver e manter aplicações web em ambientes modernos, utilizando tecnologias back-end e front-end.
+- Trabalhar com equipes de produto, UX e dados para entender demandas e propor soluções.
+- Criar APIs, integrações e dashboards interativos.
+- Garantir boas práticas de versionamento, testes e documentação.
+- Participar de revisões de código, deploys e melhorias contínuas na arquitetura das aplicações.
+
+Pré-requisitos:
+- Sólidos conhecimentos em Python, JavaScript e SQL.
+- Experiência prática com frameworks como React, Node.js e Django.
+- Familiaridade com versionamento de código usando Git.
+- Experiência com serviços de nuvem, como AWS e Google Cloud Platform.
+- Capacidade de trabalhar em equipe, com boa comunicação e perfil colaborativo.
+
+Diferenciais:
+- Conhecimento em Power BI ou outras ferramentas de visualização de dados.
+- Experiência anterior em ambientes ágeis (Scrum, Kanban).
+- Projetos próprios, contribuições open source ou portfólio técnico disponível.
+- Certificações em nuvem ou áreas relacionadas à engenharia de software.
+"""
+
+# Área esperada para a vaga (usada pelo classificador do pré-filtro)
+job['area'] = "Desenvolvimento"
+
+# Pré-filtro determinístico (primeira etapa): só currículos com pontuação >= threshold
+# (competências dos pré-requisitos + classificador de área) seguem para o LLM
+prefilter_config = {
+    "enabled": True,
+    "threshold": 0.3,
+    "skill_weight": 0.7,
+    "area_weight": 0.3,
+}
+
+# Schema para extração de dados estruturados
+schema = """
+{
+  "name": "Nome completo do candidato",
+  "area": "Área ou setor principal que o candidato atua. Classifique em apenas uma: Desenvolvimento, Marketing, Vendas, Financeiro, Administrativo, Outros",
+  "summary": "Resumo objetivo sobre o perfil profissional do candidato",
+  "skills": ["competência 1", "competência 2", "..."],
+  "education": "Resumo da formação acadêmica mais relevante",
+  "interview_questions": ["Pelo menos 3 perguntas úteis para entrevista com base no currículo, para esclarecer algum ponto ou explorar melhor"],
+  "strengths": ["Pontos fortes e aspectos que indicam alinhamento com o perfil ou vaga desejada"],
+  "areas_for_development": ["Pontos que indicam possíveis lacunas, fragilidades ou necessidades de desenvolvimento"],
+  "important_considerations": ["Observações específicas que merecem verificação ou cuidado adicional"],
+  "final_recommendations": "Resumo avaliativo final com sugestões de próximos passos (ex: seguir com entrevista, indicar para outra vaga)",
+  "score": 0.0
+}
+"""
+
+# Campos obrigatórios para validação
+fields = [
+    "name",
+    "area",
+    "summary",
+    "skills",
+    "education",
+    "interview_questions",
+    "strengths",
+    "areas_for_development",
+    "important_considerations",
+    "final_recommendations",
+    "score"
+]
+
+# Critérios de pontuação
+prompt_score = """
+Com base na vaga específica, calcule a pontuação final (de 0.0 a 10.0).
+O retorno para esse campo deve conter apenas a pontuação final (x.x) sem mais nenhum texto ou anotação.
+Seja justo e rigoroso ao atribuir as notas. A nota 10.0 só deve ser atribuída para candidaturas que superem todas as expectativas da vaga.
+
+Critérios de avaliação:
+1. Experiência (Peso: 35% do total): Análise de posições anteriores, tempo de atuação e similaridade com as responsabilidades da vaga.
+2. Habilidades Técnicas (Peso: 25% do total): Verifique o alinhamento das habilidades técnicas com os requisitos mencionados na vaga.
+3. Educação (Peso: 15% do total): Avalie a relevância da graduação/certificações para o cargo, incluindo instituições e anos de estudo.
+4. Pontos Fortes (Peso: 15% do total): Avalie a relevância dos pontos fortes (ou alinhamentos) para a vaga.
+5. Pontos Fracos (Desconto de até 10%): Avalie a gravidade dos pontos fracos (ou desalinhamentos) para a vaga.
+"""
+
+# Template do prompt para análise (o ChatPromptTemplate é montado sob demanda
+# por utils.build_prompt_template, evitando importar o langchain na inicialização)
+prompt_text = """
+Você é um especialista em Recursos Humanos com vasta experiência em análise de currículos.
+Sua tarefa é analisar o conteúdo a seguir e extrair os dados conforme o formato abaixo, para cada um dos campos.
+Responda apenas com o JSON estruturado e utilize somente essas chaves. Cuide para que os nomes das chaves sejam exatamente esses.
+Não adicione explicações ou anotações fora do JSON.
+
+Schema desejado:
+{schema}
+
+---
+Para o cálculo do campo score:
+{prompt_score}
+
+---
+Currículo a ser analisado:
+'{cv}'
+
+---
+Vaga que o candidato está se candidatando:
+'{job}'
+"""
+
+# Avaliação de um currículo contra várias vagas (multijob.py): os campos que não
+# dependem da vaga são extraídos uma única vez e só a parte de aderência
+# (score, pontos fortes e lacunas) é gerada para cada vaga
+profile_schema = """
+{
+  "name": "Nome completo do candidato",
+  "area": "Área ou setor principal que o candidato atua. Classifique em apenas uma: Desenvolvimento, Marketing, Vendas, Financeiro, Administrativo, Outros",
+  "summary": "Resumo objetivo sobre o perfil profissional do candidato",
+  "skills": ["competência 1", "competência 2", "..."],
+  "education": "Resumo da formação acadêmica mais relevante",
+  "interview_questions": ["Pelo menos 3 perguntas úteis para entrevista com base no currículo, para esclarecer algum ponto ou explorar melhor"]
+}
+"""
+
+profile_fields = ["name", "area", "summary", "skills", "education", "interview_questions"]
+
+job_fit_schema = """
+{
+  "strengths": ["Pontos fortes e aspectos que indicam alinhamento com a vaga"],
+  "areas_for_development": ["Pontos que indicam possíveis lacunas, fragilidades ou necessidades de desenvolvimento para a vaga"],
+  "important_considerations": ["Observações específicas que merecem verificação ou cuidado adicional"],
+  "final_recommendations": "Resumo avaliativo final com sugestões de próximos passos (ex: seguir com entrevista, indicar para outra vaga)",
+  "score": 0.0
+}
+"""
+
+job_fit_fields = ["strengths", "areas_for_development", "important_considerations", "final_recommendations", "score"]
+
+profile_prompt_text = """
+Você é um especialista em Recursos Humanos com vasta experiência em análise de currículos.
+Sua tarefa é extrair do currículo a seguir os dados conforme o formato abaixo, para cada um dos campos.
+Responda apenas com o JSON estruturado e utilize somente essas chaves. Cuide para que os nomes das chaves sejam exatamente esses.
+Não adicione explicações ou anotações fora do JSON.
+
+Schema desejado:
+{schema}
+
+---
+Currículo a ser analisado:
+'{cv}'
+"""
+
+job_fit_prompt_text = """
+Você é um especialista em Recursos Humanos com vasta experiência em análise de currículos.
+Sua tarefa é avaliar a aderência do candidato à vaga abaixo e responder conforme o formato indicado.
+Responda apenas com o JSON estruturado e utilize somente essas chaves. Cuide para que os nomes das chaves sejam exatamente esses.
+Não adicione explicações ou anotações fora do JSON.
+
+Schema desejado:
+{schema}
+
+---
+Para o cálculo do campo score:
+{prompt_score}
+
+---
+Perfil já extraído do candidato:
+{profile}
+
+---
+Currículo do candidato:
+'{cv}'
+
+---
+Vaga que o candidato está se candidatando:
+'{job}'
+"""
+
+# Amostras só de score (consistency.py, com SCORE_SAMPLES > 1): a parte fixa
+# (instruções, critérios e vaga) vem antes do currículo, para que o prefixo do
+# prompt seja o mesmo em todas as amostras e entre candidatos da mesma vaga
+score_prompt_text = """
+Você é um especialista em Recursos Humanos com vasta experiência em análise de currículos.
+Sua tarefa é atribuir uma nota de aderência do candidato à vaga, seguindo os critérios abaixo.
+Responda apenas com o JSON {{"score": x.x}}, sem explicações ou anotações fora do JSON.
+
+---
+Critérios de pontuação:
+{prompt_score}
+
+---
+Vaga que o candidato está se candidatando:
+'{job}'
+
+---
+Currículo do candidato:
+'{cv}'
+"""
+
+# Pedido de correção: quando a resposta vem cortada ou com campos inválidos, só
+# esses campos são pedidos de novo (em vez de repetir a análise completa)
+repair_prompt_text = """
+Você é um especialista em Recursos Humanos com vasta experiência em análise de currículos.
+A análise anterior deste currículo veio incompleta ou com campos inválidos.
+Responda apenas com um JSON contendo somente as chaves abaixo, no formato indicado, sem explicações.
+
+Campos a preencher (formato esperado e problema encontrado):
+{fields}
+
+---
+Campos já extraídos (não repita):
+{partial}
+
+---
+Currículo (resumido):
+'{cv}'
+
+---
+Vaga:
+'{job}'
+"""
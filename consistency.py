@@ -0,0 +1,192 @@
+"""
+Score com baixa variância por autoconsistência.
+
+Com temperature 0.7, o mesmo currículo recebe scores diferentes a cada
+análise. Com SCORE_SAMPLES > 1, depois da análise completa o score é pedido
+de novo em chamadas curtas (config.score_prompt_text, resposta só com o
+score), em paralelo, e o score gravado passa a ser a média das amostras, com
+o intervalo de confiança de 95% (t de Student) em score_ci. As amostras são
+tiradas em rodadas: a primeira com SCORE_MIN_SAMPLES e, se o intervalo ainda
+for mais largo que ±SCORE_CI_TOLERANCE, as seguintes até SCORE_SAMPLES.
+
+O prompt das amostras é idêntico entre si e começa pela parte fixa (critérios
+e vaga): backends com cache de prefixo (vLLM, OpenAI) só processam de novo o
+currículo. O resultado fica no cache local, então o mesmo currículo e a mesma
+vaga têm o mesmo score em execuções seguintes.
+"""
+import math
+import os
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+import budget
+import config
+import validation
+from cache import get_cache, text_hash
+from metrics import metrics
+from ratelimit import RateLimitGate, is_rate_limit_error, with_backoff
+from utils import build_prompt_template, format_res, get_chain, model_name
+
+SCORE_SAMPLES = int(os.getenv("SCORE_SAMPLES", "1"))  # 1 = desligado (score da análise completa)
+SCORE_MIN_SAMPLES = int(os.getenv("SCORE_MIN_SAMPLES", "3"))
+SCORE_CI_TOLERANCE = float(os.getenv("SCORE_CI_TOLERANCE", "0.5"))  # meia largura do intervalo para parar
+
+# Quantil 0.975 da distribuição t por graus de liberdade (acima de 30, aproximação normal)
+_T_975 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228, 2.201, 2.179, 2.160, 2.145,
+          2.131, 2.120, 2.110, 2.101, 2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048,
+          2.045, 2.042]
+
+def enabled(samples=None):
+    return (SCORE_SAMPLES if samples is None else samples) > 1
+
+
+def cache_tag(samples=None):
+    """Parte da chave de cache da análise que depende do modo de score (vazia no modo desligado)."""
+    samples = SCORE_SAMPLES if samples is None else samples
+    return (f"consensus:{samples}:{SCORE_MIN_SAMPLES}:{SCORE_CI_TOLERANCE}",) if enabled(samples) else ()
+
+
+def confidence_interval(values):
+    """(média, meia largura do intervalo de 95%); meia largura None com uma única amostra."""
+    mean = statistics.fmean(values)
+    if len(values) < 2:
+        return mean, None
+    df = len(values) - 1
+    t = _T_975[df - 1] if df <= len(_T_975) else 1.96
+    return mean, t * statistics.stdev(values) / math.sqrt(len(values))
+
+
+def _sample(chain, inputs, report, llm):
+    with metrics.span("llm.score_sample", model=model_name(llm)) as span:
+        output = chain.invoke(inputs)
+        span.update(budget.log_usage(model_name(llm), report, output))
+    data, _ = validation.extract_json(format_res(output.content))
+    clean, errors = validation.validate(data or {}, ["score"])
+    if errors:
+        raise ValueError(f"amostra sem score válido: {errors['score']}")
+    return clean["score"]
+
+
+def _prompt(content, job_details, llm, prompt_score):
+    cv, report = budget.fit_to_budget(content)
+    inputs = {"prompt_score": budget.compact_prompt_text(prompt_score), "job": job_details, "cv": cv}
+    report["prompt_tokens"] = sum(budget.count_tokens(v) for v in inputs.values())
+    return get_chain(build_prompt_template(config.score_prompt_text), llm), inputs, report
+
+
+def _single_score(content, job_details, llm, prompt_score, score, deterministic):
+    # No máximo uma chamada, e nenhuma se o score da análise completa foi informado
+    if score is None:
+        try:
+            score = _sample(*_prompt(content, job_details, llm, prompt_score), llm)
+        except Exception as e:
+            if is_rate_limit_error(e):
+                raise
+            metrics.failure("score.sample", type(e).__name__, str(e))
+            return None
+    # Com temperature 0 o intervalo tem largura zero; com uma amostra a temperature > 0, fica indefinido
+    return {"score": round(score, 2), "score_ci": [round(score, 2)] * 2 if deterministic else None,
+            "score_std": 0.0, "score_samples": [score]}
+
+
+def sample_scores(content, job_details, llm, prompt_score=config.prompt_score, samples=None,
+                  min_samples=None, tolerance=None, score=None):
+    """
+    Tira as amostras de score, parando assim que elas concordam. Com
+    temperature 0 (amostras iguais por construção) ou uma só amostra, faz no
+    máximo uma chamada, e nenhuma se `score` (da análise completa) for informado.
+
+    Returns:
+        dict: score (média), score_ci ([mín, máx] do intervalo de 95%), score_std,
+            score_samples e, se alguma amostra falhou, score_partial; ou None se
+            nenhuma amostra deu certo
+
+    Raises:
+        Exception: o erro de limite de requisições (429) de uma amostra, para que o
+            chamador espere e tente de novo (ratelimit.with_backoff)
+    """
+    samples = SCORE_SAMPLES if samples is None else samples
+    min_samples = min(samples, SCORE_MIN_SAMPLES if min_samples is None else min_samples)
+    tolerance = SCORE_CI_TOLERANCE if tolerance is None else tolerance
+    deterministic = not getattr(llm, "temperature", None)
+    if deterministic or samples <= 1:
+        return _single_score(content, job_details, llm, prompt_score, score, deterministic)
+
+    key = text_hash(model_name(llm), getattr(llm, "temperature", None), config.score_prompt_text, prompt_score,
+                    text_hash(job_details), text_hash(content), budget.CV_TOKEN_BUDGET, *cache_tag(samples))
+    cache = get_cache()
+    result = cache.get("score_consensus", key)
+    if result is not None:
+        return result
+
+    chain, inputs, report = _prompt(content, job_details, llm, prompt_score)
+
+    scores, failures, half_width = [], 0, None
+    with metrics.span("score.consensus") as span, ThreadPoolExecutor(max_workers=min_samples) as pool:
+        wave = min_samples
+        while wave > 0:
+            for future in [pool.submit(_sample, chain, inputs, report, llm) for _ in range(wave)]:
+                try:
+                    scores.append(future.result())
+                    metrics.incr("score_samples_total", outcome="ok")
+                except Exception as e:
+                    if is_rate_limit_error(e):
+                        metrics.incr("score_samples_total", outcome="rate_limit")
+                        raise
+                    failures += 1
+                    metrics.incr("score_samples_total", outcome="error")
+                    metrics.failure("score.sample", type(e).__name__, str(e))
+            if scores:
+                mean, half_width = confidence_interval(scores)
+                if half_width is not None and half_width <= tolerance:
+                    break
+            wave = min(min_samples, samples - len(scores) - failures)
+        span.update(samples=len(scores), failures=failures, half_width=half_width,
+                    early_stop=len(scores) + failures < samples)
+    if not scores:
+        return None
+
+    mean, half_width = confidence_interval(scores)
+    result = {
+        "score": round(mean, 2),
+        "score_ci": None if half_width is None else [round(max(0.0, mean - half_width), 2),
+                                                     round(min(10.0, mean + half_width), 2)],
+        "score_std": round(statistics.stdev(scores), 3) if len(scores) > 1 else 0.0,
+        "score_samples": scores,
+    }
+    # Com falhas o resultado não é guardado: a próxima execução tenta completar as amostras
+    if failures:
+        result["score_partial"] = True
+    else:
+        cache.set("score_consensus", key, result)
+    return result
+
+
+def apply(data, content, job_details, llm, prompt_score=config.prompt_score, samples=None):
+    """
+    Substitui o score de `data` (análise completa) pela média das amostras. O
+    score original fica em score_single. Sem amostras válidas, `data` mantém o
+    score da análise completa; nesse caso e quando só parte das amostras deu
+    certo, score_partial fica True e o resultado não deve ir para o cache
+    (ver cacheable).
+    """
+    if not data or not enabled(samples):
+        return data
+    single = data.get("score") if isinstance(data.get("score"), (int, float)) else None
+    consensus = sample_scores(content, job_details, llm, prompt_score, samples, score=single)
+    if consensus is None:
+        return {**data, "score_partial": True}
+    return {**data, "score_single": data.get("score"), **consensus}
+
+
+def apply_with_backoff(data, content, job_details, llm, prompt_score=config.prompt_score, gate=None):
+    """
+    apply com espera e nova tentativa quando uma amostra recebe 429: só as
+    amostras são refeitas, não a análise completa que gerou `data`.
+    """
+    return with_backoff(gate or RateLimitGate(), lambda: apply(data, content, job_details, llm, prompt_score))
+
+
+def cacheable(data):
+    """Se o resultado pode ir para o cache: válido e sem consenso parcial."""
+    return bool(data) and not data.get("score_partial")
@@ -0,0 +1,226 @@
+"""
+Detecção de currículos quase duplicados antes da chamada ao LLM.
+
+Cada currículo gravado recebe uma impressão digital: assinatura MinHash dos
+shingles de 5 palavras do markdown (texto sem acentos, como na busca), os
+e-mails citados e o nome normalizado. As assinaturas são divididas em faixas
+(LSH) gravadas na tabela lsh_bandas, indexada pelo hash de cada faixa: a busca
+por candidatos é uma consulta por igualdade, sem comparar com todos os
+currículos, e só os candidatos encontrados têm a similaridade estimada.
+
+O que fazer com um duplicado é definido por DEDUP_POLICY:
+    skip     não analisa de novo; o registro existente é mantido
+    merge    não analisa de novo; o markdown novo substitui o do registro
+             existente, que fica marcado para reavaliação (ver rescore.py)
+    version  analisa normalmente e grava como nova versão ("Nome (v2)")
+
+Uso pela linha de comando (gera as impressões dos registros antigos e lista os grupos de duplicados):
+    python dedup.py [--db curriculos.db] [--threshold 0.8]
+"""
+import argparse
+import hashlib
+import os
+import re
+import unicodedata
+
+import numpy as np
+
+import storage
+from search import tokenize
+
+DEDUP_POLICY = os.getenv("DEDUP_POLICY", "skip")
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))  # similaridade de Jaccard estimada
+POLICIES = ("skip", "merge", "version")
+
+NUM_PERM = 128
+BANDS, ROWS = 16, 8         # 16 faixas de 8 valores: pares com Jaccard ~0.7 ou mais viram candidatos
+SHINGLE_SIZE = 5
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+
+
+def normalize_name(name):
+    """Nome sem acentos, em minúsculas e com espaços simples ("  José  da Silva" -> "jose da silva")."""
+    if not name or not isinstance(name, str):
+        return None
+    text = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode().lower()
+    return " ".join(re.findall(r"[a-z0-9]+", text)) or None
+
+
+def extract_emails(text):
+    return sorted({email.lower().rstrip(".") for email in _EMAIL_RE.findall(text or "")})
+
+
+def _shingle_hashes(text):
+    tokens = tokenize(text or "")
+    if len(tokens) < SHINGLE_SIZE:
+        shingles = set(tokens)
+    else:
+        shingles = {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+    return np.array([int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little")
+                     for s in shingles], dtype=np.uint64)
+
+
+def signature(text):
+    """Assinatura MinHash (NUM_PERM valores de 32 bits) do texto."""
+    hashes = _shingle_hashes(text)
+    if not len(hashes):
+        return np.full(NUM_PERM, _MAX_HASH, dtype=np.uint32)
+    # Permutações (a*h + b) mod p, como no datasketch; o produto pode dar a volta em 64 bits
+    with np.errstate(over="ignore"):
+        values = (np.outer(hashes, _PERM_A) + _PERM_B) % _MERSENNE & _MAX_HASH
+    return values.min(axis=0).astype(np.uint32)
+
+
+def is_empty(sig):
+    """Assinatura de um texto sem shingles (markdown vazio ou ausente): não serve para comparar conteúdo."""
+    return bool(np.all(sig == _MAX_HASH))
+
+
+def similarity(sig_a, sig_b):
+    """Jaccard estimado entre duas assinaturas (0 se alguma for vazia: dois textos vazios não são "iguais")."""
+    if is_empty(sig_a) or is_empty(sig_b):
+        return 0.0
+    return float(np.mean(sig_a == sig_b))
+
+
+def band_hashes(sig):
+    """
+    Um hash por faixa da assinatura (inteiro de 64 bits com sinal, como o SQLite
+    guarda). Texto vazio não tem faixas: não deve casar com outros textos vazios.
+    """
+    if is_empty(sig):
+        return []
+    raw = sig.tobytes()
+    width = ROWS * sig.itemsize
+    return [int.from_bytes(hashlib.blake2b(bytes([band]) + raw[band * width:(band + 1) * width],
+                                           digest_size=8).digest(), "little", signed=True)
+            for band in range(BANDS)]
+
+
+def fingerprint(markdown, name=None):
+    sig = signature(markdown)
+    return {"signature": sig, "bands": band_hashes(sig), "emails": extract_emails(markdown),
+            "name_norm": normalize_name(name)}
+
+
+def find_duplicate(path_db, markdown=None, name=None, fp=None, threshold=DEDUP_THRESHOLD):
+    """
+    Procura um currículo já gravado da mesma pessoa: mesmo e-mail ou markdown
+    com similaridade >= threshold. O nome normalizado só aponta candidatos
+    (homônimos são comuns); sem e-mail em comum, a similaridade também é exigida,
+    e um markdown vazio (de qualquer um dos lados) nunca a atinge.
+
+    Returns:
+        dict ou None: cv_id, cv_key, similarity e reason ("email", "nome" ou "conteudo")
+    """
+    if not os.path.exists(path_db) or (markdown is None and fp is None and not name):
+        return None
+    if fp is None:
+        fp = fingerprint(markdown or "", name)
+    elif name and not fp["name_norm"]:
+        fp = {**fp, "name_norm": normalize_name(name)}
+
+    best = None
+    for cv_id, cv_key, sig_bytes, reason in storage.fingerprint_candidates(
+            path_db, fp["emails"], fp["name_norm"], fp["bands"]):
+        score = similarity(fp["signature"], np.frombuffer(sig_bytes, dtype=np.uint32))
+        if reason != "email" and score < threshold:
+            continue
+        match = {"cv_id": cv_id, "cv_key": cv_key, "similarity": score, "reason": reason}
+        # E-mail/nome valem mais que conteúdo parecido; entre iguais, o mais similar
+        rank = (reason != "conteudo", score)
+        if best is None or rank > best[0]:
+            best = (rank, match)
+    return best[1] if best else None
+
+
+def find_homonym(path_db, name):
+    """cv_key de um currículo já gravado com o mesmo nome normalizado (só para aviso), ou None."""
+    name_norm = normalize_name(name)
+    if not name_norm or not os.path.exists(path_db):
+        return None
+    candidates = storage.fingerprint_candidates(path_db, [], name_norm, [])
+    return candidates[0][1] if candidates else None
+
+
+def register(path_db, cv_key, markdown=None, name=None, parent_id=None, fp=None):
+    """Grava (ou substitui) a impressão digital do currículo `cv_key`."""
+    if fp is None:
+        fp = fingerprint(markdown or "", name)
+    storage.save_fingerprint(path_db, cv_key, fp["signature"].tobytes(), fp["name_norm"], fp["emails"],
+                             fp["bands"], parent_id=parent_id)
+    return fp
+
+
+def check_before_analysis(path_db, markdown, policy=DEDUP_POLICY):
+    """
+    Verificação feita antes do LLM. Com skip ou merge, um duplicado encontrado
+    dispensa a análise (no merge, o markdown novo vai para o registro existente).
+
+    Returns:
+        dict ou None: o duplicado (com "action": "skip" ou "merge"), ou None se a análise deve seguir
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"DEDUP_POLICY inválida: {policy} (use {', '.join(POLICIES)})")
+    if policy == "version":
+        return None
+    match = find_duplicate(path_db, markdown)
+    if match is None:
+        return None
+    if policy == "merge":
+        storage.merge_markdown(path_db, match["cv_id"], markdown)
+        register(path_db, match["cv_key"], markdown)
+    return {**match, "action": policy}
+
+
+def base_key(cv_key):
+    """Chave sem o sufixo de versão ("Nome (v2)" -> "Nome")."""
+    return re.sub(r" \(v\d+\)$", "", str(cv_key))
+
+
+def backfill(path_db):
+    """Gera as impressões dos currículos gravados antes desta funcionalidade. Retorna quantos foram processados."""
+    count = 0
+    for cv_key, name, markdown in storage.fetch_without_fingerprint(path_db):
+        register(path_db, cv_key, markdown, name)
+        count += 1
+    return count
+
+
+def main(argv=None):
+    import config
+
+    parser = argparse.ArgumentParser(description="Impressões digitais e grupos de currículos quase duplicados")
+    parser.add_argument("--db", default=config.db_file, help="Banco SQLite dos currículos")
+    parser.add_argument("--threshold", type=float, default=DEDUP_THRESHOLD, help="Similaridade mínima (0 a 1)")
+    args = parser.parse_args(argv)
+
+    print(f"{backfill(args.db)} impressões geradas")
+    seen = set()
+    for cv_id, cv_key, sig_bytes, name_norm, emails in storage.fetch_fingerprints(args.db):
+        if cv_id in seen:
+            continue
+        sig = np.frombuffer(sig_bytes, dtype=np.uint32)
+        group = []
+        for candidate_id, candidate_key, candidate_sig, reason in storage.fingerprint_candidates(
+                args.db, emails, name_norm, band_hashes(sig)):
+            if candidate_id == cv_id or candidate_id in seen:
+                continue
+            score = similarity(sig, np.frombuffer(candidate_sig, dtype=np.uint32))
+            if reason == "email" or score >= args.threshold:
+                group.append(f"{candidate_key} ({reason}, {score:.2f})")
+                seen.add(candidate_id)
+        if group:
+            print(f"{cv_key}: {'; '.join(group)}")
+        seen.add(cv_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Recebimento de uploads e leitura de PDFs longos com memória limitada.
+
+Os uploads são copiados em blocos para arquivos temporários de nome único
+(sem colisão entre sessões), com limite de tamanho e remoção garantida. PDFs
+longos são convertidos por faixas de páginas (PDF_PAGE_CHUNK por vez) e só
+as primeiras MAX_PDF_PAGES páginas são lidas.
+"""
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+
+MAX_UPLOAD_MB = float(os.getenv("MAX_UPLOAD_MB", "20"))
+MAX_UPLOAD_BYTES = int(MAX_UPLOAD_MB * 1024 * 1024)
+MAX_PDF_PAGES = int(os.getenv("MAX_PDF_PAGES", "30"))
+PDF_PAGE_CHUNK = int(os.getenv("PDF_PAGE_CHUNK", "10"))
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR") or None  # None = pasta temporária do sistema
+CHUNK_SIZE = 1024 * 1024
+
+_PAGE_RE = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+
+
+class UploadRejected(ValueError):
+    """Upload recusado (tamanho acima do limite ou arquivo que não é PDF)."""
+
+
+def spool_to_file(fileobj, path=None, dir=UPLOAD_TMP_DIR, suffix=".pdf", max_bytes=MAX_UPLOAD_BYTES):
+    """
+    Copia o upload em blocos de CHUNK_SIZE para `path` ou, se omitido, para um
+    arquivo temporário de nome único. O arquivo parcial é removido em caso de erro.
+
+    Returns:
+        str: Caminho do arquivo gravado
+    """
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix=suffix, prefix="cv_", dir=dir)
+        out = os.fdopen(fd, "wb")
+    else:
+        out = open(path, "wb")
+
+    written = 0
+    try:
+        with out:
+            while True:
+                chunk = fileobj.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                if written == 0 and suffix == ".pdf" and not chunk.lstrip()[:5].startswith(b"%PDF"):
+                    raise UploadRejected("o arquivo enviado não é um PDF")
+                written += len(chunk)
+                if written > max_bytes:
+                    raise UploadRejected(f"arquivo maior que o limite de {max_bytes / 1024 / 1024:.0f} MB")
+                out.write(chunk)
+    except BaseException:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        raise
+    return path
+
+
+@contextmanager
+def temp_upload(fileobj, **kwargs):
+    """spool_to_file com remoção do arquivo ao final do bloco (inclusive em caso de erro)."""
+    path = spool_to_file(fileobj, **kwargs)
+    try:
+        yield path
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def count_pages(path):
+    """
+    Número de páginas sem converter o documento (pypdfium2, dependência do
+    docling; sem ele, contagem dos objetos /Page do arquivo). None se não der para saber.
+    """
+    try:
+        import pypdfium2
+
+        pdf = pypdfium2.PdfDocument(path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    except ImportError:
+        pass
+    except Exception:
+        return None
+
+    pages, tail = 0, b""
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            block = tail + chunk
+            # Só conta ocorrências que terminam fora da sobreposição já contada
+            pages += sum(1 for m in _PAGE_RE.finditer(block) if m.end() > len(tail))
+            tail = block[-32:]
+    return pages or None
+
+
+def page_ranges(pages, max_pages=MAX_PDF_PAGES, chunk=PDF_PAGE_CHUNK):
+    """
+    Faixas de páginas (início, fim), 1-indexadas e inclusivas, para a conversão.
+    Com `pages` desconhecido, uma única faixa até max_pages.
+    """
+    last = min(pages, max_pages) if pages else max_pages
+    if not pages or last <= chunk:
+        return [(1, last)]
+    return [(start, min(start + chunk - 1, last)) for start in range(1, last + 1, chunk)]
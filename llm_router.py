@@ -0,0 +1,376 @@
+"""
+Roteamento das chamadas ao LLM entre vários backends, com failover.
+
+O LLMRouter é um modelo de chat do LangChain (entra no lugar do ChatGroq em
+get_chain, no streaming e no process_cv) que escolhe, a cada chamada, o
+backend com menor latência recente ponderada pela taxa de erros, entre os que:
+    - estão com o circuito fechado (após FAILURE_THRESHOLD falhas seguidas o
+      backend fica fora por `cooldown` segundos e depois recebe uma chamada de teste);
+    - têm vaga na concorrência, ajustada por AIMD (+1 a cada `limite` sucessos,
+      metade a cada limite de taxa ou timeout);
+    - têm saldo nos token buckets de requisições (rpm) e de tokens (tpm) por minuto.
+Se a chamada falhar, o próximo backend é tentado; no streaming, só enquanto
+nenhum trecho da resposta foi entregue.
+
+Os backends vêm de LLM_BACKENDS (JSON, ou caminho de um arquivo .json), uma
+lista em ordem de preferência, por exemplo:
+    [{"name": "groq", "provider": "groq", "model": "deepseek-r1-distill-llama-70b", "rpm": 30},
+     {"name": "local", "provider": "openai", "model": "qwen2.5-7b-instruct",
+      "base_url": "http://localhost:8000/v1", "max_concurrency": 2}]
+provider "openai" atende qualquer servidor compatível com a API da OpenAI
+(vLLM, llama.cpp, Ollama, benchmarks/mock_llm_server.py) e requer o pacote
+langchain-openai. Sem LLM_BACKENDS, o único backend é o ChatGroq do config.py.
+"""
+import json
+import os
+import threading
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import ConfigDict, PrivateAttr
+
+from metrics import metrics
+from ratelimit import classify_error, retry_after
+
+ROUTER_MAX_WAIT = float(os.getenv("ROUTER_MAX_WAIT", "60"))  # espera máxima por um backend livre, em segundos
+DEFAULT_TIMEOUT = 60.0
+FAILURE_THRESHOLD = 3
+COOLDOWN = 30.0
+EWMA_ALPHA = 0.2
+
+
+def backends_from_env(default_model):
+    """Configuração dos backends: LLM_BACKENDS ou, se ausente, só o ChatGroq com default_model."""
+    raw = os.getenv("LLM_BACKENDS", "").strip()
+    if not raw:
+        # Sem outro backend para onde ir, as novas tentativas ficam com o próprio cliente
+        return [{"name": "groq", "provider": "groq", "model": default_model, "max_retries": 2}]
+    if not raw.startswith("["):
+        with open(raw, encoding="utf-8") as f:
+            raw = f.read()
+    return json.loads(raw)
+
+
+class TokenBucket:
+    """Balde de `capacity` fichas reposto a `rate` fichas por segundo."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, n=1):
+        self._refill()
+        n = min(n, self.capacity)
+        return 0.0 if self.tokens >= n else (n - self.tokens) / self.rate
+
+    def take(self, n=1):
+        self.tokens -= min(n, self.capacity)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+
+    def probe_ready(self):
+        return self.state == "open" and self.wait_time() == 0
+
+    def wait_time(self):
+        """0 se o backend pode receber uma chamada agora; senão, segundos até a próxima tentativa."""
+        if self.state == "open":
+            return max(0.0, self.opened_at + self.cooldown - time.monotonic())
+        if self.state == "half_open" and self.probing:
+            return 1.0
+        return 0.0
+
+    def acquire(self):
+        if self.state == "open":
+            # Fim do cooldown: uma única chamada de teste decide se o circuito fecha
+            self.state = "half_open"
+        if self.state == "half_open":
+            self.probing = True
+
+    def record(self, ok, pause=None):
+        """Registra o resultado; `pause` (Retry-After) abre o circuito por esse tempo, em vez do cooldown."""
+        if ok:
+            self.state, self.failures, self.probing = "closed", 0, False
+            return
+        self.failures += 1
+        if pause:
+            self.state, self.opened_at, self.probing = "open", time.monotonic() - self.cooldown + pause, False
+        elif self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state, self.opened_at, self.probing = "open", time.monotonic(), False
+
+    def cancel(self):
+        """Chamada cancelada pelo consumidor: não conta como sucesso nem falha."""
+        if self.state == "half_open":
+            # O teste não decidiu nada: volta a aberto com o cooldown já cumprido (próxima chamada testa de novo)
+            self.state, self.probing = "open", False
+
+
+class AIMDLimiter:
+    """Concorrência adaptativa: aumento aditivo a cada sucesso, redução multiplicativa na sobrecarga."""
+
+    def __init__(self, initial=2, minimum=1, maximum=8):
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.limit = float(min(max(initial, minimum), self.maximum))
+        self.in_flight = 0
+
+    def has_capacity(self):
+        return self.in_flight < int(self.limit)
+
+    def acquire(self):
+        self.in_flight += 1
+
+    def release(self, outcome):
+        self.in_flight -= 1
+        if outcome == "ok":
+            self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+        elif outcome in ("rate_limit", "timeout"):
+            self.limit = max(self.minimum, self.limit * 0.5)
+
+
+class Backend:
+    def __init__(self, name, llm, model=None, priority=0, rpm=None, tpm=None, initial_concurrency=2,
+                 max_concurrency=8, failure_threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN):
+        self.name = name
+        self.llm = llm
+        self.model = model or getattr(llm, "model_name", None) or name
+        self.priority = priority
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.breaker = CircuitBreaker(failure_threshold, cooldown)
+        self.limiter = AIMDLimiter(initial_concurrency, 1, max_concurrency)
+        self.latency = None       # média móvel exponencial, em segundos
+        self.error_rate = 0.0
+
+    @classmethod
+    def from_config(cls, config, temperature, priority=0):
+        provider = config.get("provider", "groq")
+        timeout = config.get("timeout", DEFAULT_TIMEOUT)
+        # Por padrão sem novas tentativas no cliente: a falha vai logo para o próximo backend
+        max_retries = config.get("max_retries", 0)
+        if provider == "groq":
+            from langchain_groq import ChatGroq
+
+            llm = ChatGroq(model=config["model"], temperature=temperature, max_tokens=None, timeout=timeout,
+                           max_retries=max_retries)
+        elif provider == "openai":
+            from langchain_openai import ChatOpenAI
+
+            api_key = config.get("api_key") or os.getenv(config.get("api_key_env", "OPENAI_API_KEY")) or "local"
+            llm = ChatOpenAI(model=config["model"], base_url=config.get("base_url"), api_key=api_key,
+                             temperature=temperature, timeout=timeout, max_retries=max_retries, stream_usage=True)
+        else:
+            raise ValueError(f"provider desconhecido: {provider}")
+        options = {k: config[k] for k in ("rpm", "tpm", "initial_concurrency", "max_concurrency",
+                                          "failure_threshold", "cooldown") if k in config}
+        return cls(config.get("name", config["model"]), llm, model=config["model"], priority=priority, **options)
+
+    def wait_time(self, tokens):
+        if not self.limiter.has_capacity():
+            return 0.05
+        waits = [self.breaker.wait_time()]
+        waits += [bucket.wait_time(n) for bucket, n in ((self.requests, 1), (self.tokens, tokens)) if bucket]
+        return max(waits)
+
+    def cost(self):
+        # Backend fora do cooldown recebe a chamada de teste antes dos demais (senão nunca voltaria)
+        if self.breaker.probe_ready():
+            return 0.0
+        # Menor é melhor: latência recente (1 s enquanto não medida) penalizada por erros e pela ordem de preferência
+        latency = 1.0 if self.latency is None else self.latency
+        return latency * (1 + 4 * self.error_rate) * (1 + 0.5 * self.priority)
+
+    def acquire(self, tokens):
+        self.breaker.acquire()
+        self.limiter.acquire()
+        if self.requests:
+            self.requests.take(1)
+        if self.tokens:
+            self.tokens.take(tokens)
+
+    def release(self, elapsed, outcome, pause=None):
+        if outcome == "cancelled":
+            # Só libera a vaga: latência, taxa de erros e circuito ficam como estavam
+            self.breaker.cancel()
+            self.limiter.release(outcome)
+            return
+        ok = outcome == "ok"
+        if ok:
+            self.latency = elapsed if self.latency is None else (1 - EWMA_ALPHA) * self.latency + EWMA_ALPHA * elapsed
+        self.error_rate = (1 - EWMA_ALPHA) * self.error_rate + EWMA_ALPHA * (0.0 if ok else 1.0)
+        self.breaker.record(ok, pause)
+        self.limiter.release(outcome)
+
+    def stats(self):
+        return {"backend": self.name, "model": self.model, "circuit": self.breaker.state,
+                "concurrency": round(self.limiter.limit, 2), "in_flight": self.limiter.in_flight,
+                "latency_ms": None if self.latency is None else round(self.latency * 1000, 1),
+                "error_rate": round(self.error_rate, 3)}
+
+
+def served_by(backend):
+    """
+    Metadados do backend que respondeu, em response_metadata. Chaves próprias
+    (e não model_name) porque a soma dos chunks de um stream concatena textos repetidos.
+    """
+    return {"router_backend": backend.name, "router_model": backend.model}
+
+
+class NoBackendAvailable(RuntimeError):
+    pass
+
+
+class LLMRouter(BaseChatModel):
+    model_config = ConfigDict(protected_namespaces=())
+
+    model_name: str = "router"
+    temperature: float = 0.0
+    max_wait: float = ROUTER_MAX_WAIT
+
+    _backends: list = PrivateAttr(default_factory=list)
+    _lock: object = PrivateAttr(default_factory=threading.Condition)
+
+    @classmethod
+    def from_config(cls, configs, temperature=0.0, max_wait=ROUTER_MAX_WAIT):
+        return cls.from_backends([Backend.from_config(config, temperature, priority=i)
+                                  for i, config in enumerate(configs)], temperature, max_wait)
+
+    @classmethod
+    def from_backends(cls, backends, temperature=0.0, max_wait=ROUTER_MAX_WAIT):
+        if not backends:
+            raise ValueError("nenhum backend configurado")
+        # Com um só backend, o nome é o do modelo (as chaves de cache continuam as mesmas). Com vários,
+        # o nome composto só identifica o roteador: custo e tokens vão para o modelo em served_by
+        router = cls(model_name="+".join(b.model for b in backends), temperature=temperature, max_wait=max_wait)
+        router._backends = list(backends)
+        return router
+
+    @property
+    def _llm_type(self):
+        return "llm-router"
+
+    def stats(self):
+        with self._lock:
+            return [backend.stats() for backend in self._backends]
+
+    def _acquire(self, tokens, tried, deadline):
+        with self._lock:
+            while True:
+                best, wait = None, None
+                for backend in self._backends:
+                    if backend.name in tried:
+                        continue
+                    delay = backend.wait_time(tokens)
+                    if delay <= 0 and (best is None or backend.cost() < best.cost()):
+                        best = backend
+                    elif delay > 0:
+                        wait = delay if wait is None else min(wait, delay)
+                if best is not None:
+                    best.acquire(tokens)
+                    return best
+                remaining = deadline - time.monotonic()
+                if wait is None or remaining <= 0:
+                    return None
+                # Acordado antes se alguma chamada terminar (vaga na concorrência)
+                self._lock.wait(min(wait, remaining, 1.0))
+
+    def _release(self, backend, started, outcome, error=None):
+        pause = retry_after(error) if outcome == "rate_limit" else None
+        with self._lock:
+            backend.release(time.perf_counter() - started, outcome, pause)
+            self._lock.notify_all()
+        metrics.incr("llm_backend_calls_total", backend=backend.name, outcome=outcome)
+
+    def _estimate_tokens(self, messages):
+        import budget
+
+        return sum(budget.count_tokens(str(m.content)) for m in messages)
+
+    def _attempts(self, messages):
+        """Backends na ordem em que devem ser tentados (um novo a cada falha)."""
+        tokens = self._estimate_tokens(messages)
+        deadline = time.monotonic() + self.max_wait
+        tried, last_error = set(), None
+        while True:
+            backend = self._acquire(tokens, tried, deadline)
+            if backend is None:
+                if last_error is not None:
+                    raise last_error
+                raise NoBackendAvailable(f"nenhum backend do LLM disponível em {self.max_wait:.0f}s")
+            error = yield backend
+            if error is None:
+                return
+            tried.add(backend.name)
+            last_error = error
+            metrics.incr("llm_failovers_total", backend=backend.name, reason=classify_error(error))
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        attempts = self._attempts(messages)
+        backend = next(attempts)
+        while True:
+            started = time.perf_counter()
+            outcome = "cancelled"
+            try:
+                with metrics.span("llm.backend", backend=backend.name):
+                    message = backend.llm.invoke(messages, stop=stop, **kwargs)
+                message = message.model_copy(
+                    update={"response_metadata": {**message.response_metadata, **served_by(backend)}})
+                outcome = "ok"
+            except Exception as e:
+                outcome = classify_error(e)
+                self._release(backend, started, outcome, e)
+                backend = attempts.send(e)
+                continue
+            finally:
+                # Sucesso ou interrupção (KeyboardInterrupt etc.): a vaga no backend é sempre devolvida
+                if outcome in ("ok", "cancelled"):
+                    self._release(backend, started, outcome)
+            return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        attempts = self._attempts(messages)
+        backend = next(attempts)
+        while True:
+            started = time.perf_counter()
+            delivered = False
+            outcome = "cancelled"
+            try:
+                with metrics.span("llm.backend", backend=backend.name, stream=True):
+                    for chunk in backend.llm.stream(messages, stop=stop, **kwargs):
+                        delivered = True
+                        generation = ChatGenerationChunk(message=chunk)
+                        if run_manager:
+                            run_manager.on_llm_new_token(str(chunk.content), chunk=generation)
+                        yield generation
+                    # Um chunk final só com os metadados, para que apareçam uma única vez na soma
+                    yield ChatGenerationChunk(message=AIMessageChunk(content="", response_metadata=served_by(backend)))
+                outcome = "ok"
+            except Exception as e:
+                outcome = classify_error(e)
+                self._release(backend, started, outcome, e)
+                if delivered:
+                    # Parte da resposta já foi entregue: trocar de backend misturaria duas respostas
+                    raise
+                backend = attempts.send(e)
+                continue
+            finally:
+                # Consumidor que fecha o stream antes do fim (GeneratorExit) não pode deixar a vaga presa
+                if outcome in ("ok", "cancelled"):
+                    self._release(backend, started, outcome)
+            return
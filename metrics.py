@@ -0,0 +1,233 @@
+"""
+Instrumentação do caminho crítico: spans com duração, contadores (tokens,
+novas tentativas, falhas por motivo) e percentis em janela deslizante.
+
+Os spans terminados são gravados em lote em METRICS_FILE (JSONL, um span por
+linha) e os contadores/percentis em METRICS_PROM_FILE, no formato texto do
+Prometheus. Com METRICS_PORT definido, o mesmo conteúdo é servido em
+http://localhost:METRICS_PORT/metrics. O painel de administração do app lê
+snapshot() diretamente.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from functools import wraps
+
+METRICS_DIR = os.getenv("METRICS_DIR", ".metrics")
+METRICS_FILE = os.getenv("METRICS_FILE", os.path.join(METRICS_DIR, "spans.jsonl"))
+METRICS_PROM_FILE = os.getenv("METRICS_PROM_FILE", os.path.join(METRICS_DIR, "metrics.prom"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+FLUSH_INTERVAL = 2.0
+WINDOW_SIZE = 1000          # durações guardadas por span para os percentis
+RECENT_FAILURES = 50
+
+logger = logging.getLogger("recursos_humanos.metrics")
+
+
+class Metrics:
+    """Registro de métricas por processo (seguro entre threads)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # False em processos filhos: as métricas ficam só em memória (ver _reset_metrics)
+        self.persist = True
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._durations = defaultdict(lambda: deque(maxlen=WINDOW_SIZE))  # span -> (fim, duração, ok)
+            self._counters = Counter()         # (nome, rótulos ordenados) -> valor
+            self._failures = deque(maxlen=RECENT_FAILURES)
+            self._pending = []                 # spans ainda não gravados no arquivo
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """
+        Mede um trecho do pipeline. O dict devolvido aceita atributos extras
+        (ex.: tokens). Exceções são registradas como falha e repassadas.
+        """
+        stack = self._stack()
+        record = {"span": name, "parent": stack[-1] if stack else None, **attrs}
+        stack.append(name)
+        started = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record["error"] = type(e).__name__
+            self.failure(name, type(e).__name__, str(e))
+            raise
+        finally:
+            stack.pop()
+            self.observe(name, time.perf_counter() - started, ok="error" not in record, **record)
+
+    def timed(self, name):
+        """Decorador: cada chamada da função vira um span."""
+        def decorator(fn):
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def observe(self, name, duration, ok=True, **attrs):
+        """Registra uma duração já medida (ex.: etapa executada em outro processo)."""
+        now = time.time()
+        attrs.pop("span", None)
+        with self._lock:
+            self._durations[name].append((now, duration, ok))
+            if not self.persist:
+                return
+            self._pending.append({"ts": round(now, 3), "span": name, "duration_ms": round(duration * 1000, 3),
+                                  "ok": ok, **attrs})
+        _ensure_flusher()
+
+    def incr(self, name, value=1, **labels):
+        with self._lock:
+            self._counters[(name, tuple(sorted(labels.items())))] += value
+
+    def failure(self, stage, reason, detail=""):
+        """Falha com motivo (contador por etapa/motivo + lista das mais recentes)."""
+        self.incr("failures_total", stage=stage, reason=reason)
+        with self._lock:
+            self._failures.append({"ts": time.time(), "stage": stage, "reason": reason, "detail": detail[:300]})
+        logger.warning("falha em %s: %s %s", stage, reason, detail[:300])
+
+    def percentiles(self, name, window=300.0):
+        """p50/p90/p99 (ms), contagem e taxa de erro do span nos últimos `window` segundos."""
+        cutoff = time.time() - window
+        with self._lock:
+            samples = [(d, ok) for ts, d, ok in self._durations.get(name, ()) if ts >= cutoff]
+        if not samples:
+            return {"count": 0}
+        durations = sorted(d for d, _ in samples)
+
+        def pick(q):
+            return durations[min(len(durations) - 1, int(round(q * (len(durations) - 1))))] * 1000
+
+        return {"count": len(samples), "p50_ms": pick(0.5), "p90_ms": pick(0.9), "p99_ms": pick(0.99),
+                "error_rate": sum(not ok for _, ok in samples) / len(samples)}
+
+    def snapshot(self, window=300.0):
+        """Estado atual: percentis por span, contadores e falhas recentes."""
+        with self._lock:
+            names = sorted(self._durations)
+            counters = [{"name": name, **dict(labels), "value": value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            failures = list(self._failures)
+        return {"spans": {name: self.percentiles(name, window) for name in names},
+                "counters": counters, "failures": failures[::-1]}
+
+    def prometheus_text(self, window=300.0):
+        lines = []
+        snap = self.snapshot(window)
+        for name, p in snap["spans"].items():
+            metric = "cv_span_duration_ms"
+            for q in ("p50", "p90", "p99"):
+                if f"{q}_ms" in p:
+                    lines.append(f'{metric}{{span="{name}",quantile="0.{q[1:]}"}} {p[f"{q}_ms"]:.3f}')
+            lines.append(f'{metric}_count{{span="{name}"}} {p["count"]}')
+        for counter in snap["counters"]:
+            labels = ",".join(f'{k}="{v}"' for k, v in counter.items() if k not in ("name", "value"))
+            lines.append(f"cv_{counter['name']}{{{labels}}} {counter['value']}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self):
+        if not self.persist:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        try:
+            if os.path.dirname(METRICS_FILE):
+                os.makedirs(os.path.dirname(METRICS_FILE), exist_ok=True)
+            with open(METRICS_FILE, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(s, ensure_ascii=False, default=str) + "\n" for s in pending))
+            tmp = METRICS_PROM_FILE + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text())
+            os.replace(tmp, METRICS_PROM_FILE)
+        except OSError as e:
+            logger.warning("não foi possível gravar as métricas: %s", e)
+
+
+metrics = Metrics()
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        metrics.flush()
+
+
+def _serve(port):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = metrics.prometheus_text().encode("utf-8")
+            self.send_response(200 if self.path.startswith("/metrics") else 404)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None:
+        return
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True)
+            _flusher.start()
+            if METRICS_PORT:
+                threading.Thread(target=_serve, args=(METRICS_PORT,), name="metrics-http", daemon=True).start()
+
+
+def _reset_metrics():
+    # Processos filhos (fork, ex.: workers de parse do batch) começam sem as métricas do pai e não
+    # gravam nada: sem thread de gravação nem servidor HTTP (a porta é do pai) e sem flush na saída,
+    # que sobrescreveria o metrics.prom com um snapshot só do filho. O pai mede as etapas
+    # executadas nos filhos (metrics.observe no batch)
+    global _flusher, _flusher_lock
+    metrics._lock = threading.Lock()
+    metrics._local = threading.local()
+    metrics.persist = False
+    metrics.reset()
+    _flusher = None
+    _flusher_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_metrics)
+
+atexit.register(metrics.flush)
+
+
+def span(name, **attrs):
+    return metrics.span(name, **attrs)
+
+
+def timed(name):
+    return metrics.timed(name)
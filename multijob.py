@@ -0,0 +1,200 @@
+"""
+Avaliação de um currículo contra várias vagas de uma vez.
+
+Os campos que não dependem da vaga (nome, área, resumo, competências, formação,
+perguntas de entrevista) são extraídos uma única vez por currículo; em seguida
+só a parte de aderência (score, pontos fortes, lacunas, recomendações) é
+gerada para cada vaga, com as chamadas ao LLM em paralelo. O resultado é a
+matriz candidato x vaga gravada em storage (tabela pontuacoes).
+
+Uso pela linha de comando (todas as vagas cadastradas, ou só as informadas):
+    python multijob.py pasta_ou_arquivo.zip [--jobs vaga-1 vaga-2] [--concurrency 4]
+"""
+import argparse
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import budget
+import config
+import consistency
+import storage
+from metrics import metrics
+from batch import LLM_CONCURRENCY
+from cache import get_cache, text_hash
+from ratelimit import MAX_RATE_LIMIT_RETRIES, RateLimitGate, with_backoff
+from utils import (build_prompt_template, format_res, get_chain, load_job, model_name, parse_with_repair,
+                   save_json_cv)
+
+
+def _invoke(prompt_text, llm, inputs, report, fields, gate, max_retries=MAX_RATE_LIMIT_RETRIES):
+    chain = get_chain(build_prompt_template(prompt_text), llm)
+
+    def call():
+        with metrics.span("llm.invoke", model=model_name(llm), prompt="multijob"):
+            return chain.invoke(inputs)
+
+    output = with_backoff(gate, call, max_retries)
+    budget.log_usage(model_name(llm), report, output)
+    return parse_with_repair(format_res(output.content), fields, llm, inputs["cv"], inputs["schema"],
+                             inputs.get("job", ""), inputs.get("prompt_score", ""))
+
+
+def _cache_key(llm, *parts):
+    return text_hash(model_name(llm), getattr(llm, "temperature", None), budget.CV_TOKEN_BUDGET, *parts)
+
+
+def extract_profile(content, llm, gate=None):
+    """
+    Campos do currículo que não dependem da vaga.
+
+    Returns:
+        tuple: (dados do perfil ou None, True se veio do cache)
+    """
+    key = _cache_key(llm, config.profile_prompt_text, config.profile_schema, text_hash(content))
+    cache = get_cache()
+    profile = cache.get("profile", key)
+    if profile is not None:
+        return profile, True
+
+    cv, report = budget.fit_to_budget(content)
+    inputs = {"schema": budget.compact_prompt_text(config.profile_schema), "cv": cv}
+    report["prompt_tokens"] = sum(budget.count_tokens(v) for v in inputs.values())
+    profile = _invoke(config.profile_prompt_text, llm, inputs, report, config.profile_fields, gate or RateLimitGate())
+    if profile:
+        cache.set("profile", key, profile)
+    return profile, False
+
+
+def score_job(profile, content, job_details, llm, prompt_score=config.prompt_score, gate=None):
+    """
+    Parte da análise que depende da vaga (score, pontos fortes, lacunas...).
+
+    Returns:
+        tuple: (dados da avaliação ou None, True se veio do cache)
+    """
+    profile_json = json.dumps(profile, ensure_ascii=False)
+    key = _cache_key(llm, config.job_fit_prompt_text, config.job_fit_schema, prompt_score,
+                     text_hash(profile_json), text_hash(job_details), text_hash(content), *consistency.cache_tag())
+    cache = get_cache()
+    fit = cache.get("job_fit", key)
+    if fit is not None:
+        return fit, True
+
+    cv, report = budget.fit_to_budget(content)
+    inputs = {
+        "schema": budget.compact_prompt_text(config.job_fit_schema),
+        "prompt_score": budget.compact_prompt_text(prompt_score),
+        "profile": profile_json,
+        "cv": cv,
+        "job": job_details,
+    }
+    report["prompt_tokens"] = sum(budget.count_tokens(v) for v in inputs.values())
+    gate = gate or RateLimitGate()
+    fit = _invoke(config.job_fit_prompt_text, llm, inputs, report, config.job_fit_fields, gate)
+    # As amostras do score também respeitam o 429 (consistency repassa o erro)
+    fit = consistency.apply_with_backoff(fit, content, job_details, llm, prompt_score, gate)
+    if consistency.cacheable(fit):
+        cache.set("job_fit", key, fit)
+    return fit, False
+
+
+def score_cv_jobs(content, jobs, llm, prompt_score=config.prompt_score, max_workers=LLM_CONCURRENCY):
+    """
+    Avalia um currículo (saída do parse_doc) contra várias vagas.
+
+    Args:
+        jobs (dict): {job_id: texto da vaga (ver utils.load_job)}
+
+    Returns:
+        dict: profile (campos independentes da vaga), scores ({job_id: avaliação})
+            e errors ({job_id: mensagem}). profile é None se a extração falhar.
+    """
+    gate = RateLimitGate()
+    profile, _ = extract_profile(content, llm, gate)
+    result = {"profile": profile, "scores": {}, "errors": {}}
+    if not profile:
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(jobs)))) as pool:
+        futures = {job_id: pool.submit(score_job, profile, content, details, llm, prompt_score, gate)
+                   for job_id, details in jobs.items()}
+        for job_id, future in futures.items():
+            try:
+                fit, _ = future.result()
+            except Exception as e:
+                result["errors"][job_id] = f"{type(e).__name__}: {e}"
+                continue
+            if fit:
+                result["scores"][job_id] = fit
+            else:
+                result["errors"][job_id] = "resposta do LLM sem JSON válido"
+    return result
+
+
+def save_job_scores(path_db, result, primary_job_id=None, markdown=None, key_name="name",
+                    prompt_score=config.prompt_score, warn=False):
+    """
+    Grava, se primary_job_id foi avaliada, o currículo completo (perfil +
+    avaliação dessa vaga) na lista e depois a linha do candidato na matriz
+    candidato x vaga, com a mesma cv_key da lista (homônimos e versões têm
+    chaves próprias). Sem primary_job_id, a matriz usa o nome do candidato.
+
+    Returns:
+        str ou None: cv_key gravada na lista (None se não foi inserido ou já existia)
+    """
+    profile = result["profile"]
+    jobs = {job["job_id"]: job for job in storage.list_jobs(path_db)}
+    hashes = {job_id: jobs[job_id]["content_hash"] if job_id in jobs else None for job_id in result["scores"]}
+    cv_key = None
+    if primary_job_id in result["scores"]:
+        cv_key = save_json_cv({**profile, **result["scores"][primary_job_id]}, path_db=path_db, key_name=key_name,
+                              markdown=markdown, warn=warn, job_id=primary_job_id,
+                              score_hash=storage.scoring_hash(hashes[primary_job_id], prompt_score))
+        if not cv_key:
+            return None
+    storage.upsert_job_scores(path_db, cv_key or profile.get(key_name), {
+        job_id: (fit, hashes[job_id], storage.scoring_hash(hashes[job_id], prompt_score))
+        for job_id, fit in result["scores"].items()
+    })
+    return cv_key
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+
+    from batch import list_pdfs
+    from utils import load_llm, parse_doc_cached
+
+    parser = argparse.ArgumentParser(description="Avaliação de currículos contra várias vagas")
+    parser.add_argument("source", help="Pasta com PDFs ou arquivo .zip")
+    parser.add_argument("--jobs", nargs="*", help="Ids das vagas (padrão: todas as cadastradas)")
+    parser.add_argument("--concurrency", type=int, default=LLM_CONCURRENCY,
+                        help="Máximo de chamadas simultâneas ao LLM por currículo")
+    parser.add_argument("--db", default=config.db_file, help="Banco SQLite com as vagas e a matriz de pontuações")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    llm = load_llm(config.id_model, config.temperature)
+    job_ids = args.jobs or [job["job_id"] for job in storage.list_jobs(args.db)]
+    if not job_ids:
+        parser.error("nenhuma vaga cadastrada")
+    jobs = {job_id: load_job(args.db, job_id) for job_id in job_ids}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for path in list_pdfs(args.source, extract_dir=tmp):
+            content = parse_doc_cached(path)
+            result = score_cv_jobs(content, jobs, llm, max_workers=args.concurrency)
+            name = os.path.basename(path)
+            if not result["profile"]:
+                print(f"{name}: erro na extração do perfil", flush=True)
+                continue
+            save_job_scores(args.db, result, primary_job_id=job_ids[0], markdown=content)
+            scores = ", ".join(f"{job_id}={fit.get('score')}" for job_id, fit in result["scores"].items())
+            errors = "".join(f" [{job_id}: {error}]" for job_id, error in result["errors"].items())
+            print(f"{name}: {result['profile'].get('name')} — {scores}{errors}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Pré-filtro determinístico (primeira etapa da triagem).
+
+Antes da chamada cara ao LLM, o markdown do currículo é comparado com os
+pré-requisitos da vaga (correspondência de competências) e passa por um
+classificador local de área baseado em léxico. Só candidatos com pontuação
+acima do limite seguem para a análise completa.
+"""
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter
+
+from search import tokenize
+
+# Léxico do classificador de área (termos já normalizados: minúsculos e sem acento)
+AREA_LEXICON = {
+    "Desenvolvimento": """python javascript typescript java sql react node django flask api apis backend
+        frontend fullstack git github docker kubernetes aws azure gcp cloud software desenvolvedor
+        desenvolvimento programacao devops html css linux microservicos""",
+    "Marketing": """marketing seo campanhas campanha branding marca midias redes sociais conteudo ads
+        copywriting influenciadores trafego pago inbound engajamento publicidade comunicacao""",
+    "Vendas": """vendas venda comercial clientes cliente prospeccao negociacao metas funil b2b b2c carteira
+        representante vendedor consultor fechamento crm""",
+    "Financeiro": """financeiro financas contabil contabilidade caixa orcamento tesouraria auditoria fiscal
+        impostos tributario conciliacao balanco controladoria custos faturamento""",
+    "Administrativo": """administrativo administracao secretariado arquivo arquivos agenda atendimento
+        documentos compras recepcao rotinas office excel assistente auxiliar protocolo""",
+}
+_LEXICON = {area: set(terms.split()) for area, terms in AREA_LEXICON.items()}
+
+# Palavras que costumam abrir um pré-requisito mas não são competências
+_REQUIREMENT_STOPWORDS = {"Experiência", "Conhecimento", "Conhecimentos", "Familiaridade", "Capacidade",
+                          "Sólidos", "Sólido", "Domínio", "Vivência", "Formação", "Boa", "Bom"}
+
+
+def _normalize(text):
+    return unicodedata.normalize("NFKD", str(text).lower()).encode("ascii", "ignore").decode()
+
+
+def extract_requirements(job_details):
+    """
+    Extrai as competências citadas na seção "Pré-requisitos" da vaga: termos em
+    maiúscula ou com símbolos técnicos (ex.: Python, Node.js, Google Cloud Platform).
+
+    Returns:
+        list: Competências, na ordem em que aparecem
+    """
+    match = re.search(r"Pr[ée]-requisitos:\s*\n(.*?)(?:\n\s*\n|\Z)", str(job_details), re.S | re.I)
+    if not match:
+        return []
+
+    skills = []
+    for line in match.group(1).splitlines():
+        line = line.strip().lstrip("-*• ").strip()
+        # Pontuação também é token, para separar itens de uma lista ("Python, JavaScript e SQL")
+        words = re.findall(r"[\w.+#/-]*\w[+#]*|[,;:()]", line)
+        current = []
+        for i, word in enumerate(words):
+            is_term = ((word[0].isupper() or re.search(r"[.+#]\w", word))
+                       and word not in _REQUIREMENT_STOPWORDS)
+            # A primeira palavra do item só é termo se tiver cara de sigla/tecnologia
+            if i == 0 and not (word.isupper() or re.search(r"[.+#]\w", word)):
+                is_term = False
+            if is_term:
+                current.append(word)
+            elif current:
+                skills.append(" ".join(current))
+                current = []
+        if current:
+            skills.append(" ".join(current))
+
+    seen = set()
+    return [s for s in skills if not (_normalize(s) in seen or seen.add(_normalize(s)))]
+
+
+def match_skills(markdown, requirements):
+    """Separa os pré-requisitos em encontrados e ausentes no texto do currículo."""
+    text = " " + " ".join(tokenize(markdown)) + " "
+    matched, missing = [], []
+    for skill in requirements:
+        terms = tokenize(skill)
+        if terms and f" {' '.join(terms)} " in text:
+            matched.append(skill)
+        else:
+            missing.append(skill)
+    return matched, missing
+
+
+def classify_area(markdown, alpha=1.0):
+    """
+    Classificador de área por léxico (contagens suavizadas, normalizadas em probabilidades).
+
+    Returns:
+        tuple: (área mais provável, {área: probabilidade})
+    """
+    counts = Counter(tokenize(markdown))
+    scores = {area: alpha + sum(math.log1p(counts[t]) for t in terms) for area, terms in _LEXICON.items()}
+    total = sum(scores.values())
+    probs = {area: score / total for area, score in scores.items()}
+    return max(probs, key=probs.get), probs
+
+
+def prefilter_cv(markdown, requirements, target_area=None, threshold=0.3, skill_weight=0.7, area_weight=0.3):
+    """
+    Primeira etapa da triagem: decide se o currículo segue para o LLM.
+
+    Args:
+        markdown (str): Conteúdo do currículo (saída do parse_doc)
+        requirements (list): Competências exigidas (ver extract_requirements)
+        target_area (str): Área esperada para a vaga; se omitida, só as competências contam
+        threshold (float): Pontuação mínima (0 a 1) para seguir para o LLM
+
+    Returns:
+        dict: passed, score, skill_ratio, matched, missing, area, area_probs e elapsed (s)
+    """
+    started = time.perf_counter()
+    matched, missing = match_skills(markdown, requirements)
+    skill_ratio = len(matched) / len(requirements) if requirements else 1.0
+    area, probs = classify_area(markdown)
+
+    if target_area in probs:
+        # Probabilidade relativa à área mais provável: 1.0 quando a vaga é a área dominante
+        area_score = probs[target_area] / probs[area]
+        score = (skill_weight * skill_ratio + area_weight * area_score) / (skill_weight + area_weight)
+    else:
+        score = skill_ratio
+
+    return {
+        "passed": score >= threshold,
+        "score": round(score, 3),
+        "skill_ratio": round(skill_ratio, 3),
+        "matched": matched,
+        "missing": missing,
+        "area": area,
+        "area_probs": {a: round(p, 3) for a, p in probs.items()},
+        "elapsed": time.perf_counter() - started,
+    }
+
+
+class ScreeningStats:
+    """Contadores por processo das duas etapas da triagem (seguro entre threads)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.evaluated = 0
+            self.passed = 0
+            self.prefilter_time = 0.0
+            self.llm_calls = 0
+            self.llm_time = 0.0
+
+    def record_prefilter(self, decision):
+        with self._lock:
+            self.evaluated += 1
+            self.passed += decision["passed"]
+            self.prefilter_time += decision["elapsed"]
+
+    def record_llm(self, elapsed):
+        with self._lock:
+            self.llm_calls += 1
+            self.llm_time += elapsed
+
+    def summary(self):
+        with self._lock:
+            return {
+                "evaluated": self.evaluated,
+                "passed": self.passed,
+                "llm_calls_avoided": self.evaluated - self.passed,
+                "prefilter_avg_ms": 1000 * self.prefilter_time / self.evaluated if self.evaluated else 0.0,
+                "llm_calls": self.llm_calls,
+                "llm_avg_s": self.llm_time / self.llm_calls if self.llm_calls else 0.0,
+            }
+
+
+screening_stats = ScreeningStats()
@@ -0,0 +1,85 @@
+"""
+Limite de taxa das chamadas ao LLM: classificação dos erros e espera com backoff.
+
+Um só lugar para decidir o que é um 429 (ou timeout) e quanto esperar, usado
+pelo roteador de backends (llm_router.py) e pelas etapas que fazem chamadas em
+paralelo (batch, multijob, rescore, consistency). Threads que compartilham um
+RateLimitGate pausam juntas quando qualquer uma delas recebe um 429.
+"""
+import random
+import threading
+import time
+
+from metrics import metrics
+
+MAX_RATE_LIMIT_RETRIES = 5
+MAX_BACKOFF = 60.0
+
+
+def classify_error(exc):
+    """"rate_limit", "timeout" ou "error" (os dois primeiros indicam sobrecarga e reduzem a concorrência)."""
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    text = f"{type(exc).__name__} {exc}".lower()
+    if status == 429 or "ratelimit" in text or "rate limit" in text or "429" in text:
+        return "rate_limit"
+    if isinstance(exc, TimeoutError) or "timeout" in text or "timed out" in text:
+        return "timeout"
+    return "error"
+
+
+def is_rate_limit_error(exc):
+    return classify_error(exc) == "rate_limit"
+
+
+def retry_after(exc):
+    """Segundos pedidos pelo servidor no cabeçalho Retry-After, se houver."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(exc, attempt):
+    """Retry-After do servidor ou backoff exponencial com jitter (até MAX_BACKOFF segundos)."""
+    return retry_after(exc) or min(MAX_BACKOFF, 2.0 * 2 ** attempt) * (1 + random.random() / 2)
+
+
+class RateLimitGate:
+    """Pausa compartilhada: quando uma chamada recebe 429, todas as threads esperam."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pause_until = 0.0
+
+    def wait(self):
+        while True:
+            with self._lock:
+                delay = self._pause_until - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        with self._lock:
+            self._pause_until = max(self._pause_until, time.monotonic() + seconds)
+
+
+def with_backoff(gate, call, max_retries=MAX_RATE_LIMIT_RETRIES, on_retry=None):
+    """
+    Executa `call`, pausando o gate e tentando de novo quando o LLM responde 429.
+    on_retry(tentativa) é chamado antes de cada nova tentativa.
+    """
+    attempt = 0
+    while True:
+        gate.wait()
+        try:
+            return call()
+        except Exception as e:
+            if not is_rate_limit_error(e) or attempt >= max_retries:
+                raise
+            metrics.incr("llm_retries_total", reason="rate_limit")
+            gate.pause(backoff_delay(e, attempt))
+            attempt += 1
+            if on_retry:
+                on_retry(attempt)
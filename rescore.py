@@ -0,0 +1,142 @@
+"""
+Reavaliação incremental dos scores quando a vaga ou o critério de pontuação muda.
+
+Reaproveita o markdown e os campos já extraídos de cada currículo gravado e
+refaz só a parte que depende da vaga (multijob.score_job: score, pontos fortes,
+lacunas, recomendações), e apenas para os registros cujo scoring_hash (vaga +
+prompt_score) não bate com o atual. Os currículos são lidos do banco em lotes
+por id e cada resultado é gravado assim que fica pronto: uma execução
+interrompida continua de onde parou na próxima, porque os já reavaliados
+deixam de estar desatualizados. O score anterior fica em historico_pontuacoes.
+
+Uso pela linha de comando:
+    python rescore.py [--job-id vaga-1] [--batch-size 20] [--concurrency 4] [--dry-run]
+"""
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import config
+import storage
+from batch import LLM_CONCURRENCY
+from metrics import metrics
+from multijob import score_job
+from ratelimit import RateLimitGate
+
+RESCORE_BATCH_SIZE = int(os.getenv("RESCORE_BATCH_SIZE", "20"))
+
+
+def _rescore_one(path_db, row, job, score_hash, llm, prompt_score, gate):
+    with metrics.span("rescore.cv"):
+        # Campos independentes da vaga, como extraídos na análise original
+        profile = {f: row["data"][f] for f in config.profile_fields if row["data"].get(f) is not None}
+        fit, _ = score_job(profile, row["markdown"], job["prompt_text"], llm, prompt_score, gate)
+        if not fit:
+            raise ValueError("resposta do LLM sem JSON válido")
+        storage.update_score(path_db, row["cv_key"], job["job_id"], fit, score_hash, job_hash=job["content_hash"],
+                             in_list=row["list_stale"], in_matrix=row["matrix_stale"])
+    return row["data"].get("score"), fit.get("score")
+
+
+def pending_rescore(path_db, job_id, prompt_score=config.prompt_score):
+    """Quantos currículos estão com score desatualizado para a vaga (e quantos não podem ser reavaliados)."""
+    job = storage.fetch_job(path_db, job_id)
+    if job is None:
+        return {"stale": 0, "without_markdown": 0}
+    return storage.count_stale_scores(path_db, job_id, storage.scoring_hash(job["content_hash"], prompt_score))
+
+
+def rescore(path_db, job_id, llm, prompt_score=config.prompt_score, batch_size=RESCORE_BATCH_SIZE,
+            max_workers=LLM_CONCURRENCY, limit=None, on_progress=None):
+    """
+    Reavalia os currículos com score desatualizado para a vaga.
+
+    Args:
+        limit (int): Máximo de currículos nesta execução (o restante fica para a próxima)
+        on_progress (callable): Chamado como on_progress(cv_key, erro ou None, concluídos, total)
+
+    Returns:
+        dict: total, ok, errors ({cv_key: mensagem}) e changes (lista de {cv_key, old, new})
+    """
+    job = storage.fetch_job(path_db, job_id)
+    if job is None:
+        raise ValueError(f"Vaga não encontrada: {job_id}")
+    score_hash = storage.scoring_hash(job["content_hash"], prompt_score)
+    total = storage.count_stale_scores(path_db, job_id, score_hash)["stale"]
+    if limit is not None:
+        total = min(total, limit)
+
+    summary = {"total": total, "ok": 0, "errors": {}, "changes": []}
+    gate = RateLimitGate()
+    done, after_id = 0, 0
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        while done < total:
+            # Paginação por id: registros que falharem não são buscados de novo nesta execução
+            rows = storage.fetch_stale_scores(path_db, job_id, score_hash, after_id=after_id,
+                                              limit=min(batch_size, total - done))
+            if not rows:
+                break
+            after_id = rows[-1]["id"]
+            futures = {pool.submit(_rescore_one, path_db, row, job, score_hash, llm, prompt_score, gate): row
+                       for row in rows}
+            for future in as_completed(futures):
+                cv_key = futures[future]["cv_key"]
+                done += 1
+                try:
+                    old, new = future.result()
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                    summary["errors"][cv_key] = error
+                    metrics.incr("rescored_total", outcome="error")
+                else:
+                    error = None
+                    summary["ok"] += 1
+                    summary["changes"].append({"cv_key": cv_key, "old": old, "new": new})
+                    metrics.incr("rescored_total", outcome="ok")
+                if on_progress:
+                    on_progress(cv_key, error, done, total)
+    return summary
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+
+    from utils import load_llm, save_job
+
+    parser = argparse.ArgumentParser(description="Reavalia os scores desatualizados após mudança na vaga ou no critério")
+    parser.add_argument("--db", default=config.db_file, help="Banco SQLite dos currículos")
+    parser.add_argument("--job-id", help="Id da vaga cadastrada (padrão: vaga definida em config.py)")
+    parser.add_argument("--batch-size", type=int, default=RESCORE_BATCH_SIZE, help="Currículos lidos do banco por lote")
+    parser.add_argument("--concurrency", type=int, default=LLM_CONCURRENCY,
+                        help="Máximo de chamadas simultâneas ao LLM")
+    parser.add_argument("--limit", type=int, help="Máximo de currículos nesta execução")
+    parser.add_argument("--dry-run", action="store_true", help="Só informa quantos currículos seriam reavaliados")
+    args = parser.parse_args(argv)
+
+    # A vaga de config.py é (re)cadastrada antes, para que uma edição nela seja percebida
+    default_job_id = save_job(config.job, args.db)
+    job_id = args.job_id or default_job_id
+    pending = pending_rescore(args.db, job_id)
+    print(f"{pending['stale']} currículo(s) com score desatualizado para a vaga {job_id}"
+          + (f" ({pending['without_markdown']} sem markdown gravado, não reavaliáveis)"
+             if pending["without_markdown"] else ""))
+    if args.dry_run or not pending["stale"]:
+        return 0
+
+    load_dotenv()
+    llm = load_llm(config.id_model, config.temperature)
+
+    def report(cv_key, error, done, total):
+        print(f"[{done}/{total}] {'ERRO' if error else 'OK  '} {cv_key}" + (f" ({error})" if error else ""),
+              flush=True)
+
+    summary = rescore(args.db, job_id, llm, batch_size=args.batch_size, max_workers=args.concurrency,
+                      limit=args.limit, on_progress=report)
+    for change in summary["changes"]:
+        print(f"{change['cv_key']}: {change['old']} -> {change['new']}")
+    print(f"{summary['ok']}/{summary['total']} currículos reavaliados")
+    return 0 if not summary["errors"] else 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,880 @@
+"""
+Armazenamento dos currículos analisados e do cadastro de vagas em SQLite.
+
+Substitui o antigo curriculos.json (lido e reescrito inteiro a cada inserção):
+inserções são O(1), a chave de deduplicação tem índice único e as escritas são
+atômicas mesmo com várias sessões salvando ao mesmo tempo (modo WAL).
+"""
+import csv
+import hashlib
+import json
+import os
+import re
+import unicodedata
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS curriculos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cv_key TEXT NOT NULL,
+    name TEXT,
+    area TEXT,
+    score REAL,
+    data TEXT NOT NULL,
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_curriculos_key ON curriculos(cv_key);
+
+CREATE INDEX IF NOT EXISTS idx_curriculos_score ON curriculos(score);
+CREATE INDEX IF NOT EXISTS idx_curriculos_area ON curriculos(area, score);
+-- Mesma collation da ordenação por nome em query_cv (o índice sem NOCASE não era usado)
+DROP INDEX IF EXISTS idx_curriculos_name;
+CREATE INDEX IF NOT EXISTS idx_curriculos_name_nocase ON curriculos(name COLLATE NOCASE);
+
+-- Versão dos dados: muda a cada escrita em curriculos (usada para invalidar caches da interface)
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('cv_version', 0);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('analytics_ready', 0);
+CREATE TRIGGER IF NOT EXISTS trg_curriculos_insert AFTER INSERT ON curriculos
+BEGIN UPDATE meta SET value = value + 1 WHERE key = 'cv_version'; END;
+CREATE TRIGGER IF NOT EXISTS trg_curriculos_update AFTER UPDATE ON curriculos
+BEGIN UPDATE meta SET value = value + 1 WHERE key = 'cv_version'; END;
+CREATE TRIGGER IF NOT EXISTS trg_curriculos_delete AFTER DELETE ON curriculos
+BEGIN UPDATE meta SET value = value + 1 WHERE key = 'cv_version'; END;
+
+CREATE TABLE IF NOT EXISTS vagas (
+    job_id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT,
+    details TEXT,
+    prompt_text TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Matriz candidato x vaga (avaliação de um currículo contra várias vagas)
+CREATE TABLE IF NOT EXISTS pontuacoes (
+    cv_key TEXT NOT NULL,
+    job_id TEXT NOT NULL,
+    score REAL,
+    data TEXT NOT NULL,
+    job_hash TEXT,
+    updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (cv_key, job_id)
+);
+CREATE INDEX IF NOT EXISTS idx_pontuacoes_job ON pontuacoes(job_id, score);
+
+-- Versão da matriz candidato x vaga: muda a cada escrita em pontuacoes ou nas vagas (títulos das colunas)
+INSERT OR IGNORE INTO meta (key, value) VALUES ('scores_version', 0);
+CREATE TRIGGER IF NOT EXISTS trg_pontuacoes_insert AFTER INSERT ON pontuacoes
+BEGIN UPDATE meta SET value = value + 1 WHERE key = 'scores_version'; END;
+CREATE TRIGGER IF NOT EXISTS trg_pontuacoes_update AFTER UPDATE ON pontuacoes
+BEGIN UPDATE meta SET value = value + 1 WHERE key = 'scores_version'; END;
+CREATE TRIGGER IF NOT EXISTS trg_pontuacoes_delete AFTER DELETE ON pontuacoes
+BEGIN UPDATE meta SET value = value + 1 WHERE key = 'scores_version'; END;
+CREATE TRIGGER IF NOT EXISTS trg_vagas_insert AFTER INSERT ON vagas
+BEGIN UPDATE meta SET value = value + 1 WHERE key = 'scores_version'; END;
+CREATE TRIGGER IF NOT EXISTS trg_vagas_update AFTER UPDATE ON vagas
+BEGIN UPDATE meta SET value = value + 1 WHERE key = 'scores_version'; END;
+
+-- Todas as pontuações já calculadas para a lista de currículos (inclusive as substituídas na reavaliação)
+CREATE TABLE IF NOT EXISTS historico_pontuacoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cv_key TEXT NOT NULL,
+    job_id TEXT,
+    score REAL,
+    data TEXT,
+    score_hash TEXT,
+    scored_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_historico_cv ON historico_pontuacoes(cv_key, job_id, id);
+
+-- Impressões digitais para detectar quase duplicados (ver dedup.py)
+CREATE TABLE IF NOT EXISTS impressoes (
+    cv_id INTEGER PRIMARY KEY,
+    signature BLOB NOT NULL,
+    name_norm TEXT,
+    emails TEXT,
+    parent_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_impressoes_name ON impressoes(name_norm);
+CREATE TABLE IF NOT EXISTS impressoes_email (
+    email TEXT NOT NULL,
+    cv_id INTEGER NOT NULL,
+    PRIMARY KEY (email, cv_id)
+);
+-- Faixas LSH da assinatura MinHash: um hash por faixa, busca por igualdade
+CREATE TABLE IF NOT EXISTS lsh_bandas (
+    bucket INTEGER NOT NULL,
+    cv_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_lsh_bucket ON lsh_bandas(bucket);
+CREATE INDEX IF NOT EXISTS idx_lsh_cv ON lsh_bandas(cv_id);
+"""
+
+# Triggers que dependem das colunas de _ADDED_COLUMNS (criados depois da migração)
+_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS trg_historico_insert AFTER INSERT ON curriculos
+BEGIN
+    INSERT INTO historico_pontuacoes (cv_key, job_id, score, data, score_hash)
+    VALUES (NEW.cv_key, NEW.job_id, NEW.score, NEW.data, NEW.score_hash);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_historico_update AFTER UPDATE OF score_hash ON curriculos
+WHEN OLD.score_hash IS NOT NEW.score_hash AND NEW.score_hash IS NOT NULL
+BEGIN
+    -- Registros anteriores ao histórico: guarda a pontuação antiga antes da nova
+    INSERT INTO historico_pontuacoes (cv_key, job_id, score, data, score_hash, scored_at)
+    SELECT OLD.cv_key, COALESCE(OLD.job_id, NEW.job_id), OLD.score, OLD.data, OLD.score_hash, OLD.created_at
+    WHERE NOT EXISTS (SELECT 1 FROM historico_pontuacoes WHERE cv_key = OLD.cv_key);
+    INSERT INTO historico_pontuacoes (cv_key, job_id, score, data, score_hash)
+    VALUES (NEW.cv_key, NEW.job_id, NEW.score, NEW.data, NEW.score_hash);
+END;
+
+-- Registros alterados ou removidos, para que o índice de busca (search.py) os
+-- reindexe: novas inserções ele já encontra pelo id
+CREATE TABLE IF NOT EXISTS alteracoes_cv (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    cv_id INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS trg_alteracoes_update AFTER UPDATE OF data, markdown ON curriculos
+BEGIN INSERT INTO alteracoes_cv (cv_id) VALUES (NEW.id); END;
+CREATE TRIGGER IF NOT EXISTS trg_alteracoes_delete AFTER DELETE ON curriculos
+BEGIN INSERT INTO alteracoes_cv (cv_id) VALUES (OLD.id); END;
+"""
+
+# Competências e pontos fortes normalizados em tabelas filhas e agregados do
+# painel analítico (distribuição de score, contagem por área e frequência de
+# competências), mantidos por triggers a cada escrita em curriculos em vez de
+# recalculados a cada renderização
+_SCORE_BUCKET = "CASE WHEN {0}.score IS NULL THEN -1 ELSE max(0, min(10, CAST({0}.score AS INTEGER))) END"
+
+_CHILD_ROWS = """
+    INSERT INTO competencias (cv_id, skill, skill_norm)
+    SELECT NEW.id, min(trim(value)), lower(trim(value)) FROM json_each(NEW.data, '$.skills')
+    WHERE type = 'text' AND trim(value) != '' GROUP BY lower(trim(value));
+    INSERT INTO pontos_fortes (cv_id, strength)
+    SELECT NEW.id, trim(value) FROM json_each(NEW.data, '$.strengths')
+    WHERE type = 'text' AND trim(value) != '';
+    INSERT INTO agg_area (area, n) VALUES (COALESCE(NEW.area, ''), 1)
+    ON CONFLICT(area) DO UPDATE SET n = n + 1;
+    INSERT INTO agg_score (bucket, n) VALUES ({new_bucket}, 1)
+    ON CONFLICT(bucket) DO UPDATE SET n = n + 1;
+"""
+
+_CHILD_CLEANUP = """
+    DELETE FROM competencias WHERE cv_id = OLD.id;
+    DELETE FROM pontos_fortes WHERE cv_id = OLD.id;
+    UPDATE agg_area SET n = n - 1 WHERE area = COALESCE(OLD.area, '');
+    UPDATE agg_score SET n = n - 1 WHERE bucket = {old_bucket};
+"""
+
+_ANALYTICS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS competencias (
+    cv_id INTEGER NOT NULL,
+    skill TEXT NOT NULL,
+    skill_norm TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_competencias_cv ON competencias(cv_id);
+CREATE INDEX IF NOT EXISTS idx_competencias_skill ON competencias(skill_norm);
+
+CREATE TABLE IF NOT EXISTS pontos_fortes (
+    cv_id INTEGER NOT NULL,
+    strength TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pontos_fortes_cv ON pontos_fortes(cv_id);
+
+CREATE TABLE IF NOT EXISTS agg_score (bucket INTEGER PRIMARY KEY, n INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS agg_area (area TEXT PRIMARY KEY, n INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS agg_skill (skill_norm TEXT PRIMARY KEY, skill TEXT NOT NULL, n INTEGER NOT NULL);
+
+CREATE TRIGGER IF NOT EXISTS trg_competencias_insert AFTER INSERT ON competencias
+BEGIN
+    INSERT INTO agg_skill (skill_norm, skill, n) VALUES (NEW.skill_norm, NEW.skill, 1)
+    ON CONFLICT(skill_norm) DO UPDATE SET n = n + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_competencias_delete AFTER DELETE ON competencias
+BEGIN
+    UPDATE agg_skill SET n = n - 1 WHERE skill_norm = OLD.skill_norm;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_analytics_insert AFTER INSERT ON curriculos
+BEGIN""" + _CHILD_ROWS.format(new_bucket=_SCORE_BUCKET.format("NEW")) + """END;
+CREATE TRIGGER IF NOT EXISTS trg_analytics_update AFTER UPDATE OF score, area, data ON curriculos
+BEGIN""" + _CHILD_CLEANUP.format(old_bucket=_SCORE_BUCKET.format("OLD")) \
+    + _CHILD_ROWS.format(new_bucket=_SCORE_BUCKET.format("NEW")) + """END;
+CREATE TRIGGER IF NOT EXISTS trg_analytics_delete AFTER DELETE ON curriculos
+BEGIN""" + _CHILD_CLEANUP.format(old_bucket=_SCORE_BUCKET.format("OLD")) + """END;
+"""
+
+# Colunas adicionadas depois da criação da tabela: {tabela: [(coluna, tipo), ...]}
+_ADDED_COLUMNS = {
+    "curriculos": [("markdown", "TEXT"), ("job_id", "TEXT"), ("score_hash", "TEXT")],
+    "pontuacoes": [("score_hash", "TEXT")],
+}
+
+_initialized = set()
+_init_lock = threading.Lock()
+
+
+def _migrate_columns(conn):
+    for table, columns in _ADDED_COLUMNS.items():
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for column, column_type in columns:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+
+def _backfill_analytics(conn):
+    # Bancos criados antes das tabelas analíticas: preenche uma única vez a partir de curriculos
+    if conn.execute("SELECT value FROM meta WHERE key = 'analytics_ready'").fetchone()[0]:
+        return
+    with conn:
+        for table in ("competencias", "pontos_fortes", "agg_skill", "agg_area", "agg_score"):
+            conn.execute(f"DELETE FROM {table}")
+        conn.execute("""INSERT INTO competencias (cv_id, skill, skill_norm)
+                         SELECT c.id, min(trim(j.value)), lower(trim(j.value))
+                         FROM curriculos c, json_each(c.data, '$.skills') j
+                         WHERE j.type = 'text' AND trim(j.value) != ''
+                         GROUP BY c.id, lower(trim(j.value))""")
+        conn.execute("""INSERT INTO pontos_fortes (cv_id, strength)
+                        SELECT c.id, trim(j.value) FROM curriculos c, json_each(c.data, '$.strengths') j
+                        WHERE j.type = 'text' AND trim(j.value) != ''""")
+        conn.execute("INSERT INTO agg_area (area, n) SELECT COALESCE(area, ''), COUNT(*) FROM curriculos "
+                     "GROUP BY COALESCE(area, '')")
+        conn.execute(f"INSERT INTO agg_score (bucket, n) SELECT {_SCORE_BUCKET.format('curriculos')}, COUNT(*) "
+                     f"FROM curriculos GROUP BY 1")
+        conn.execute("UPDATE meta SET value = 1 WHERE key = 'analytics_ready'")
+
+
+@contextmanager
+def connect(path_db):
+    """
+    Abre uma conexão com o banco (criando as tabelas na primeira vez) e faz
+    commit ao final do bloco, ou rollback em caso de erro.
+    """
+    conn = sqlite3.connect(path_db, timeout=30)
+    try:
+        conn.execute("PRAGMA busy_timeout = 30000")
+        with _init_lock:
+            if path_db not in _initialized:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.executescript(_SCHEMA)
+                _migrate_columns(conn)
+                conn.executescript(_TRIGGERS)
+                conn.executescript(_ANALYTICS_SCHEMA)
+                _backfill_analytics(conn)
+                _initialized.add(path_db)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _insert(conn, data, key_name, markdown=None, job_id=None, score_hash=None, cv_key=None):
+    cur = conn.execute(
+        """INSERT INTO curriculos (cv_key, name, area, score, data, markdown, job_id, score_hash)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+           ON CONFLICT(cv_key) DO NOTHING""",
+        (str(cv_key or data.get(key_name)), data.get("name"), data.get("area"),
+         _as_float(data.get("score")), json.dumps(data, ensure_ascii=False), markdown, job_id, score_hash),
+    )
+    return cur.rowcount == 1
+
+
+def insert_cv(path_db, data, key_name="name", markdown=None, job_id=None, score_hash=None, cv_key=None):
+    """
+    Insere um currículo (e o markdown extraído do PDF, se informado).
+    job_id e score_hash identificam a vaga e o critério usados no score (ver scoring_hash);
+    cv_key substitui data[key_name] como chave (ex.: nova versão de um currículo).
+    Retorna a cv_key gravada, ou None se a chave de deduplicação já existe.
+    """
+    cv_key = str(cv_key or data.get(key_name))
+    with connect(path_db) as conn:
+        return cv_key if _insert(conn, data, key_name, markdown, job_id, score_hash, cv_key) else None
+
+
+def fetch_all_cv(path_db):
+    """Lista de currículos (dicts) na ordem de inserção."""
+    with connect(path_db) as conn:
+        return [json.loads(row[0]) for row in conn.execute("SELECT data FROM curriculos ORDER BY id")]
+
+
+def fetch_cv_after(path_db, last_id):
+    """Registros com id maior que last_id: lista de (id, dados, markdown)."""
+    with connect(path_db) as conn:
+        return [(row_id, json.loads(data), markdown) for row_id, data, markdown in conn.execute(
+            "SELECT id, data, markdown FROM curriculos WHERE id > ? ORDER BY id", (last_id,))]
+
+
+def fetch_cv_changes(path_db, after_seq):
+    """
+    Currículos alterados ou removidos depois de after_seq (tabela alteracoes_cv).
+
+    Returns:
+        tuple: (último seq, ids alterados, lista de (id, dados, markdown) dos que ainda existem)
+    """
+    with connect(path_db) as conn:
+        changes = conn.execute("SELECT seq, cv_id FROM alteracoes_cv WHERE seq > ? ORDER BY seq",
+                               (after_seq,)).fetchall()
+        if not changes:
+            return after_seq, set(), []
+        ids = sorted({cv_id for _, cv_id in changes})
+        rows = []
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            rows += conn.execute(
+                f"SELECT id, data, markdown FROM curriculos WHERE id IN ({','.join('?' * len(chunk))}) ORDER BY id",
+                chunk).fetchall()
+    return changes[-1][0], set(ids), [(row_id, json.loads(data), markdown) for row_id, data, markdown in rows]
+
+
+def last_cv_change(path_db):
+    """seq da alteração mais recente (ponto de partida de um índice construído agora)."""
+    with connect(path_db) as conn:
+        return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM alteracoes_cv").fetchone()[0]
+
+
+def fetch_cv_by_ids(path_db, ids):
+    """Dados dos currículos (com o cv_key) por id; ids que não existem mais ficam de fora do dict."""
+    ids = list(ids)
+    if not ids:
+        return {}
+    with connect(path_db) as conn:
+        rows = conn.execute(f"SELECT id, cv_key, data FROM curriculos WHERE id IN ({','.join('?' * len(ids))})", ids)
+        return {row_id: {**json.loads(data), "cv_key": cv_key} for row_id, cv_key, data in rows}
+
+
+def cv_id_for_key(path_db, cv_key):
+    """id do currículo gravado com esta cv_key, ou None."""
+    with connect(path_db) as conn:
+        row = conn.execute("SELECT id FROM curriculos WHERE cv_key = ?", (str(cv_key),)).fetchone()
+    return row[0] if row else None
+
+
+# Ordenações permitidas em query_cv: nome exibido -> expressão SQL
+SORT_COLUMNS = {"score": "score", "name": "name COLLATE NOCASE", "recent": "id"}
+
+
+def query_cv(path_db, page=1, page_size=20, sort_by="score", descending=True, min_score=None, area=None):
+    """
+    Uma página de currículos, com filtro e ordenação feitos no banco (por índices).
+
+    Args:
+        page (int): Página, começando em 1
+        sort_by (str): "score", "name" ou "recent"
+        min_score (float): Pontuação mínima (opcional)
+        area (str): Área exata (opcional)
+
+    Returns:
+        tuple: (lista de (id, dados com o cv_key), total de registros que atendem ao filtro)
+    """
+    where, params = [], []
+    if min_score is not None:
+        where.append("score >= ?")
+        params.append(min_score)
+    if area:
+        where.append("area = ?")
+        params.append(area)
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+    order = f"{SORT_COLUMNS[sort_by]} {'DESC' if descending else 'ASC'}, id {'DESC' if descending else 'ASC'}"
+
+    with connect(path_db) as conn:
+        total = conn.execute(f"SELECT COUNT(*) FROM curriculos {where_sql}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT id, cv_key, data FROM curriculos {where_sql} ORDER BY {order} LIMIT ? OFFSET ?",
+            params + [page_size, (max(1, page) - 1) * page_size],
+        ).fetchall()
+    # O cv_key (e não o nome) identifica o registro: versões do mesmo candidato têm o mesmo nome
+    return [(row_id, {**json.loads(data), "cv_key": cv_key}) for row_id, cv_key, data in rows], total
+
+
+def list_areas(path_db):
+    with connect(path_db) as conn:
+        return [row[0] for row in conn.execute(
+            "SELECT DISTINCT area FROM curriculos WHERE area IS NOT NULL ORDER BY area")]
+
+
+def cv_version(path_db):
+    """Número que muda a cada inserção, atualização ou remoção de currículos."""
+    if not os.path.exists(path_db):
+        return 0
+    with connect(path_db) as conn:
+        return conn.execute("SELECT value FROM meta WHERE key = 'cv_version'").fetchone()[0]
+
+
+def scores_version(path_db):
+    """Número que muda a cada escrita na matriz candidato x vaga (pontuacoes) ou nas vagas."""
+    if not os.path.exists(path_db):
+        return 0
+    with connect(path_db) as conn:
+        return conn.execute("SELECT value FROM meta WHERE key = 'scores_version'").fetchone()[0]
+
+
+def count_cv(path_db):
+    if not os.path.exists(path_db):
+        return 0
+    with connect(path_db) as conn:
+        return conn.execute("SELECT COUNT(*) FROM curriculos").fetchone()[0]
+
+
+def delete_all_cv(path_db):
+    """Remove todos os currículos (e suas pontuações por vaga). Retorna o número de registros removidos."""
+    with connect(path_db) as conn:
+        conn.execute("DELETE FROM pontuacoes")
+        conn.execute("DELETE FROM historico_pontuacoes")
+        for table in ("impressoes", "impressoes_email", "lsh_bandas"):
+            conn.execute(f"DELETE FROM {table}")
+        # Cada remoção fica em alteracoes_cv (trigger): os índices de busca de outros processos tiram esses ids
+        return conn.execute("DELETE FROM curriculos").rowcount
+
+
+def export_json(path_db):
+    """Exporta no mesmo formato do antigo curriculos.json."""
+    return json.dumps(fetch_all_cv(path_db), indent=2, ensure_ascii=False)
+
+
+def migrate_json(path_json, path_db, key_name="name"):
+    """
+    Importa um curriculos.json legado para o banco e o renomeia para .bak.
+
+    Returns:
+        int: Número de currículos importados (0 se não havia arquivo legado)
+    """
+    if not os.path.exists(path_json):
+        return 0
+    with open(path_json, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = [data]
+
+    imported = 0
+    with connect(path_db) as conn:
+        for entry in data:
+            imported += _insert(conn, entry, key_name)
+    os.replace(path_json, path_json + ".bak")
+    return imported
+
+
+def job_id_for(job):
+    """Id estável da vaga: job['id'] se informado, senão o título normalizado (slug)."""
+    if job.get("id"):
+        return str(job["id"])
+    title = unicodedata.normalize("NFKD", str(job["title"])).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "-", title.lower()).strip("-")
+
+
+def job_hash(job):
+    text = "\x00".join(str(job.get(k) or "") for k in ("title", "description", "details"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def upsert_job(path_db, job, prompt_text):
+    """
+    Cadastra ou atualiza uma vaga. Idempotente: se o conteúdo não mudou, nada é escrito.
+
+    Returns:
+        tuple: (job_id, True se houve inserção/atualização)
+    """
+    job_id = job_id_for(job)
+    with connect(path_db) as conn:
+        cur = conn.execute(
+            """INSERT INTO vagas (job_id, title, description, details, prompt_text, content_hash)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(job_id) DO UPDATE SET
+                   title = excluded.title,
+                   description = excluded.description,
+                   details = excluded.details,
+                   prompt_text = excluded.prompt_text,
+                   content_hash = excluded.content_hash,
+                   updated_at = CURRENT_TIMESTAMP
+               WHERE vagas.content_hash != excluded.content_hash""",
+            (job_id, job["title"], job.get("description"), job.get("details"), prompt_text, job_hash(job)),
+        )
+        return job_id, cur.rowcount == 1
+
+
+def fetch_job(path_db, job_id):
+    """Vaga (dict com job_id, title, description, details, prompt_text, content_hash) ou None."""
+    with connect(path_db) as conn:
+        conn.row_factory = sqlite3.Row
+        row = conn.execute("SELECT * FROM vagas WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+
+def fetch_job_hash(path_db, job_id):
+    """content_hash atual da vaga (leitura pela chave primária), ou None se ela não existe."""
+    with connect(path_db) as conn:
+        row = conn.execute("SELECT content_hash FROM vagas WHERE job_id = ?", (job_id,)).fetchone()
+        return row[0] if row else None
+
+
+def list_jobs(path_db):
+    """Vagas cadastradas, da atualizada mais recentemente para a mais antiga."""
+    with connect(path_db) as conn:
+        conn.row_factory = sqlite3.Row
+        return [dict(row) for row in conn.execute(
+            "SELECT job_id, title, content_hash, updated_at FROM vagas ORDER BY updated_at DESC, job_id")]
+
+
+def migrate_jobs_csv(path_csv, path_db, render):
+    """
+    Importa o vagas.csv legado (que crescia a cada rerun com a mesma vaga) e o
+    renomeia para .bak. Linhas repetidas viram uma única vaga; a última versão vence.
+
+    Args:
+        render (callable): Gera o prompt_text a partir do dict da vaga
+
+    Returns:
+        int: Número de vagas distintas importadas
+    """
+    if not os.path.exists(path_csv):
+        return 0
+    jobs = {}
+    with open(path_csv, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f, delimiter=";"):
+            if row.get("title"):
+                jobs[job_id_for(row)] = row
+    for job in jobs.values():
+        upsert_job(path_db, job, render(job))
+    os.replace(path_csv, path_csv + ".bak")
+    return len(jobs)
+
+
+def upsert_job_scores(path_db, cv_key, scores):
+    """
+    Grava (ou substitui) a avaliação de um candidato em várias vagas.
+
+    Args:
+        scores (dict): {job_id: (dados da avaliação, hash da vaga avaliada, scoring_hash ou None)}
+    """
+    with connect(path_db) as conn:
+        conn.executemany(
+            """INSERT INTO pontuacoes (cv_key, job_id, score, data, job_hash, score_hash) VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(cv_key, job_id) DO UPDATE SET
+                   score = excluded.score,
+                   data = excluded.data,
+                   job_hash = excluded.job_hash,
+                   score_hash = excluded.score_hash,
+                   updated_at = CURRENT_TIMESTAMP""",
+            [(str(cv_key), job_id, _as_float(data.get("score")), json.dumps(data, ensure_ascii=False), hash_,
+              score_hash) for job_id, (data, hash_, score_hash) in scores.items()],
+        )
+
+
+def score_matrix(path_db):
+    """
+    Matriz candidato x vaga.
+
+    Returns:
+        dict: {cv_key: {job_id: score}}
+    """
+    matrix = {}
+    if not os.path.exists(path_db):
+        return matrix
+    with connect(path_db) as conn:
+        for cv_key, job_id, score in conn.execute("SELECT cv_key, job_id, score FROM pontuacoes ORDER BY cv_key"):
+            matrix.setdefault(cv_key, {})[job_id] = score
+    return matrix
+
+
+def rank_for_job(path_db, job_id, limit=20):
+    """Melhores candidatos de uma vaga na matriz: lista de (cv_key, score, dados da avaliação)."""
+    with connect(path_db) as conn:
+        return [(cv_key, score, json.loads(data)) for cv_key, score, data in conn.execute(
+            """SELECT cv_key, score, data FROM pontuacoes WHERE job_id = ?
+               ORDER BY score DESC, cv_key LIMIT ?""", (job_id, limit))]
+
+
+def scoring_hash(job_hash, prompt_score):
+    """Hash do que define o score de um currículo: conteúdo da vaga + critério de pontuação."""
+    text = f"{job_hash or ''}\x00{prompt_score or ''}"
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+_STALE_SQL = """
+    SELECT c.id, c.cv_key, c.data, c.markdown,
+           (c.job_id IS NULL OR c.job_id = :job_id) AND c.score_hash IS NOT :score_hash AS list_stale,
+           p.cv_key IS NOT NULL AND p.score_hash IS NOT :score_hash AS matrix_stale
+    FROM curriculos c
+    LEFT JOIN pontuacoes p ON p.cv_key = c.cv_key AND p.job_id = :job_id
+    WHERE c.id > :after_id AND c.markdown IS NOT NULL
+      AND (((c.job_id IS NULL OR c.job_id = :job_id) AND c.score_hash IS NOT :score_hash)
+           OR (p.cv_key IS NOT NULL AND p.score_hash IS NOT :score_hash))
+    ORDER BY c.id
+"""
+
+
+def fetch_stale_scores(path_db, job_id, score_hash, after_id=0, limit=50):
+    """
+    Currículos com score desatualizado para a vaga (na lista ou na matriz),
+    em ordem de id a partir de after_id. Registros sem markdown não podem ser
+    reavaliados e ficam de fora; os sem vaga registrada (anteriores a job_id)
+    contam como avaliados contra a vaga informada.
+
+    Returns:
+        list: dicts com id, cv_key, data, markdown, list_stale e matrix_stale
+    """
+    params = {"job_id": job_id, "score_hash": score_hash, "after_id": after_id}
+    with connect(path_db) as conn:
+        rows = conn.execute(_STALE_SQL + " LIMIT :limit", {**params, "limit": limit}).fetchall()
+    return [{"id": row[0], "cv_key": row[1], "data": json.loads(row[2]), "markdown": row[3],
+             "list_stale": bool(row[4]), "matrix_stale": bool(row[5])} for row in rows]
+
+
+def count_stale_scores(path_db, job_id, score_hash):
+    """Quantos currículos seriam reavaliados (ver fetch_stale_scores) e quantos não têm markdown."""
+    if not os.path.exists(path_db):
+        return {"stale": 0, "without_markdown": 0}
+    params = {"job_id": job_id, "score_hash": score_hash, "after_id": 0}
+    with connect(path_db) as conn:
+        stale = conn.execute(f"SELECT COUNT(*) FROM ({_STALE_SQL})", params).fetchone()[0]
+        missing = conn.execute(
+            """SELECT COUNT(*) FROM curriculos
+               WHERE markdown IS NULL AND (job_id IS NULL OR job_id = ?) AND score_hash IS NOT ?""",
+            (job_id, score_hash)).fetchone()[0]
+    return {"stale": stale, "without_markdown": missing}
+
+
+def update_score(path_db, cv_key, job_id, fit, score_hash, job_hash=None, in_list=True, in_matrix=False):
+    """
+    Substitui a avaliação de um currículo reavaliado (na lista e/ou na matriz
+    candidato x vaga). Na lista, os campos de `fit` são mesclados aos dados
+    gravados; a pontuação anterior fica em historico_pontuacoes.
+    """
+    score = _as_float(fit.get("score"))
+    payload = json.dumps(fit, ensure_ascii=False)
+    with connect(path_db) as conn:
+        if in_list:
+            conn.execute(
+                """UPDATE curriculos SET score = ?, data = json_patch(data, ?), job_id = ?, score_hash = ?
+                   WHERE cv_key = ?""", (score, payload, job_id, score_hash, str(cv_key)))
+        if in_matrix:
+            conn.execute(
+                """UPDATE pontuacoes SET score = ?, data = ?, job_hash = ?, score_hash = ?,
+                       updated_at = CURRENT_TIMESTAMP
+                   WHERE cv_key = ? AND job_id = ?""", (score, payload, job_hash, score_hash, str(cv_key), job_id))
+
+
+def score_history(path_db, cv_key=None, job_id=None):
+    """
+    Pontuações registradas, da mais antiga para a mais recente.
+
+    Returns:
+        list: dicts com cv_key, job_id, score, score_hash e scored_at
+    """
+    where, params = [], []
+    if cv_key is not None:
+        where.append("cv_key = ?")
+        params.append(str(cv_key))
+    if job_id is not None:
+        where.append("job_id = ?")
+        params.append(job_id)
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+    with connect(path_db) as conn:
+        conn.row_factory = sqlite3.Row
+        return [dict(row) for row in conn.execute(
+            f"""SELECT cv_key, job_id, score, score_hash, scored_at FROM historico_pontuacoes
+                {where_sql} ORDER BY cv_key, id""", params)]
+
+
+def score_distribution(path_db):
+    """Currículos por faixa de score (0 a 10; -1 = sem score), lidos dos agregados."""
+    if not os.path.exists(path_db):
+        return []
+    with connect(path_db) as conn:
+        return conn.execute("SELECT bucket, n FROM agg_score WHERE n > 0 ORDER BY bucket").fetchall()
+
+
+def area_counts(path_db):
+    if not os.path.exists(path_db):
+        return []
+    with connect(path_db) as conn:
+        return conn.execute("SELECT area, n FROM agg_area WHERE n > 0 ORDER BY n DESC, area").fetchall()
+
+
+def skill_counts(path_db, limit=30):
+    """Competências mais frequentes: lista de (competência, currículos que a citam)."""
+    if not os.path.exists(path_db):
+        return []
+    with connect(path_db) as conn:
+        return conn.execute("SELECT skill, n FROM agg_skill WHERE n > 0 ORDER BY n DESC, skill_norm LIMIT ?",
+                            (limit,)).fetchall()
+
+
+def requirement_coverage(path_db, requirements):
+    """
+    Para cada pré-requisito da vaga, quantos currículos citam uma competência
+    que o contém como sequência de palavras inteiras, com a mesma normalização
+    do pré-filtro (search.tokenize): "SQL" casa com "SQL Server", mas não com
+    "MySQL"; "Java" não casa com "JavaScript". Lê só as competências distintas
+    (agg_skill), sem percorrer os currículos.
+
+    Returns:
+        list: (pré-requisito, currículos)
+    """
+    from search import tokenize
+
+    if not os.path.exists(path_db):
+        return [(req, 0) for req in requirements]
+    with connect(path_db) as conn:
+        skills = [(s, f" {' '.join(tokenize(s))} ")
+                  for (s,) in conn.execute("SELECT skill_norm FROM agg_skill WHERE n > 0")]
+        coverage = []
+        for req in requirements:
+            terms = tokenize(req)
+            phrase = f" {' '.join(terms)} "
+            matches = [s for s, tokens in skills if terms and phrase in tokens]
+            count = 0
+            if matches:
+                marks = ",".join("?" * len(matches))
+                count = conn.execute(f"SELECT COUNT(DISTINCT cv_id) FROM competencias WHERE skill_norm IN ({marks})",
+                                     matches).fetchone()[0]
+            coverage.append((req, count))
+    return coverage
+
+
+# Tabelas do export colunar: colunas [(nome, tipo "int", "float" ou "text")] e consulta
+EXPORT_TABLES = {
+    "curriculos": (
+        [("id", "int"), ("cv_key", "text"), ("name", "text"), ("area", "text"), ("score", "float"),
+         ("job_id", "text"), ("created_at", "text"), ("summary", "text"), ("education", "text"),
+         ("final_recommendations", "text")],
+        """SELECT id, cv_key, name, area, score, job_id, created_at,
+                  CAST(json_extract(data, '$.summary') AS TEXT), CAST(json_extract(data, '$.education') AS TEXT),
+                  CAST(json_extract(data, '$.final_recommendations') AS TEXT)
+           FROM curriculos ORDER BY id"""),
+    "competencias": ([("cv_id", "int"), ("skill", "text"), ("skill_norm", "text")],
+                     "SELECT cv_id, skill, skill_norm FROM competencias ORDER BY cv_id"),
+    "pontos_fortes": ([("cv_id", "int"), ("strength", "text")],
+                      "SELECT cv_id, strength FROM pontos_fortes ORDER BY cv_id"),
+}
+
+
+def iter_export_rows(path_db, table, chunk_size=5000):
+    """Linhas de uma tabela de EXPORT_TABLES em blocos de até chunk_size (sem carregar a tabela inteira)."""
+    with connect(path_db) as conn:
+        cursor = conn.execute(EXPORT_TABLES[table][1])
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield rows
+
+
+def save_fingerprint(path_db, cv_key, signature, name_norm, emails, bands, parent_id=None):
+    """
+    Grava (ou substitui) a impressão digital do currículo `cv_key` (ver dedup.py).
+    name_norm/parent_id vazios mantêm os valores já gravados.
+    """
+    with connect(path_db) as conn:
+        row = conn.execute("SELECT id FROM curriculos WHERE cv_key = ?", (str(cv_key),)).fetchone()
+        if row is None:
+            return False
+        cv_id = row[0]
+        conn.execute(
+            """INSERT INTO impressoes (cv_id, signature, name_norm, emails, parent_id) VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT(cv_id) DO UPDATE SET
+                   signature = excluded.signature,
+                   name_norm = COALESCE(excluded.name_norm, impressoes.name_norm),
+                   emails = excluded.emails,
+                   parent_id = COALESCE(excluded.parent_id, impressoes.parent_id)""",
+            (cv_id, signature, name_norm, json.dumps(emails), parent_id))
+        conn.execute("DELETE FROM impressoes_email WHERE cv_id = ?", (cv_id,))
+        conn.execute("DELETE FROM lsh_bandas WHERE cv_id = ?", (cv_id,))
+        conn.executemany("INSERT OR IGNORE INTO impressoes_email (email, cv_id) VALUES (?, ?)",
+                         [(email, cv_id) for email in emails])
+        conn.executemany("INSERT INTO lsh_bandas (bucket, cv_id) VALUES (?, ?)", [(b, cv_id) for b in bands])
+    return True
+
+
+def fingerprint_candidates(path_db, emails, name_norm, bands):
+    """
+    Currículos que compartilham e-mail, nome normalizado ou alguma faixa LSH.
+
+    Returns:
+        list: (cv_id, cv_key, assinatura, motivo), motivo "email", "nome" ou "conteudo"
+    """
+    found = {}
+    with connect(path_db) as conn:
+        queries = []
+        if emails:
+            queries.append(("email", "SELECT DISTINCT cv_id FROM impressoes_email WHERE email IN ({})", list(emails)))
+        if name_norm:
+            queries.append(("nome", "SELECT cv_id FROM impressoes WHERE name_norm IN ({})", [name_norm]))
+        if bands:
+            queries.append(("conteudo", "SELECT DISTINCT cv_id FROM lsh_bandas WHERE bucket IN ({})", list(bands)))
+        for reason, sql, params in queries:
+            for (cv_id,) in conn.execute(sql.format(",".join("?" * len(params))), params):
+                found.setdefault(cv_id, reason)
+        if not found:
+            return []
+        marks = ",".join("?" * len(found))
+        rows = conn.execute(
+            f"""SELECT i.cv_id, c.cv_key, i.signature FROM impressoes i JOIN curriculos c ON c.id = i.cv_id
+                WHERE i.cv_id IN ({marks})""", list(found)).fetchall()
+    return [(cv_id, cv_key, signature, found[cv_id]) for cv_id, cv_key, signature in rows]
+
+
+def fetch_fingerprints(path_db):
+    """Impressões gravadas: lista de (cv_id, cv_key, assinatura, nome normalizado, e-mails)."""
+    with connect(path_db) as conn:
+        return [(cv_id, cv_key, signature, name_norm, json.loads(emails or "[]"))
+                for cv_id, cv_key, signature, name_norm, emails in conn.execute(
+                    """SELECT i.cv_id, c.cv_key, i.signature, i.name_norm, i.emails
+                       FROM impressoes i JOIN curriculos c ON c.id = i.cv_id ORDER BY i.cv_id""")]
+
+
+def fetch_without_fingerprint(path_db):
+    """Currículos ainda sem impressão digital: lista de (cv_key, name, markdown)."""
+    with connect(path_db) as conn:
+        return conn.execute(
+            """SELECT cv_key, name, markdown FROM curriculos c
+               WHERE NOT EXISTS (SELECT 1 FROM impressoes i WHERE i.cv_id = c.id) ORDER BY id""").fetchall()
+
+
+def merge_markdown(path_db, cv_id, markdown):
+    """
+    Substitui o markdown de um currículo por uma versão mais nova do mesmo
+    candidato e o marca como desatualizado para a reavaliação (score_hash nulo).
+    """
+    with connect(path_db) as conn:
+        conn.execute("UPDATE curriculos SET markdown = ?, score_hash = NULL WHERE id = ?", (markdown, cv_id))
+
+
+def version_key(path_db, cv_key):
+    """Primeira chave livre para uma nova versão do currículo: "Nome (v2)", "Nome (v3)"..."""
+    with connect(path_db) as conn:
+        n = 2
+        while conn.execute("SELECT 1 FROM curriculos WHERE cv_key = ?", (f"{cv_key} (v{n})",)).fetchone():
+            n += 1
+    return f"{cv_key} (v{n})"
+
+
+def free_key(path_db, cv_key):
+    """cv_key, se ainda não estiver em uso; senão a próxima chave livre de version_key (ex.: homônimos)."""
+    with connect(path_db) as conn:
+        taken = conn.execute("SELECT 1 FROM curriculos WHERE cv_key = ?", (cv_key,)).fetchone()
+    return version_key(path_db, cv_key) if taken else cv_key
+
+
+def replace_cv(path_db, cv_id, data, markdown=None, job_id=None, score_hash=None):
+    """Substitui a análise de um currículo existente (mantém id e chave), ex.: nova versão do mesmo candidato."""
+    with connect(path_db) as conn:
+        conn.execute(
+            """UPDATE curriculos SET name = ?, area = ?, score = ?, data = ?,
+                   markdown = COALESCE(?, markdown), job_id = ?, score_hash = ?
+               WHERE id = ?""",
+            (data.get("name"), data.get("area"), _as_float(data.get("score")), json.dumps(data, ensure_ascii=False),
+             markdown, job_id, score_hash, cv_id))
@@ -0,0 +1,184 @@
+"""
+Análise do currículo em streaming.
+
+O modelo de raciocínio gera um bloco <think> longo antes do JSON. Aqui a
+resposta é consumida com chain.stream: o raciocínio é descartado à medida que
+chega e cada campo do JSON é entregue assim que termina de ser gerado, para que
+a interface mostre o resultado aos poucos.
+"""
+import json
+import time
+
+import budget
+import consistency
+from cache import get_cache
+from metrics import metrics
+from utils import analysis_cache_key, get_chain, model_name, parse_with_repair
+
+
+class ThinkFilter:
+    """Remove o bloco <think>...</think> do início de uma resposta em streaming."""
+
+    def __init__(self):
+        self._pending = ""
+        self._state = "start"  # start -> thinking -> answer
+        self.think_chars = 0
+
+    def feed(self, chunk):
+        if self._state == "answer":
+            return chunk
+        self._pending += chunk
+
+        if self._state == "start":
+            stripped = self._pending.lstrip()
+            if len(stripped) < len("<think>") and "<think>".startswith(stripped):
+                return ""  # ainda não dá para saber se há raciocínio
+            if not stripped.startswith("<think>"):
+                self._state = "answer"
+                text, self._pending = self._pending, ""
+                return text
+            self._state = "thinking"
+
+        end = self._pending.find("</think>")
+        if end == -1:
+            # Mantém só o final, caso a tag de fechamento chegue partida
+            keep = len("</think>") - 1
+            self.think_chars += max(0, len(self._pending) - keep)
+            self._pending = self._pending[-keep:]
+            return ""
+        self.think_chars += end
+        self._state = "answer"
+        text, self._pending = self._pending[end + len("</think>"):], ""
+        return text
+
+
+class JSONFieldStream:
+    """
+    Parser incremental de um objeto JSON: feed() devolve os pares (campo, valor)
+    de primeiro nível que acabaram de ser concluídos.
+    """
+
+    def __init__(self):
+        self._started = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._token = []
+
+    def feed(self, chunk):
+        fields = []
+        for ch in chunk:
+            if self._done:
+                break
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._depth = 1
+                continue
+            if self._in_string:
+                self._token.append(ch)
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    fields.extend(self._flush())
+                    self._done = True
+                    continue
+            elif ch == "," and self._depth == 1:
+                fields.extend(self._flush())
+                continue
+            self._token.append(ch)
+        return fields
+
+    def _flush(self):
+        text = "".join(self._token).strip()
+        self._token = []
+        if not text:
+            return []
+        try:
+            return list(json.loads("{" + text + "}").items())
+        except ValueError:
+            return []
+
+
+def stream_cv_analysis(schema, job_details, prompt_template, prompt_score, llm, content, fields):
+    """
+    Gera eventos da análise à medida que a resposta do LLM chega.
+
+    Yields:
+        tuple: ("field", nome, valor) para cada campo concluído e, ao final,
+            ("done", dados estruturados ou None, métricas). As métricas trazem
+            time_to_first_field, total_time, think_chars e cached.
+    """
+    started = time.perf_counter()
+    key = analysis_cache_key(schema, job_details, prompt_template, prompt_score, llm, content)
+    cache = get_cache()
+    cached = cache.get("analysis", key)
+    if cached is not None:
+        for name, value in cached.items():
+            yield "field", name, value
+        elapsed = time.perf_counter() - started
+        yield "done", cached, {"time_to_first_field": elapsed, "total_time": elapsed,
+                               "think_chars": 0, "cached": True}
+        return
+
+    think = ThinkFilter()
+    first_field = None
+    # Análise base (antes das amostras de score) já feita numa tentativa anterior que recebeu 429 nas amostras
+    base_key = analysis_cache_key(schema, job_details, prompt_template, prompt_score, llm, content, consensus=False)
+    structured_data = cache.get("analysis", base_key) if base_key != key else None
+    if structured_data is not None:
+        first_field = time.perf_counter() - started
+        for name, value in structured_data.items():
+            yield "field", name, value
+        usage = {}
+    else:
+        parser = JSONFieldStream()
+        answer = []
+        inputs, report = budget.build_prompt_inputs(schema, job_details, prompt_score, content)
+        chain = get_chain(prompt_template, llm)
+        output = None
+        for chunk in chain.stream(inputs):
+            # A soma dos chunks acumula o usage_metadata enviado no último deles
+            output = chunk if output is None else output + chunk
+            text = think.feed(chunk.content or "")
+            if not text:
+                continue
+            answer.append(text)
+            for name, value in parser.feed(text):
+                if first_field is None:
+                    first_field = time.perf_counter() - started
+                yield "field", name, value
+
+        # O resultado final passa pelo mesmo parser (e correção) da versão sem streaming
+        structured_data = parse_with_repair("".join(answer), fields, llm, content, schema, job_details,
+                                            prompt_score)
+        usage = budget.log_usage(model_name(llm), report, output)
+        if base_key != key and consistency.cacheable(structured_data):
+            cache.set("analysis", base_key, structured_data)
+    if "score" in fields:
+        # Com SCORE_SAMPLES > 1, o score mostrado durante o streaming é trocado pela média das amostras;
+        # um 429 nas amostras espera e refaz só elas
+        structured_data = consistency.apply_with_backoff(structured_data, content, job_details, llm, prompt_score)
+    metrics.observe("llm.stream", time.perf_counter() - started, ok=bool(structured_data),
+                    time_to_first_field=first_field, think_chars=think.think_chars, **usage)
+    if consistency.cacheable(structured_data):
+        cache.set("analysis", key, structured_data)
+    yield "done", structured_data, {
+        "time_to_first_field": first_field,
+        "total_time": time.perf_counter() - started,
+        "think_chars": think.think_chars,
+        "cached": False,
+    }
@@ -1,21 +1,64 @@
 import os
-from docling.document_converter import DocumentConverter
-from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate, HumanMessagePromptTemplate, MessagesPlaceholder
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from functools import lru_cache
 import json
 import pandas as pd
-import csv
 import streamlit as st
-
-def load_llm(id_model, temperature):
-  llm = ChatGroq(
-      model=id_model,
-      temperature=temperature,
-      max_tokens=None,
-      timeout=None,
-      max_retries=2,
-  )
-  return llm
+from cache import file_hash, get_cache, text_hash
+import budget
+import dedup
+import ingest
+import search
+import validation
+from metrics import metrics
+import storage
+
+# docling e langchain são importados sob demanda (dentro das funções), para que
+# a inicialização e os reruns do Streamlit não paguem o custo desses imports
+
+def load_llm(id_model, temperature, backends=None):
+  """
+  Modelo usado nas análises: LLMRouter sobre os backends de LLM_BACKENDS
+  (ou da lista `backends`); sem configuração, só o ChatGroq com id_model.
+  """
+  from llm_router import LLMRouter, backends_from_env
+
+  return LLMRouter.from_config(backends or backends_from_env(id_model), temperature)
+
+
+@lru_cache(maxsize=16)
+def build_prompt_template(prompt_text):
+  # Mesmo texto, mesmo objeto: as cadeias de get_chain são reaproveitadas entre chamadas
+  from langchain_core.prompts import ChatPromptTemplate
+
+  return ChatPromptTemplate.from_template(prompt_text)
+
+
+# Cadeias prompt | llm já montadas: {(id(prompt_template), id(llm)): (prompt_template, llm, chain)}.
+# Limitado às CHAIN_CACHE_SIZE usadas mais recentemente, para não manter vivos clientes
+# descartados (ex.: troca de modelo no st.cache_resource) nem suas conexões HTTP
+CHAIN_CACHE_SIZE = 16
+_chains = OrderedDict()
+_chains_lock = threading.Lock()
+
+
+def get_chain(prompt_template, llm):
+  key = (id(prompt_template), id(llm))
+  with _chains_lock:
+    cached = _chains.get(key)
+    # As referências guardadas junto impedem que os ids sejam reaproveitados enquanto a entrada existir
+    if cached is None or cached[0] is not prompt_template or cached[1] is not llm:
+      cached = (prompt_template, llm, prompt_template | llm)
+      _chains[key] = cached
+    _chains.move_to_end(key)
+    while len(_chains) > CHAIN_CACHE_SIZE:
+      _chains.popitem(last=False)
+  return cached[2]
 
 
 def format_res(res, return_thinking=False):
@@ -32,65 +75,406 @@ def format_res(res, return_thinking=False):
   return res
 
 
-def parse_doc(file_path):
-  converter = DocumentConverter()
-  result = converter.convert(file_path)
-  content = result.document.export_to_markdown()
-  return content
+# Pool de conversores docling compartilhado por todo o processo (todas as sessões
+# do Streamlit usam o mesmo módulo). Carregar os modelos de layout/OCR costuma
+# demorar mais que a própria conversão, então os conversores são reaproveitados.
+CONVERTER_POOL_SIZE = int(os.getenv("DOCLING_POOL_SIZE", "2"))
 
+_converter_pool = queue.Queue()
+_converter_lock = threading.Lock()
+_converters_created = 0
 
-def parse_res_llm(response_text: str, required_fields: list) -> dict:
+
+# Limite de páginas em conversão ao mesmo tempo no processo (soma de todas as
+# faixas em andamento): a memória do docling cresce com as páginas abertas, não
+# com o número de conversores, então um PDF longo não soma vários picos.
+MAX_CONCURRENT_PAGES = int(os.getenv("DOCLING_MAX_CONCURRENT_PAGES", "20"))
+
+
+class _PageBudget:
+  def __init__(self, limit):
+    self.limit = max(1, limit)
+    self.in_use = 0
+    self._cond = threading.Condition()
+
+  @contextmanager
+  def reserve(self, pages):
+    pages = max(1, min(pages, self.limit))
+    with self._cond:
+      while self.in_use + pages > self.limit:
+        self._cond.wait()
+      self.in_use += pages
     try:
-        # Remove a parte do raciocínio (<think>...</think>)
-        if "</think>" in response_text:
-            response_text = response_text.split("</think>")[-1].strip()
+      yield
+    finally:
+      with self._cond:
+        self.in_use -= pages
+        self._cond.notify_all()
 
-        # Localiza o JSON e faz o parsing
-        start_idx = response_text.find('{')
-        end_idx = response_text.rfind('}') + 1
-        if start_idx == -1 or end_idx == 0:
-            raise json.JSONDecodeError("Nenhum JSON encontrado na resposta", response_text, 0)
 
-        json_str = response_text[start_idx:end_idx]
-        info_cv = json.loads(json_str)
+_page_budget = _PageBudget(MAX_CONCURRENT_PAGES)
 
-        for field in required_fields:
-            if field not in info_cv:
-                info_cv[field] = []
 
-        return info_cv
+def _reset_converter_pool():
+  # Processos filhos (fork) não devem herdar conversores nem o lock do pai
+  global _converter_pool, _converter_lock, _converters_created, _page_budget
+  _converter_pool = queue.Queue()
+  _converter_lock = threading.Lock()
+  _converters_created = 0
+  _page_budget = _PageBudget(MAX_CONCURRENT_PAGES)
 
-    except json.JSONDecodeError:
-        #Erro ao interpretar a resposta do modelo
-        return
+
+if hasattr(os, "register_at_fork"):
+  os.register_at_fork(after_in_child=_reset_converter_pool)
 
 
-def save_json_cv(new_data, path_json, key_name="name"):
-    # Carrega o JSON existente, se houver
-    if os.path.exists(path_json):
-        with open(path_json, "r", encoding="utf-8") as f:
-            data = json.load(f)
+def _new_converter():
+  from docling.document_converter import DocumentConverter
+
+  converter = DocumentConverter()
+  # Inicializa o pipeline de PDF agora (carrega os modelos) e não na primeira conversão
+  if hasattr(converter, "initialize_pipeline"):
+    from docling.datamodel.base_models import InputFormat
+    converter.initialize_pipeline(InputFormat.PDF)
+  return converter
+
+
+@contextmanager
+def get_converter(timeout=None):
+  """
+  Empresta um DocumentConverter do pool do processo.
+
+  Cria conversores sob demanda até CONVERTER_POOL_SIZE; depois disso aguarda
+  um conversor ser devolvido (no máximo `timeout` segundos, se informado).
+  """
+  global _converters_created
+  deadline = None if timeout is None else time.monotonic() + timeout
+  converter = None
+  while converter is None:
+    try:
+      converter = _converter_pool.get_nowait()
+    except queue.Empty:
+      pass
+    else:
+      break
+    with _converter_lock:
+      create = _converters_created < CONVERTER_POOL_SIZE
+      if create:
+        _converters_created += 1
+    if create:
+      try:
+        converter = _new_converter()
+      except Exception:
+        with _converter_lock:
+          _converters_created -= 1
+        raise
     else:
-        data = []
+      # Espera em intervalos curtos: se um aquecimento em andamento falhar,
+      # a vaga liberada no pool é percebida e o conversor é criado aqui
+      wait = 1.0 if deadline is None else min(1.0, deadline - time.monotonic())
+      if wait <= 0:
+        raise TimeoutError("Nenhum conversor docling disponível")
+      try:
+        converter = _converter_pool.get(timeout=wait)
+      except queue.Empty:
+        pass
+
+  try:
+    yield converter
+  finally:
+    _converter_pool.put(converter)
+
+
+def warmup_converters(pool_size=None):
+  """
+  Pré-carrega os conversores do pool (usar na inicialização do app ou como
+  `initializer` de um ProcessPoolExecutor).
+
+  Args:
+      pool_size (int): Quantidade de conversores mantidos aquecidos. Se omitido,
+          usa CONVERTER_POOL_SIZE (variável de ambiente DOCLING_POOL_SIZE).
+
+  Returns:
+      int: Número de conversores disponíveis no pool
+  """
+  global CONVERTER_POOL_SIZE, _converters_created
+  if pool_size is not None:
+    CONVERTER_POOL_SIZE = max(1, int(pool_size))
+
+  while True:
+    with _converter_lock:
+      if _converters_created >= CONVERTER_POOL_SIZE:
+        return _converters_created
+      _converters_created += 1
+    try:
+      _converter_pool.put(_new_converter())
+    except Exception:
+      with _converter_lock:
+        _converters_created -= 1
+      raise
+
+
+@lru_cache(maxsize=1)
+def _supports_page_range():
+  # page_range só existe nas versões mais novas do docling
+  import inspect
+  from docling.document_converter import DocumentConverter
+
+  return "page_range" in inspect.signature(DocumentConverter.convert).parameters
+
+
+def parse_doc(file_path, max_pages=None, page_chunk=None):
+  """
+  Converte o PDF em markdown lendo no máximo `max_pages` páginas (MAX_PDF_PAGES),
+  em faixas de `page_chunk` páginas (PDF_PAGE_CHUNK) convertidas uma de cada vez.
+  Cada faixa reserva suas páginas no limite do processo (DOCLING_MAX_CONCURRENT_PAGES).
+  """
+  max_pages = max_pages or ingest.MAX_PDF_PAGES
+  page_chunk = page_chunk or ingest.PDF_PAGE_CHUNK
+  with metrics.span("parse_doc") as span:
+    pages = ingest.count_pages(file_path)
+    ranges = ingest.page_ranges(pages, max_pages, page_chunk if _supports_page_range() else max_pages)
+    span.update(pages=pages, chunks=len(ranges), converter_wait_ms=0.0)
+    if pages and pages > max_pages:
+      span["truncated_pages"] = pages - max_pages
+      metrics.incr("pdf_pages_truncated_total", value=pages - max_pages)
+
+    parts = []
+    for start, end in ranges:
+      with _page_budget.reserve(end - start + 1):
+        started = time.perf_counter()
+        with get_converter() as converter:
+          # Tempo esperando páginas/conversor livres (separado da conversão em si)
+          span["converter_wait_ms"] += round((time.perf_counter() - started) * 1000, 3)
+          if _supports_page_range():
+            result = converter.convert(file_path, page_range=(start, end), max_file_size=ingest.MAX_UPLOAD_BYTES)
+          else:
+            # docling sem page_range: conversão única, recusando documentos acima do limite
+            result = converter.convert(file_path, max_num_pages=max_pages, max_file_size=ingest.MAX_UPLOAD_BYTES)
+      parts.append(result.document.export_to_markdown())
+      del result
+    content = "\n\n".join(parts)
+    span["chars"] = len(content)
+  return content
+
+
+def _docling_version():
+  try:
+    from importlib.metadata import version
+    return version("docling")
+  except Exception:
+    return "desconhecida"
+
+
+def parse_doc_cached(file_path):
+  # O markdown depende só do conteúdo do arquivo (e da versão do docling)
+  key = text_hash(file_hash(file_path), _docling_version(), ingest.MAX_PDF_PAGES, ingest.PDF_PAGE_CHUNK)
+  cache = get_cache()
+  content = cache.get("markdown", key)
+  metrics.incr("cache_lookups_total", namespace="markdown", hit=content is not None)
+  if content is None:
+    content = parse_doc(file_path)
+    cache.set("markdown", key, content)
+  return content
 
-    if isinstance(data, dict):
-        data = [data]
 
-    # Verifica se já existe um currículo com o mesmo nome
-    candidates = [entry.get(key_name) for entry in data]
-    if new_data.get(key_name) in candidates:
-        st.warning(f"Currículo '{new_data.get(key_name)}' já registrado. Ignorando.")
+@metrics.timed("parse_res_llm")
+def parse_res_llm(response_text: str, required_fields: list) -> dict:
+    # Parser tolerante (cercas de código, vírgulas sobrando, resposta cortada) + validação do schema.
+    # Campos ausentes ou inválidos ficam com [] como antes; use parse_with_repair para corrigi-los
+    info_cv, errors, fixes = validation.parse_and_validate(response_text, required_fields)
+    for fix in fixes:
+        metrics.incr("json_fixes_total", fix=fix)
+
+    if info_cv is None:
+        #Erro ao interpretar a resposta do modelo (registrado nas métricas com o motivo)
+        metrics.failure("parse_res_llm", "sem_json", repr(response_text[:200]))
         return
 
-    # Adiciona e salva
-    data.append(new_data)
-    with open(path_json, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    if errors:
+        metrics.failure("parse_res_llm", "campos_invalidos", ", ".join(f"{k}: {v}" for k, v in errors.items()))
+    return validation.fill_defaults(info_cv, required_fields)
+
+
+REPAIR_CV_TOKENS = int(os.getenv("REPAIR_CV_TOKENS", "1200"))
+
+
+def _schema_lines(schema):
+  # {campo: linha do schema} para montar o pedido de correção só com os campos com problema
+  return {m.group(1): line.strip().rstrip(",") for line in schema.splitlines()
+          for m in [re.match(r'\s*"(\w+)":', line)] if m}
+
+
+def parse_with_repair(response_text, fields, llm, content, schema, job_details="", prompt_score=""):
+  """
+  parse_res_llm com correção: se campos vierem ausentes ou inválidos, um
+  prompt curto pede ao LLM só esses campos, sem repetir a análise completa.
+
+  Returns:
+      dict: Dados estruturados, ou None se nem a correção produziu JSON
+  """
+  data, errors, fixes = validation.parse_and_validate(response_text, fields)
+  for fix in fixes:
+    metrics.incr("json_fixes_total", fix=fix)
+  if not errors:
+    return data
+
+  lines = _schema_lines(schema)
+  bad_fields = "\n".join(f"{lines.get(field, field)}  (problema: {reason})" for field, reason in errors.items())
+  if "score" in errors and prompt_score:
+    bad_fields += "\n\nPara o cálculo do campo score:\n" + budget.compact_prompt_text(prompt_score)
+  cv, report = budget.fit_to_budget(content, REPAIR_CV_TOKENS)
+  inputs = {"fields": bad_fields, "partial": json.dumps(data or {}, ensure_ascii=False), "cv": cv,
+            "job": job_details or "-"}
+  report["prompt_tokens"] = sum(budget.count_tokens(v) for v in inputs.values())
+
+  from config import repair_prompt_text
+  try:
+    with metrics.span("llm.repair", model=model_name(llm), fields=list(errors)) as span:
+      output = get_chain(build_prompt_template(repair_prompt_text), llm).invoke(inputs)
+      span.update(budget.log_usage(model_name(llm), report, output))
+    fixed, _ = validation.extract_json(format_res(output.content))
+  except Exception:
+    # A falha já fica registrada no span; segue com o que foi possível aproveitar
+    fixed = None
+
+  merged = {**(data or {}), **{k: v for k, v in (fixed or {}).items() if k in errors}}
+  repaired, still_bad = validation.validate(merged, fields)
+  metrics.incr("llm_repairs_total", outcome="ok" if not still_bad else "failed")
+  if still_bad:
+    metrics.failure("parse_res_llm", "correcao_incompleta", ", ".join(still_bad))
+  if data is None and fixed is None:
+    return None
+  return validation.fill_defaults(repaired, fields)
+
+
+@metrics.timed("store.save_json_cv")
+def save_json_cv(new_data, path_db, key_name="name", markdown=None, warn=True, job_id=None, score_hash=None,
+                 dedup_policy=None):
+    # Inserção atômica; o índice único em cv_key faz a verificação de duplicidade exata.
+    # job_id/score_hash (ver job_score_hash) permitem reavaliar o score quando a vaga ou o critério mudar.
+    # Quase duplicados (mesmo e-mail ou markdown parecido) seguem dedup_policy (DEDUP_POLICY); um nome
+    # igual sem conteúdo parecido pode ser outra pessoa e é gravado sob outra chave.
+    # Retorna a cv_key gravada (a do registro existente no merge), ou None se nada foi gravado
+    policy = dedup_policy or dedup.DEDUP_POLICY
+    fp = dedup.fingerprint(markdown or "", new_data.get("name"))
+    match = dedup.find_duplicate(path_db, fp=fp)
+    cv_key, parent_id = str(new_data.get(key_name)), None
+    if match and policy == "merge":
+        storage.replace_cv(path_db, match["cv_id"], new_data, markdown=markdown, job_id=job_id, score_hash=score_hash)
+        dedup.register(path_db, match["cv_key"], fp=fp)
+        return match["cv_key"]
+    if match and policy == "version":
+        cv_key, parent_id = storage.version_key(path_db, dedup.base_key(match["cv_key"])), match["cv_id"]
+    elif match:
+        if warn:
+            st.warning(f"Currículo '{new_data.get(key_name)}' já registrado como '{match['cv_key']}'. Ignorando.")
+        return None
+    homonym = dedup.find_homonym(path_db, new_data.get("name")) if not match else None
+    if homonym:
+        # Outra pessoa com o mesmo nome: grava sob uma chave livre em vez de bater no índice único
+        cv_key = storage.free_key(path_db, cv_key)
+
+    if not storage.insert_cv(path_db, new_data, key_name=key_name, markdown=markdown, job_id=job_id,
+                             score_hash=score_hash, cv_key=cv_key):
+        if warn:
+            st.warning(f"Currículo '{new_data.get(key_name)}' já registrado. Ignorando.")
+        return None
+    dedup.register(path_db, cv_key, parent_id=parent_id, fp=fp)
+    if homonym and warn:
+        st.info(f"Já existe um currículo de '{homonym}' com o mesmo nome e conteúdo diferente; "
+                "gravado como outro candidato.")
+    # Atualiza incrementalmente o índice de busca de candidatos
+    search.index_new_records(path_db)
+    return cv_key
+
+
+@metrics.timed("store.load_json_cv")
+def load_json_cv(path_db):
+    return storage.fetch_all_cv(path_db)
+
+
+def count_cv(path_db):
+    return storage.count_cv(path_db)
+
+
+def cv_version(path_db):
+    return storage.cv_version(path_db)
+
+
+def scores_version(path_db):
+    return storage.scores_version(path_db)
+
+
+@metrics.timed("store.query_cv_page")
+def query_cv_page(path_db, page=1, page_size=20, sort_by="score", descending=True, min_score=None, area=None):
+    return storage.query_cv(path_db, page=page, page_size=page_size, sort_by=sort_by,
+                            descending=descending, min_score=min_score, area=area)
+
+
+def list_cv_areas(path_db):
+    return storage.list_areas(path_db)
+
+
+@metrics.timed("store.export_json_cv")
+def export_json_cv(path_db):
+    return storage.export_json(path_db)
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+        return True
+    except ImportError:
+        return False
 
 
-def load_json_cv(path_json):
-    with open(path_json, "r", encoding="utf-8") as f:
-        return json.load(f)
+@metrics.timed("store.export_parquet_cv")
+def export_parquet_cv(path_db, chunk_size=5000):
+    """
+    Export colunar: um .zip com curriculos.parquet (campos escalares),
+    competencias.parquet e pontos_fortes.parquet (uma linha por item, ligadas
+    por cv_id). Requer pyarrow (dependência opcional). Cada tabela é lida e
+    gravada em blocos de chunk_size linhas (um row group por bloco), num
+    arquivo temporário: só o .zip final fica em memória.
+
+    Returns:
+        bytes: Conteúdo do .zip
+    """
+    import io
+    import tempfile
+    import zipfile
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {"int": pa.int64(), "float": pa.float64(), "text": pa.string()}
+    buffer = io.BytesIO()
+    with tempfile.TemporaryDirectory() as tmp, zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as zf:
+        for table, (columns, _) in storage.EXPORT_TABLES.items():
+            schema = pa.schema([(name, types[kind]) for name, kind in columns])
+            path = os.path.join(tmp, f"{table}.parquet")
+            with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+                for rows in storage.iter_export_rows(path_db, table, chunk_size):
+                    writer.write_table(pa.Table.from_pylist(
+                        [dict(zip(schema.names, row)) for row in rows], schema=schema))
+            zf.write(path, f"{table}.parquet")
+    return buffer.getvalue()
+
+
+def analytics_summary(path_db, requirements=()):
+    """Dados do painel analítico, lidos dos agregados mantidos pelo banco (ver storage)."""
+    return {
+        "scores": pd.DataFrame(storage.score_distribution(path_db), columns=["Score", "Currículos"]),
+        "areas": pd.DataFrame(storage.area_counts(path_db), columns=["Área", "Currículos"]),
+        "skills": pd.DataFrame(storage.skill_counts(path_db), columns=["Competência", "Currículos"]),
+        "coverage": pd.DataFrame(storage.requirement_coverage(path_db, list(requirements)),
+                                 columns=["Pré-requisito", "Currículos"]),
+    }
+
+
+def migrate_json_cv(path_json, path_db, key_name="name"):
+    return storage.migrate_json(path_json, path_db, key_name=key_name)
 
 
 def show_cv_result(result: dict):
@@ -117,25 +501,17 @@ def show_cv_result(result: dict):
         md += "\n".join([f"  - {i}" for i in result["important_considerations"]]) + "\n"
     if "final_recommendations" in result:
         md += f"- **Conclusão e recomendações:** {result['final_recommendations']}\n"
+    if result.get("score_samples"):
+        # Score por autoconsistência (consistency.py): média das amostras e intervalo de 95%
+        md += f"- **Score:** {result['score']:.1f} (média de {len(result['score_samples'])} amostras"
+        if result.get("score_ci"):
+            md += f", IC 95%: {result['score_ci'][0]:.1f} a {result['score_ci'][1]:.1f}"
+        md += ")\n"
     return md
 
 
-def save_job_to_csv(data, filename):
-    headers = ['title', 'description', 'details']
-    file_exists = os.path.exists(filename)
-
-    with open(filename, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=headers, delimiter=';')
-        if not file_exists:
-            writer.writeheader()
-        writer.writerow(data)
-
-
-def load_job(csv_path):
-  try:
-    df = pd.read_csv(csv_path, sep=';', encoding='utf-8')
-    job = df.iloc[-1]
-    prompt_text = f"""
+def render_job(job):
+  prompt_text = f"""
     **Vaga para {job['title']}**
 
     **Descrição da Vaga:**
@@ -145,11 +521,71 @@ def load_job(csv_path):
     {job['details']}
     """
 
-    return prompt_text.strip()
+  return prompt_text.strip()
+
+
+# Texto renderizado das vagas já consultadas neste processo: {(path_db, job_id): (hash, texto)}.
+# Vale só enquanto o content_hash no banco for o mesmo (outro processo pode ter atualizado a vaga)
+_job_cache = {}
+
+
+def save_job(job, path_db):
+  """
+  Cadastra (ou atualiza) a vaga no banco e retorna seu id estável.
+  Chamadas repetidas com a mesma vaga não escrevem no banco.
+  """
+  job_id = storage.job_id_for(job)
+  content_hash = storage.job_hash(job)
+  cached = _job_cache.get((path_db, job_id))
+  if cached and cached[0] == content_hash and storage.fetch_job_hash(path_db, job_id) == content_hash:
+    return job_id
+
+  prompt_text = render_job(job)
+  storage.upsert_job(path_db, job, prompt_text)
+  _job_cache[(path_db, job_id)] = (content_hash, prompt_text)
+  return job_id
+
 
-  except FileNotFoundError:
-    return "Erro: Arquivo de vagas não encontrado"
+def load_job(path_db, job_id):
+  cached = _job_cache.get((path_db, job_id))
+  if cached and cached[0] == storage.fetch_job_hash(path_db, job_id):
+    return cached[1]
 
+  job = storage.fetch_job(path_db, job_id)
+  if job is None:
+    return "Erro: Vaga não encontrada"
+  _job_cache[(path_db, job_id)] = (job["content_hash"], job["prompt_text"])
+  return job["prompt_text"]
+
+
+def list_jobs(path_db):
+  return storage.list_jobs(path_db)
+
+
+def job_score_hash(path_db, job_id, prompt_score):
+  """Hash da vaga + critério de pontuação usados no score (muda quando qualquer um dos dois muda)."""
+  return storage.scoring_hash(storage.fetch_job_hash(path_db, job_id), prompt_score)
+
+
+def migrate_jobs_csv(path_csv, path_db):
+  return storage.migrate_jobs_csv(path_csv, path_db, render_job)
+
+
+def score_history_table(path_db, cv_key):
+  # Pontuações do candidato ao longo das reavaliações (mais antiga primeiro)
+  titles = {j["job_id"]: j["title"] for j in storage.list_jobs(path_db)}
+  rows = storage.score_history(path_db, cv_key=cv_key)
+  return pd.DataFrame([{"Data": r["scored_at"], "Vaga": titles.get(r["job_id"], r["job_id"]), "Score": r["score"]}
+                       for r in rows])
+
+
+def job_score_table(path_db):
+  # Matriz candidato x vaga (uma coluna por vaga, com o título como cabeçalho)
+  titles = {j["job_id"]: j["title"] for j in storage.list_jobs(path_db)}
+  df = pd.DataFrame.from_dict(storage.score_matrix(path_db), orient="index")
+  return df.rename(columns=titles).rename_axis("name").reset_index()
+
+@metrics.timed("process_cv")
 def process_cv(schema, job_details, prompt_template, prompt_score, llm, file_path):
 
   if file_path:
@@ -158,35 +594,101 @@ def process_cv(schema, job_details, prompt_template, prompt_score, llm, file_pat
 
   content = parse_doc(file_path)
 
-  chain = prompt_template | llm
-  output = chain.invoke({"schema": schema, "cv": content, "job": job_details, "prompt_score": prompt_score})
+  return analyze_cv(schema, job_details, prompt_template, prompt_score, llm, content)
+
+
+def model_name(llm):
+  return getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+
+
+def analyze_cv(schema, job_details, prompt_template, prompt_score, llm, content, token_budget=budget.CV_TOKEN_BUDGET):
+  # Etapa do LLM separada da leitura do PDF (usada também pela triagem em lote)
+  # O currículo é compactado/cortado por seção para caber no orçamento de tokens
+  inputs, report = budget.build_prompt_inputs(schema, job_details, prompt_score, content, token_budget)
+  chain = get_chain(prompt_template, llm)
+  with metrics.span("llm.invoke", model=model_name(llm)) as span:
+    output = chain.invoke(inputs)
+    span.update(budget.log_usage(model_name(llm), report, output))
 
   res = format_res(output.content)
 
   return output, res
 
 
-def display_json_table(path_json):
-  with open(path_json, "r", encoding="utf-8") as f:
-    data = json.load(f)
+def analysis_cache_key(schema, job_details, prompt_template, prompt_score, llm, content, consensus=True):
+  # Qualquer mudança no modelo, temperatura, prompt/schema, vaga, currículo ou modo de score gera outra chave.
+  # consensus=False: chave da análise base, antes das amostras de score (ver consistency.py)
+  import consistency
+
+  model = model_name(llm)
+  template = prompt_template.pretty_repr() if hasattr(prompt_template, "pretty_repr") else str(prompt_template)
+  return text_hash(
+    model,
+    getattr(llm, "temperature", None),
+    text_hash(template, schema, prompt_score),
+    text_hash(job_details),
+    text_hash(content),
+    budget.CV_TOKEN_BUDGET,
+    *(consistency.cache_tag() if consensus else ()),
+  )
 
-  df = pd.DataFrame(data)
-  return df
 
-def clear_all_cv(path_json):
+def analyze_cv_cached(schema, job_details, prompt_template, prompt_score, llm, content, fields, gate=None):
+  """
+  Versão com cache de analyze_cv + parse_res_llm.
+
+  gate (ratelimit.RateLimitGate) é a pausa compartilhada das amostras de score
+  quando recebem 429; sem ele, cada chamada usa uma própria.
+
+  Returns:
+      tuple: (dados estruturados ou None, True se veio do cache)
+  """
+  import consistency
+
+  key = analysis_cache_key(schema, job_details, prompt_template, prompt_score, llm, content)
+  cache = get_cache()
+  structured_data = cache.get("analysis", key)
+  if structured_data is not None:
+    return structured_data, True
+
+  # Com amostras de score, a análise base vai para o cache antes delas: um 429 numa
+  # amostra não faz a próxima tentativa repetir a chamada completa
+  base_key = analysis_cache_key(schema, job_details, prompt_template, prompt_score, llm, content, consensus=False)
+  structured_data = cache.get("analysis", base_key) if base_key != key else None
+  if structured_data is None:
+    output, res = analyze_cv(schema, job_details, prompt_template, prompt_score, llm, content)
+    structured_data = parse_with_repair(res, fields, llm, content, schema, job_details, prompt_score)
+    if base_key != key and consistency.cacheable(structured_data):
+      cache.set("analysis", base_key, structured_data)
+
+  if "score" in fields:
+    structured_data = consistency.apply_with_backoff(structured_data, content, job_details, llm, prompt_score, gate)
+  # Respostas inválidas e scores de consenso parcial não são guardados, para que uma nova tentativa chame o LLM
+  if consistency.cacheable(structured_data):
+    cache.set("analysis", key, structured_data)
+  return structured_data, False
+
+
+@metrics.timed("store.display_json_table")
+def display_json_table(path_db, page=1, page_size=200):
+  # Uma página da tabela completa, na ordem de inserção (não carrega todos os registros)
+  rows, total = storage.query_cv(path_db, page=page, page_size=page_size, sort_by="recent", descending=False)
+  return pd.DataFrame([{k: v for k, v in data.items() if k != "cv_key"} for _, data in rows]), total
+
+@metrics.timed("store.clear_all_cv")
+def clear_all_cv(path_db):
     """
-    Remove todos os currículos armazenados no arquivo JSON
+    Remove todos os currículos armazenados no banco
     
     Args:
-        path_json (str): Caminho para o arquivo JSON dos currículos
+        path_db (str): Caminho para o banco SQLite dos currículos
         
     Returns:
         bool: True se operação foi bem-sucedida, False caso contrário
     """
     try:
-        if os.path.exists(path_json):
-            # Remove o arquivo completamente
-            os.remove(path_json)
+        if os.path.exists(path_db):
+            storage.delete_all_cv(path_db)
             return True
         return False
     except Exception as e:
@@ -0,0 +1,236 @@
+"""
+Extração tolerante e validação do JSON devolvido pelo LLM.
+
+O caminho rápido continua sendo json.loads no trecho entre o primeiro "{" e o
+último "}". Só quando ele falha o texto passa pelo parser tolerante, que
+remove cercas de código (```json), vírgulas sobrando antes de "}" / "]" e
+fecha strings, listas e objetos de respostas cortadas no meio. O resultado é
+validado pelo modelo pydantic CVAnalysis (score numérico entre 0 e 10, campos
+de lista como listas de texto); os campos que continuarem inválidos ou
+ausentes são devolvidos em `errors`, para o pedido de correção ao LLM.
+"""
+import json
+import re
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+
+LIST_FIELDS = ("skills", "interview_questions", "strengths", "areas_for_development", "important_considerations")
+TEXT_FIELDS = ("name", "area", "summary", "education", "final_recommendations")
+
+_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)(?:```|\Z)", re.S | re.I)
+
+
+class CVAnalysis(BaseModel):
+    """Schema da análise. Os campos são opcionais aqui; quais são obrigatórios vem da lista `fields`."""
+
+    model_config = ConfigDict(extra="allow")
+
+    name: Optional[str] = None
+    area: Optional[str] = None
+    summary: Optional[str] = None
+    skills: Optional[List[str]] = None
+    education: Optional[str] = None
+    interview_questions: Optional[List[str]] = None
+    strengths: Optional[List[str]] = None
+    areas_for_development: Optional[List[str]] = None
+    important_considerations: Optional[List[str]] = None
+    final_recommendations: Optional[str] = None
+    score: Optional[float] = Field(default=None, ge=0.0, le=10.0)
+
+    @field_validator(*LIST_FIELDS, mode="before")
+    @classmethod
+    def _as_list(cls, value):
+        # Um texto único vira lista de um item; itens vazios são descartados
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = [value]
+        if not isinstance(value, list):
+            raise ValueError("deve ser uma lista de textos")
+        return [str(item).strip() for item in value if str(item).strip()]
+
+    @field_validator(*TEXT_FIELDS, mode="before")
+    @classmethod
+    def _as_text(cls, value):
+        if isinstance(value, list):
+            return "; ".join(str(item) for item in value)
+        if isinstance(value, (int, float)):
+            return str(value)
+        return value
+
+    @field_validator("score", mode="before")
+    @classmethod
+    def _as_score(cls, value):
+        # Aceita "7,5", "7.5/10" e "Nota: 8"
+        if isinstance(value, str):
+            match = re.search(r"\d+(?:[.,]\d+)?", value)
+            if not match:
+                raise ValueError("score sem valor numérico")
+            value = float(match.group().replace(",", "."))
+        return value
+
+
+def _clean(text):
+    """Remove vírgulas sobrando antes de "}" ou "]" (fora de strings)."""
+    out = []
+    in_string = escape = False
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "}]":
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+        out.append(ch)
+    return "".join(out)
+
+
+def _scan(text):
+    """Estado do texto: (dentro de string?, pilha de fechamentos, posições das vírgulas, fim do objeto ou None)."""
+    stack, commas = [], []
+    in_string = escape = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return False, [], commas, i + 1
+        elif ch == ",":
+            commas.append(i)
+    return in_string, stack, commas, None
+
+
+def _close(prefix):
+    in_string, stack, _, _ = _scan(prefix)
+    if in_string:
+        prefix += '"'
+    prefix = re.sub(r"[\s,:]+$", "", prefix)
+    if stack and stack[-1] == "}":
+        # Chave sem valor no fim de um objeto é descartada
+        prefix = re.sub(r'(?<=[{,])\s*"[^"\\]*"$', "", prefix).rstrip().rstrip(",")
+    return _clean(prefix + "".join(reversed(stack)))
+
+
+def extract_json(response_text):
+    """
+    Localiza e interpreta o objeto JSON da resposta.
+
+    Returns:
+        tuple: (dict ou None, lista de correções aplicadas: fence, trailing_comma, truncated)
+    """
+    text = response_text or ""
+    if "</think>" in text:
+        text = text.split("</think>")[-1]
+    fixes = []
+
+    start, end = text.find("{"), text.rfind("}") + 1
+    if start != -1 and end > start:
+        try:
+            data = json.loads(text[start:end])
+            if isinstance(data, dict):
+                return data, fixes
+        except ValueError:
+            pass
+
+    fence = _FENCE_RE.search(text)
+    if fence and "{" in fence.group(1):
+        text = fence.group(1)
+        fixes.append("fence")
+    start = text.find("{")
+    if start == -1:
+        return None, fixes
+    text = text[start:]
+
+    in_string, stack, commas, end = _scan(text)
+    if end is not None:
+        candidate = _clean(text[:end])
+        if candidate != text[:end]:
+            fixes.append("trailing_comma")
+        try:
+            data = json.loads(candidate)
+            return (data, fixes) if isinstance(data, dict) else (None, fixes)
+        except ValueError:
+            return None, fixes
+
+    # Resposta cortada: fecha o que ficou aberto e, se ainda não for JSON válido,
+    # recua até a vírgula anterior (descarta o último item incompleto)
+    fixes.append("truncated")
+    # Texto cortado no meio de uma string: o valor parcial é descartado
+    for cut in ([] if in_string else [len(text)]) + commas[::-1]:
+        try:
+            data = json.loads(_close(text[:cut]))
+        except ValueError:
+            continue
+        if isinstance(data, dict):
+            return data, fixes
+    return None, fixes
+
+
+def validate(data, fields):
+    """
+    Valida os campos pelo CVAnalysis.
+
+    Returns:
+        tuple: (dados com os campos válidos já normalizados, {campo: motivo} dos inválidos/ausentes)
+    """
+    data = dict(data)
+    errors = {}
+    for _ in range(len(data) + 1):
+        try:
+            model = CVAnalysis.model_validate(data)
+            break
+        except ValidationError as e:
+            for error in e.errors():
+                field = str(error["loc"][0])
+                errors[field] = error["msg"]
+                data.pop(field, None)
+    else:
+        return {}, {field: "inválido" for field in fields}
+
+    clean = model.model_dump(exclude_none=True)
+    for field in fields:
+        if clean.get(field) is None and field not in errors:
+            errors[field] = "ausente"
+    return clean, {field: msg for field, msg in errors.items() if field in fields}
+
+
+def parse_and_validate(response_text, fields):
+    """
+    extract_json + validate.
+
+    Returns:
+        tuple: (dados ou None se não há JSON, {campo: motivo}, correções aplicadas)
+    """
+    data, fixes = extract_json(response_text)
+    if data is None:
+        return None, {field: "ausente" for field in fields}, fixes
+    clean, errors = validate(data, fields)
+    return clean, errors, fixes
+
+
+def fill_defaults(data, fields):
+    """Campos ausentes ou inválidos recebem [] (mesmo comportamento do parse_res_llm original)."""
+    for field in fields:
+        if data.get(field) is None:
+            data[field] = []
+    return data
@@ -0,0 +1,357 @@
+"""
+Fila de trabalho persistente (SQLite) para análise de currículos em segundo plano.
+
+O upload só copia o PDF para a pasta da fila e registra a tarefa; um pool de
+workers (threads no próprio processo do Streamlit ou o processo separado
+`python work_queue.py`) faz a leitura do PDF, o pré-filtro e a chamada ao LLM.
+Tarefas com falha são repetidas com espera crescente e tarefas "em execução"
+cujo worker parou de dar sinal de vida (queda do processo) voltam para a fila.
+
+Uso como worker separado:
+    python work_queue.py [--workers 2]
+"""
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import lru_cache
+
+import storage
+from ingest import spool_to_file
+from metrics import metrics
+
+SPOOL_DIR = os.getenv("QUEUE_SPOOL_DIR", os.path.join(".fila", "uploads"))
+QUEUE_WORKERS = int(os.getenv("QUEUE_WORKERS", "2"))
+# Com QUEUE_IN_PROCESS=0 o app só enfileira e os workers rodam em `python work_queue.py`
+QUEUE_IN_PROCESS = os.getenv("QUEUE_IN_PROCESS", "1") == "1"
+MAX_ATTEMPTS = 3
+HEARTBEAT_INTERVAL = 10.0   # segundos entre sinais de vida de uma tarefa em execução
+STALE_AFTER = 60.0          # sem sinal de vida por esse tempo, a tarefa é considerada perdida
+POLL_INTERVAL = 1.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tarefas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_path TEXT NOT NULL,
+    original_name TEXT,
+    job_id TEXT NOT NULL,
+    options TEXT NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    error TEXT,
+    result TEXT,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_tarefas_fila ON tarefas(status, available_at, id);
+"""
+
+# Estados finais: done (salvo), duplicate (já existia), filtered (barrado no pré-filtro), failed
+FINAL_STATUSES = ("done", "duplicate", "filtered", "failed")
+
+_schema_ready = set()
+
+
+@contextmanager
+def _connect(path_db):
+    # storage.connect + criação da tabela da fila na primeira vez
+    with storage.connect(path_db) as conn:
+        if path_db not in _schema_ready:
+            conn.executescript(_SCHEMA)
+            _schema_ready.add(path_db)
+        yield conn
+
+
+def spool_upload(uploaded_file, spool_dir=SPOOL_DIR):
+    """
+    Copia o upload para a pasta da fila com nome único e retorna o caminho
+    (ingest.UploadRejected se passar de MAX_UPLOAD_MB ou não for PDF).
+    """
+    os.makedirs(spool_dir, exist_ok=True)
+    return spool_to_file(uploaded_file, path=os.path.join(spool_dir, f"{uuid.uuid4().hex}.pdf"))
+
+
+def enqueue(path_db, file_path, job_id, original_name=None, options=None, max_attempts=MAX_ATTEMPTS):
+    """Registra uma tarefa de análise e retorna seu id."""
+    now = time.time()
+    with _connect(path_db) as conn:
+        cur = conn.execute(
+            """INSERT INTO tarefas (file_path, original_name, job_id, options, max_attempts,
+                                    created_at, updated_at, available_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            (file_path, original_name or os.path.basename(file_path), job_id,
+             json.dumps(options or {}, ensure_ascii=False), max_attempts, now, now, now),
+        )
+        return cur.lastrowid
+
+
+def claim(path_db, worker):
+    """Reserva atomicamente a próxima tarefa disponível (ou None)."""
+    now = time.time()
+    with _connect(path_db) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            """SELECT id FROM tarefas WHERE status = 'pending' AND available_at <= ?
+               ORDER BY id LIMIT 1""", (now,)).fetchone()
+        if row is None:
+            return None
+        conn.execute(
+            """UPDATE tarefas SET status = 'running', attempts = attempts + 1, worker = ?,
+                                  heartbeat_at = ?, updated_at = ? WHERE id = ?""",
+            (worker, now, now, row[0]))
+    return get_task(path_db, row[0])
+
+
+def heartbeat(path_db, task_id):
+    now = time.time()
+    with _connect(path_db) as conn:
+        conn.execute("UPDATE tarefas SET heartbeat_at = ?, updated_at = ? WHERE id = ? AND status = 'running'",
+                     (now, now, task_id))
+
+
+def finish(path_db, task_id, status, result=None, error=None):
+    with _connect(path_db) as conn:
+        conn.execute(
+            "UPDATE tarefas SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+            (status, json.dumps(result, ensure_ascii=False) if result is not None else None,
+             error, time.time(), task_id))
+
+
+def retry_or_fail(path_db, task, error):
+    """Devolve a tarefa para a fila com espera crescente, ou marca como falha definitiva."""
+    if task["attempts"] >= task["max_attempts"]:
+        finish(path_db, task["id"], "failed", error=error)
+        metrics.failure("queue.task", error.split(":")[0], error)
+        return False
+    metrics.incr("queue_retries_total")
+    now = time.time()
+    with _connect(path_db) as conn:
+        conn.execute(
+            """UPDATE tarefas SET status = 'pending', error = ?, available_at = ?, updated_at = ?
+               WHERE id = ?""",
+            (error, now + 5 * 2 ** (task["attempts"] - 1), now, task["id"]))
+    return True
+
+
+def recover_stale(path_db, stale_after=STALE_AFTER):
+    """
+    Devolve para a fila as tarefas em execução cujo worker parou de dar sinal de
+    vida. As que já esgotaram as tentativas (ex.: um PDF que derruba o worker)
+    são marcadas como falha, em vez de voltarem para a fila indefinidamente.
+    """
+    now = time.time()
+    with _connect(path_db) as conn:
+        failed = conn.execute(
+            """UPDATE tarefas SET status = 'failed', updated_at = ?, error = 'worker interrompido'
+               WHERE status = 'running' AND heartbeat_at < ? AND attempts >= max_attempts""",
+            (now, now - stale_after)).rowcount
+        requeued = conn.execute(
+            """UPDATE tarefas SET status = 'pending', available_at = ?, updated_at = ?,
+                                  error = 'worker interrompido durante a execução'
+               WHERE status = 'running' AND heartbeat_at < ? AND attempts < max_attempts""",
+            (now, now, now - stale_after)).rowcount
+    for _ in range(failed):
+        metrics.failure("queue.task", "worker interrompido", "tentativas esgotadas")
+    return requeued
+
+
+def _row_to_task(row):
+    task = dict(row)
+    task["options"] = json.loads(task["options"] or "{}")
+    task["result"] = json.loads(task["result"]) if task["result"] else None
+    return task
+
+
+def get_task(path_db, task_id):
+    with _connect(path_db) as conn:
+        conn.row_factory = sqlite3.Row
+        row = conn.execute("SELECT * FROM tarefas WHERE id = ?", (task_id,)).fetchone()
+    return _row_to_task(row) if row else None
+
+
+def recent_tasks(path_db, limit=20):
+    """Tarefas mais recentes (para o painel da fila na interface)."""
+    if not os.path.exists(path_db):
+        return []
+    with _connect(path_db) as conn:
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute("SELECT * FROM tarefas ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    return [_row_to_task(row) for row in rows]
+
+
+def queue_counts(path_db):
+    if not os.path.exists(path_db):
+        return {}
+    with _connect(path_db) as conn:
+        return dict(conn.execute("SELECT status, COUNT(*) FROM tarefas GROUP BY status"))
+
+
+def build_context():
+    """Recursos usados pelos workers (LLM, prompt, schema e configuração do pré-filtro)."""
+    import config
+    from utils import build_prompt_template, load_llm
+
+    return {
+        "llm": load_llm(config.id_model, config.temperature),
+        "model": (config.id_model, config.temperature),
+        "prompt_template": build_prompt_template(config.prompt_text),
+        "schema": config.schema,
+        "prompt_score": config.prompt_score,
+        "fields": config.fields,
+        "prefilter_config": config.prefilter_config,
+    }
+
+
+@lru_cache(maxsize=4)
+def _load_llm(id_model, temperature):
+    from utils import load_llm
+
+    return load_llm(id_model, temperature)
+
+
+def task_llm(task, ctx):
+    """
+    Modelo pedido pela tarefa (options model/temperature, gravados no enfileiramento):
+    o do contexto se for o mesmo, senão um cliente criado para esse modelo. Tarefas
+    sem modelo (enfileiradas antes desta opção) usam o do contexto.
+    """
+    options = task["options"]
+    if "model" not in options:
+        return ctx["llm"]
+    model = (options["model"], options.get("temperature"))
+    return ctx["llm"] if model == ctx.get("model") else _load_llm(*model)
+
+
+def process_task(path_db, task, ctx):
+    """
+    Executa uma tarefa: leitura do PDF, pré-filtro, análise pelo LLM e gravação.
+
+    Returns:
+        tuple: (status final, resultado)
+    """
+    from prefilter import extract_requirements, prefilter_cv, screening_stats
+    from dedup import check_before_analysis
+    from utils import analyze_cv_cached, job_score_hash, load_job, parse_doc_cached, save_json_cv
+
+    options = task["options"]
+    job_details = load_job(path_db, task["job_id"])
+    content = parse_doc_cached(task["file_path"])
+
+    duplicate = check_before_analysis(path_db, content)
+    if duplicate:
+        return "duplicate", {"name": duplicate["cv_key"], "reason": duplicate["reason"]}
+
+    prefilter_config = ctx["prefilter_config"]
+    if prefilter_config["enabled"] and not options.get("skip_prefilter"):
+        params = {k: v for k, v in prefilter_config.items() if k != "enabled"}
+        decision = prefilter_cv(content, extract_requirements(job_details),
+                                target_area=options.get("target_area"), **params)
+        screening_stats.record_prefilter(decision)
+        if not decision["passed"]:
+            return "filtered", {"score": decision["score"], "area": decision["area"]}
+
+    started = time.perf_counter()
+    structured_data, from_cache = analyze_cv_cached(
+        ctx["schema"], job_details, ctx["prompt_template"], ctx["prompt_score"], task_llm(task, ctx), content,
+        ctx["fields"])
+    if not from_cache:
+        screening_stats.record_llm(time.perf_counter() - started)
+    if not structured_data:
+        raise ValueError("resposta do LLM sem JSON válido")
+
+    saved = save_json_cv(structured_data, path_db=path_db, key_name="name", markdown=content, warn=False,
+                         job_id=task["job_id"], score_hash=job_score_hash(path_db, task["job_id"], ctx["prompt_score"]))
+    return ("done" if saved else "duplicate"), {"name": structured_data.get("name"),
+                                                "score": structured_data.get("score")}
+
+
+def _run_with_heartbeat(path_db, task, ctx):
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            heartbeat(path_db, task["id"])
+
+    ticker = threading.Thread(target=beat, daemon=True)
+    ticker.start()
+    try:
+        with metrics.span("queue.task", attempt=task["attempts"]) as span:
+            status, result = process_task(path_db, task, ctx)
+            span["status"] = status
+        return status, result
+    finally:
+        stop.set()
+
+
+def worker_loop(path_db, ctx, stop_event, worker_name=None):
+    worker_name = worker_name or f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+    last_recovery = 0.0
+    while not stop_event.is_set():
+        if time.monotonic() - last_recovery > STALE_AFTER / 2:
+            recover_stale(path_db)
+            last_recovery = time.monotonic()
+
+        task = claim(path_db, worker_name)
+        if task is None:
+            stop_event.wait(POLL_INTERVAL)
+            continue
+
+        try:
+            status, result = _run_with_heartbeat(path_db, task, ctx)
+        except Exception as e:
+            if retry_or_fail(path_db, task, f"{type(e).__name__}: {e}"):
+                continue
+        else:
+            finish(path_db, task["id"], status, result=result)
+        # Tarefa encerrada: o PDF da fila não é mais necessário
+        try:
+            os.remove(task["file_path"])
+        except OSError:
+            pass
+
+
+def start_workers(path_db, n=QUEUE_WORKERS, ctx=None):
+    """
+    Inicia n workers em threads daemon neste processo.
+
+    Returns:
+        threading.Event: Sinal para encerrar os workers
+    """
+    ctx = ctx or build_context()
+    stop_event = threading.Event()
+    for i in range(max(1, n)):
+        threading.Thread(target=worker_loop, args=(path_db, ctx, stop_event),
+                         name=f"fila-worker-{i}", daemon=True).start()
+    return stop_event
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+    from config import db_file
+
+    parser = argparse.ArgumentParser(description="Worker da fila de análise de currículos")
+    parser.add_argument("--workers", type=int, default=QUEUE_WORKERS, help="Tarefas processadas em paralelo")
+    parser.add_argument("--db", default=db_file, help="Banco SQLite de currículos, vagas e fila")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    stop_event = start_workers(args.db, args.workers)
+    print(f"{args.workers} worker(s) processando a fila de {args.db}. Ctrl+C para encerrar.", flush=True)
+    try:
+        while True:
+            time.sleep(5)
+    except KeyboardInterrupt:
+        stop_event.set()
+
+
+if __name__ == "__main__":
+    main()